@@ -1,4 +1,3 @@
-import os
 from datetime import date
 
 import streamlit as st
@@ -7,7 +6,17 @@ import numpy as np
 
 import plotly.express as px
 import plotly.graph_objects as go
-from fredapi import Fred
+
+import profiling
+from charts import px_figure
+from cache import cache_controls, memo, skip_cache
+from export import export_controls, store_batches
+from growth import growth_rates as frequency_growth_rates, normalize_frequency
+from refresh import CACHE_TTL_S
+from ingest import bulk_ingest_controls, ingest
+from nowcast import nowcast
+from resources import default_fred_key, fred_client, fred_metadata, http_session, series_store
+from store import read_through, series_key, snapshot_controls
 
 # ---------------------------
 # Page Config
@@ -17,6 +26,7 @@ st.set_page_config(
     page_icon="📊",
     layout="wide",
 )
+profiling.begin("econ_dashboard")
 
 # Global Plotly template for dark mode
 px.defaults.template = "plotly_dark"
@@ -24,39 +34,42 @@ px.defaults.template = "plotly_dark"
 # ---------------------------
 # Load FRED Key (env or simple file) — simple & direct
 # ---------------------------
-KEYS_PATH = r"C:\\Users\\nilee\\OneDrive\\Documents\\keys.txt"
-fkey = os.getenv("FRED_API_KEY", "")
-if not fkey:
-    try:
-        with open(KEYS_PATH, "r") as f:
-            fkey = f.read().strip()
-    except Exception:
-        fkey = ""
+with profiling.section("keys"):
+    fkey = default_fred_key()
 
 if not fkey:
     st.error("Missing FRED API key. Set FRED_API_KEY env var or place it in keys.txt.")
     st.stop()
 
-fred = Fred(api_key=fkey)
+fred = fred_client(fkey)
+series_store()   # shared store; starts the background refresher once per server
 
 # ---------------------------
 # Helpers — keep it simple
 # ---------------------------
-@st.cache_data(show_spinner=False)
+@profiling.timed("fetch")
+@memo(ttl=CACHE_TTL_S)
 def fetch_fred_series(series_id: str, label: str, start: str | None = None, end: str | None = None) -> pd.DataFrame:
-    """Fetch a single FRED series (optionally bounded by start/end) and return a 2-col DataFrame [Date, label]."""
+    """Fetch a single FRED series (optionally bounded by start/end) and return a 2-col DataFrame [Date, label].
+    Served from the series store; only dates it does not cover yet are fetched."""
     try:
-        s = fred.get_series(series_id, observation_start=start, observation_end=end)
+        s = read_through(series_key("FRED", series_id), start, end,
+                         lambda a, b: fred.get_series(series_id, observation_start=a, observation_end=b))
         df = s.to_frame(name=label).reset_index()
         df.columns = ["Date", label]
         return df
     except Exception as e:
+        skip_cache()        # retry (and warn again) on the next rerun
         st.warning(f"Could not fetch {series_id}: {e}")
         return pd.DataFrame(columns=["Date", label])
 
-@st.cache_data(show_spinner=False)
+@profiling.timed("merge")
+@memo(ttl=CACHE_TTL_S)
 def fetch_many(series_map: dict[str, str], start: str | None = None, end: str | None = None) -> pd.DataFrame:
-    """Fetch many FRED series given a dict {label: series_id}. Returns a wide DataFrame indexed by Date."""
+    """Fetch many FRED series given a dict {label: series_id}. Returns a wide DataFrame indexed by Date.
+    Missing ranges are loaded into the store concurrently first, so the per-series reads below hit memory."""
+    if len(series_map) > 1:
+        ingest(series_map.values(), fkey, http_session(), start, end)
     frames = []
     for label, sid in series_map.items():
         df = fetch_fred_series(sid, label, start, end)
@@ -77,24 +90,22 @@ def daterange_defaults():
     start = end - pd.DateOffset(years=5)
     return start.date(), end.date()
 
-def to_csv_download(df: pd.DataFrame) -> bytes:
-    return df.to_csv(index=True).encode("utf-8")
-
-def growth_rates(df: pd.DataFrame) -> pd.DataFrame:
-    out = {}
-    for col in df.columns:
-        s = df[col].dropna()
-        if len(s) < 3:
-            continue
-        mom = s.pct_change(1) * 100.0
-        mom.name = f"{col} — Δ% (prev period)"
-        yoy = s.pct_change(12) * 100.0 if s.index.inferred_freq in ("M", "MS") else s.pct_change(52) * 100.0
-        yoy.name = f"{col} — Δ% (YoY/YoY*)"
-        out[mom.name] = mom
-        out[yoy.name] = yoy
-    if not out:
-        return pd.DataFrame(index=df.index)
-    return pd.concat(out.values(), axis=1)
+@profiling.timed("fetch")
+def series_frequency(series_id: str) -> str:
+    """FRED frequency code (D/W/BW/M/Q/SA/A) from the shared metadata cache; '' if unavailable (inferred later).
+    Also recorded on the stored series so the background refresher uses the right TTL."""
+    try:
+        freq = normalize_frequency(fred_metadata().get(series_id)["frequency_short"])
+    except Exception:
+        return ""
+    series_store().meta.setdefault(series_key("FRED", series_id), {})["frequency"] = freq
+    return freq
+
+@profiling.timed("transforms")
+def growth_rates(df: pd.DataFrame, series_map: dict[str, str]) -> pd.DataFrame:
+    """Growth table for a fetch_many() frame, grouped by each series' stored frequency."""
+    freqs = {label: series_frequency(sid) for label, sid in series_map.items() if label in df.columns}
+    return frequency_growth_rates(df, freqs, kinds=growth_kinds)
 
 # ---------------------------
 # Presets
@@ -135,6 +146,13 @@ asof_date = None
 if asof_toggle:
     asof_date = st.sidebar.date_input("As-of date", value=end_date, max_value=date.today())
 
+# Growth measures used by the Growth (%) views
+_growth_options = {"Period change": "period", "YoY": "yoy", "Period change, annualized": "annualized"}
+growth_sel = st.sidebar.multiselect("Growth measures", list(_growth_options), default=["Period change", "YoY"])
+growth_kinds = tuple(_growth_options[k] for k in growth_sel)
+snapshot_controls()
+cache_controls()
+
 # Compute effective bounds
 obs_start = None if asof_toggle else str(start_date)
 obs_end = str(asof_date if asof_date else end_date)
@@ -170,8 +188,8 @@ with tab_overview:
             retail_map = {k: RETAIL_PRESETS[k] for k in retail_selected}
             retail_df = fetch_many(retail_map, obs_start, obs_end)
             if not retail_df.empty:
-                fig = px.line(retail_df, labels={"value": "USD (Millions)", "index": "Date"})
-                fig.update_layout(height=360, legend_title_text="Series")
+                fig = px_figure("line", retail_df, labels={"value": "USD (Millions)", "index": "Date"},
+                                layout=dict(height=360, legend_title_text="Series"))
                 st.plotly_chart(fig, use_container_width=True)
                 st.dataframe(retail_df.tail(6), use_container_width=True)
             else:
@@ -192,8 +210,8 @@ with tab_overview:
             h8_map = {k: H8_PRESETS[k] for k in h8_selected}
             h8_df = fetch_many(h8_map, obs_start, obs_end)
             if not h8_df.empty:
-                fig = px.line(h8_df, labels={"value": "USD (Billions)", "index": "Date"})
-                fig.update_layout(height=360, legend_title_text="Series")
+                fig = px_figure("line", h8_df, labels={"value": "USD (Billions)", "index": "Date"},
+                                layout=dict(height=360, legend_title_text="Series"))
                 st.plotly_chart(fig, use_container_width=True)
                 st.dataframe(h8_df.tail(10), use_container_width=True)
             else:
@@ -211,8 +229,8 @@ with tab_overview:
             if not cdf.empty:
                 st.success(f"Loaded {len(cdf.columns)} custom series.")
                 st.dataframe(cdf.tail(10), use_container_width=True)
-                cfig = px.line(cdf, labels={"value": "Value", "index": "Date"})
-                cfig.update_layout(height=340, legend_title_text="Series")
+                cfig = px_figure("line", cdf, labels={"value": "Value", "index": "Date"},
+                                 layout=dict(height=340, legend_title_text="Series"))
                 st.plotly_chart(cfig, use_container_width=True)
             else:
                 st.warning("No data retrieved for the provided IDs.")
@@ -236,17 +254,17 @@ with tab_retail:
             if not rdf.empty:
                 tabsR = st.tabs(["Levels", "Growth (%)"])
                 with tabsR[0]:
-                    fig1 = px.line(rdf, labels={"value": "USD (Millions)", "index": "Date"})
-                    fig1.update_layout(height=520, legend_title_text="Series")
+                    fig1 = px_figure("line", rdf, labels={"value": "USD (Millions)", "index": "Date"},
+                                     layout=dict(height=520, legend_title_text="Series"))
                     st.plotly_chart(fig1, use_container_width=True)
                     st.caption("Levels are seasonally adjusted where applicable.")
                 with tabsR[1]:
-                    g = growth_rates(rdf)
+                    g = growth_rates(rdf, retail_map)
                     if not g.empty:
-                        fig2 = px.line(g, labels={"value": "%", "index": "Date"})
-                        fig2.update_layout(height=520, legend_title_text="Series")
+                        fig2 = px_figure("line", g, labels={"value": "%", "index": "Date"},
+                                         layout=dict(height=520, legend_title_text="Series"))
                         st.plotly_chart(fig2, use_container_width=True)
-                        st.caption("MoM/YoY computed from adjacent periods; YoY assumes monthly frequency.")
+                        st.caption("Changes use each series' native frequency from FRED metadata (MoM, 12-month YoY).")
                     else:
                         st.info("Not enough data to compute growth rates.")
 
@@ -284,16 +302,16 @@ with tab_h8:
             if not h8df.empty:
                 tabsH = st.tabs(["Levels", "Growth (%)"])
                 with tabsH[0]:
-                    figh1 = px.line(h8df, labels={"value": "USD (Billions)", "index": "Date"})
-                    figh1.update_layout(height=520, legend_title_text="Series")
+                    figh1 = px_figure("line", h8df, labels={"value": "USD (Billions)", "index": "Date"},
+                                      layout=dict(height=520, legend_title_text="Series"))
                     st.plotly_chart(figh1, use_container_width=True)
                 with tabsH[1]:
-                    gh = growth_rates(h8df)
+                    gh = growth_rates(h8df, h8_map)
                     if not gh.empty:
-                        figh2 = px.line(gh, labels={"value": "%", "index": "Date"})
-                        figh2.update_layout(height=520, legend_title_text="Series")
+                        figh2 = px_figure("line", gh, labels={"value": "%", "index": "Date"},
+                                          layout=dict(height=520, legend_title_text="Series"))
                         st.plotly_chart(figh2, use_container_width=True)
-                        st.caption("YoY proxy uses 52-week change for weekly series.")
+                        st.caption("Weekly series: WoW and 52-week YoY change.")
                     else:
                         st.info("Not enough data to compute growth rates.")
 
@@ -326,8 +344,8 @@ with tab_compare:
     if not r_df.empty and not h_df.empty:
         joint = pd.concat([r_df, h_df], axis=1).dropna()
         norm = joint / joint.iloc[0] * 100.0
-        figC = px.line(norm, labels={"value": "Index (Start=100)", "index": "Date"})
-        figC.update_layout(height=520, legend_title_text="Series")
+        figC = px_figure("line", norm, labels={"value": "Index (Start=100)", "index": "Date"},
+                         layout=dict(height=520, legend_title_text="Series"))
         st.plotly_chart(figC, use_container_width=True)
         st.caption("Both series are indexed to 100 at the first common date to compare trends.")
     else:
@@ -377,8 +395,8 @@ with tab_corr:
                         corr_series[roll.name] = roll
             if corr_series:
                 corr_df = pd.concat(corr_series.values(), axis=1).dropna(how="all")
-                figCorr = px.line(corr_df, labels={"value": "Correlation", "index": "Date"})
-                figCorr.update_layout(height=540, legend_title_text="Pairs")
+                figCorr = px_figure("line", corr_df, labels={"value": "Correlation", "index": "Date"},
+                                    layout=dict(height=540, legend_title_text="Pairs"))
                 st.plotly_chart(figCorr, use_container_width=True)
                 st.dataframe(corr_df.tail(10), use_container_width=True)
             else:
@@ -393,7 +411,7 @@ with tab_corr:
 # ---------------------------
 with tab_downloads:
     st.subheader("Download Data")
-    st.markdown("Pick any mix of retail, H.8, and custom series to export a single CSV.")
+    st.markdown("Pick any mix of retail, H.8, and custom series to export a single file (CSV, gzip CSV, Parquet or Arrow).")
     dl_retail = st.multiselect("Retail for export", list(RETAIL_PRESETS.keys()))
     dl_h8 = st.multiselect("H.8 for export", list(H8_PRESETS.keys()))
     dl_custom = st.text_input("Additional FRED IDs (comma-separated)", "")
@@ -408,17 +426,25 @@ with tab_downloads:
         df_all = fetch_many(all_map, obs_start, obs_end)
         if not df_all.empty:
             st.dataframe(df_all.tail(12), use_container_width=True)
-            st.download_button(
-                label="⬇️ Download CSV",
-                data=to_csv_download(df_all),
-                file_name=f"economic_dashboard_{obs_start or 'START'}_to_{obs_end}.csv",
-                mime="text/csv",
-            )
+            # Encoded only when a download button is clicked
+            export_controls(df_all, f"economic_dashboard_{obs_start or 'START'}_to_{obs_end}", key="export_wide")
+            st.caption("Raw stored observations, long format (series, date, value), exported from the series store without copying.")
+            raw_keys = [series_key("FRED", sid) for sid in all_map.values()]
+            export_controls(lambda: store_batches(raw_keys), "economic_dashboard_raw", key="export_raw")
         else:
             st.info("Nothing to export for the current date filter.")
     else:
         st.info("Select series to export.")
 
+    st.markdown("---")
+    st.markdown("**Bulk load a FRED release or category**")
+    with st.expander("Load every series of a release (e.g. H.8) or category into the store"):
+        bulk_ids = bulk_ingest_controls(fkey, http_session(), fred_metadata(), obs_start, obs_end)
+        if bulk_ids:
+            st.caption(f"{len(bulk_ids)} series loaded; raw observations in long format (series, date, value).")
+            bulk_keys = [series_key("FRED", sid) for sid in bulk_ids]
+            export_controls(lambda: store_batches(bulk_keys), "fred_bulk_raw", key="export_bulk")
+
 # ---------------------------
 # Footer
 # ---------------------------
@@ -454,8 +480,8 @@ MACRO_PRESETS = {
 }
 
 # --- Update your tab list to include "Macro" ---
-(tab_overview, tab_retail, tab_h8, tab_macro, tab_compare, tab_corr, tab_downloads) = st.tabs(
-    ["Overview", "Retail Sales", "Bank Lending (H.8)", "Macro", "Compare", "Correlations", "Downloads"]
+(tab_overview, tab_retail, tab_h8, tab_macro, tab_nowcast, tab_compare, tab_corr, tab_downloads) = st.tabs(
+    ["Overview", "Retail Sales", "Bank Lending (H.8)", "Macro", "Nowcast", "Compare", "Correlations", "Downloads"]
 )
 
 # --- Macro Tab ---
@@ -478,8 +504,8 @@ with tab_macro:
             m_map = {k: MACRO_PRESETS[k] for k in macro_sel}
             mdf = fetch_many(m_map, obs_start, obs_end)
             if not mdf.empty:
-                lvl_fig = px.line(mdf, labels={"value": "Level", "index": "Date"})
-                lvl_fig.update_layout(height=520, legend_title_text="Series")
+                lvl_fig = px_figure("line", mdf, labels={"value": "Level", "index": "Date"},
+                                    layout=dict(height=520, legend_title_text="Series"))
                 st.plotly_chart(lvl_fig, use_container_width=True)
                 st.dataframe(mdf.tail(10), use_container_width=True)
             else:
@@ -491,10 +517,10 @@ with tab_macro:
             m_map = {k: MACRO_PRESETS[k] for k in macro_sel}
             mdf = fetch_many(m_map, obs_start, obs_end)
             if not mdf.empty:
-                g = growth_rates(mdf)
+                g = growth_rates(mdf, m_map)
                 if not g.empty:
-                    gfig = px.line(g, labels={"value": "%", "index": "Date"})
-                    gfig.update_layout(height=380, legend_title_text="Series")
+                    gfig = px_figure("line", g, labels={"value": "%", "index": "Date"},
+                                     layout=dict(height=380, legend_title_text="Series"))
                     st.plotly_chart(gfig, use_container_width=True)
                 else:
                     st.info("Not enough data for growth rates.")
@@ -502,9 +528,48 @@ with tab_macro:
                 # Yield curve (10Y - 2Y) if both are available
                 if {"10Y Treasury Yield", "2Y Treasury Yield"}.issubset(set(mdf.columns)):
                     curve = (mdf["10Y Treasury Yield"] - mdf["2Y Treasury Yield"]).rename("10Y–2Y Term Spread")
-                    cfig = px.line(curve, labels={"value": "Pct Points", "index": "Date"})
-                    cfig.update_layout(height=140, legend_title_text="")
+                    cfig = px_figure("line", curve, labels={"value": "Pct Points", "index": "Date"},
+                                     layout=dict(height=140, legend_title_text=""))
                     st.plotly_chart(cfig, use_container_width=True)
                     st.caption("Term spread (DGS10 − DGS2). Negative values indicate inversion.")
             else:
                 st.info("No macro data for the current date filter.")
+
+# --- Nowcast Tab ---
+NOWCAST_START = "1993-01-01"   # RSAFS starts in 1992; one year for the first growth rates
+WEEKLY_PRESETS = {**H8_PRESETS, "Initial Jobless Claims": "ICSA"}
+
+with tab_nowcast:
+    st.subheader("Retail Sales Nowcast (RSAFS from weekly data)")
+    st.caption("Kalman-filtered bridge regression of monthly RSAFS growth on the month-average growth of weekly "
+               "series. The filter state persists, so each new weekly print only moves the current month's inputs.")
+    n1, n2 = st.columns([0.7, 0.3])
+    nc_sel = n1.multiselect("Weekly inputs", list(WEEKLY_PRESETS),
+                            default=["Total Bank Credit", "Consumer Loans", "Initial Jobless Claims"])
+    nc_q = n2.select_slider("Coefficient drift (q)", options=[1e-5, 1e-4, 1e-3, 1e-2], value=1e-3,
+                            help="State noise of the random-walk coefficients; higher adapts faster.")
+    if nc_sel:
+        nc_map = {"RSAFS": "RSAFS", **{k: WEEKLY_PRESETS[k] for k in nc_sel}}
+        ndf = fetch_many(nc_map, NOWCAST_START, None)
+        if "RSAFS" in ndf.columns and set(nc_sel) <= set(ndf.columns):
+            res = nowcast(ndf["RSAFS"].dropna(), ndf[nc_sel].dropna(how="all"), q=nc_q)
+            if res is None:
+                st.info("No weekly data yet for the month after the latest retail sales print.")
+            else:
+                m1, m2, m3 = st.columns(3)
+                m1.metric(f"RSAFS {res['month'].strftime('%b %Y')} (MoM %)", f"{res['growth']:+.2f}",
+                          help=f"±{res['std']:.2f} (1σ), from {res['weeks']} weekly observation(s)")
+                if res["level"] is not None:
+                    m2.metric("Implied level (USD mn)", f"{res['level']:,.0f}")
+                hist = res["history"].tail(60)
+                hit = np.sqrt(((hist["predicted"] - hist["actual"]) ** 2).mean())
+                m3.metric("One-step RMSE, last 5y (pp)", f"{hit:.2f}")
+                hist = hist.set_index(hist["month"].dt.to_timestamp())[["predicted", "actual"]]
+                nfig = px_figure("line", hist, labels={"value": "MoM %", "index": "Month", "variable": ""},
+                                 layout=dict(height=380))
+                st.plotly_chart(nfig, use_container_width=True)
+                st.dataframe(res["coefficients"].rename("coefficient").to_frame(), use_container_width=True)
+        else:
+            st.info("Retail sales or weekly inputs unavailable.")
+
+profiling.end()
@@ -1,41 +1,35 @@
-import os
 import pandas as pd
-import plotly.express as px
 import streamlit as st
-from fredapi import Fred
-import requests
+
+import profiling
+from charts import px_figure
+from cache import cache_controls, memo, skip_cache
+from endpoints import STATCAN_WDS
+from export import export_controls
+from refresh import CACHE_TTL_S
+from resources import DARK_LAYOUT, apply_theme, default_fred_key, fred_client, http_session, series_store
+from store import date_window, read_through, series_key, snapshot_controls
+from backtest import DEFAULT_HOLDINGS, DEFAULT_THRESHOLDS, fx_panel, grid_cells, run_grid
+from valuation import (
+    compute_beer, compute_feer, compute_ppp, compute_rer, compute_yield_spread_model, required_inputs,
+)
 
 # ---------- Config ----------
 st.set_page_config(page_title="FX Valuation — Models", layout="wide")
+profiling.begin("fx_models")
 
-DARK_BG = "#0e1014"
-PRIMARY_TEXT = "#e5e7eb"
-
-st.markdown(
-    f"""
-    <style>
-      .stApp {{ background-color: {DARK_BG}; color: {PRIMARY_TEXT}; }}
-      .sidebar .sidebar-content {{ background-color: {DARK_BG}; }}
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+apply_theme()
 
 # ---------- Load FRED Key (Env or File) ----------
-KEYS_PATH = r"C:\\Users\\nilee\\OneDrive\\Documents\\keys.txt"
-fkey = os.getenv("FRED_API_KEY", "")
-if not fkey:
-    try:
-        with open(KEYS_PATH, "r") as f:
-            fkey = f.read().strip()
-    except Exception as e:
-        fkey = ""
-        st.error(f"Could not read FRED key from env or {KEYS_PATH}: {e}")
+with profiling.section("keys"):
+    fkey = default_fred_key()
 
 if not fkey:
+    st.error("Could not read FRED key from FRED_API_KEY or the key file.")
     st.stop()
 
-fred = Fred(api_key=fkey)
+fred = fred_client(fkey)
+series_store()   # shared store; starts the background refresher once per server
 
 # ---------- Define Indicators (with corrected IDs) ----------
 indicators = {
@@ -52,90 +46,73 @@ indicators = {
     "Federal Deficit": "MTSDS133FMS" # Federal Surplus or Deficit
 }
 
+# Inputs not on FRED, by label -> StatCan vector
+statcan_indicators = {
+    "Canada Current Account": "498153",
+}
+
+# Tab -> extra inputs it needs beyond the selected models
+TAB_INPUTS = {
+    "Overview": ("Nominal USD/CAD",),
+    "Economics": ("US GDP", "US Unemployment", "US CPI", "ISM PMI", "Federal Deficit",
+                  "US Current Account", "Canada Current Account"),
+}
+
 # ---------- Functions ----------
-@st.cache_data
-def fetch_fred_series(series_id, label):
+@profiling.timed("fetch")
+@memo(ttl=CACHE_TTL_S)
+def fetch_fred_series(series_id, label, start=None, end=None):
     try:
-        data = fred.get_series(series_id)
+        data = read_through(series_key("FRED", series_id), start, end,
+                            lambda a, b: fred.get_series(series_id, observation_start=a, observation_end=b))
         df = data.reset_index()
         df.columns = ["Date", label]
         return df
     except Exception as e:
+        skip_cache()        # retry (and warn again) on the next rerun
         st.warning(f"Series {series_id} ({label}) not available: {e}")
         return pd.DataFrame(columns=["Date", label])
 
-@st.cache_data
-def get_all_indicators():
+@profiling.timed("merge")
+@memo(ttl=CACHE_TTL_S)
+def get_indicators(labels, start, end):
+    """Fetch only the FRED indicators in `labels`, bounded to [start, end], merged on Date."""
     df_combined = None
-    for label, series_id in indicators.items():
-        df = fetch_fred_series(series_id, label)
+    for label in labels:
+        if label not in indicators:
+            continue
+        df = fetch_fred_series(indicators[label], label, start, end)
         df_combined = df if df_combined is None else pd.merge(df_combined, df, on="Date", how="outer")
+    if df_combined is None:
+        return pd.DataFrame(columns=["Date"])
     df_combined.sort_values("Date", inplace=True)
     return df_combined
 
 # ---------- StatCan API for Canada Current Account ----------
-STATCAN_WDS = "https://www150.statcan.gc.ca/t1/wds/rest/getDataFromVectorByReferencePeriodRange"
+STATCAN_VECTOR_RANGE = f"{STATCAN_WDS}/getDataFromVectorByReferencePeriodRange"
 
+@profiling.timed("fetch")
 def get_statcan_vector(vector_code: str, start: str, end: str) -> pd.DataFrame:
     vid = str(int(str(vector_code).lower().replace("v", "").strip()))
-    params = {"vectorIds": vid, "startRefPeriod": start, "endReferencePeriod": end}
-    r = requests.get(STATCAN_WDS, params=params, timeout=30)
-    r.raise_for_status()
-    resp = r.json()
-    entry = resp[0] if isinstance(resp, list) and resp else resp
-    obj = entry.get("object", {}) if isinstance(entry, dict) else {}
-    datapoints = obj.get("vectorDataPoint", []) if isinstance(obj, dict) else []
-    rows = []
-    for dp in datapoints:
-        ref = dp.get("refPer") or dp.get("refPeriod") or dp.get("REF_DATE")
-        val = dp.get("value") or dp.get("VAL") or dp.get("VALUE")
-        if ref and val is not None:
-            rows.append((pd.to_datetime(ref[:10]), pd.to_numeric(val, errors="coerce")))
-    return pd.DataFrame(rows, columns=["Date", vector_code]).dropna()
-
-# (Rest of the valuation models and layout remain unchanged)
-
-# ---------- Valuation Models ----------
-def compute_rer(df):
-    df = df.dropna(subset=["Nominal USD/CAD", "US CPI", "Canada CPI"])
-    us_cpi = (df["US CPI"] / df["US CPI"].iloc[0]) * 100
-    ca_cpi = (df["Canada CPI"] / df["Canada CPI"].iloc[0]) * 100
-    df["RER_USD/CAD"] = df["Nominal USD/CAD"] * (ca_cpi / us_cpi)
-    return df
-
-def compute_ppp(df):
-    df = df.dropna(subset=["US CPI", "Canada CPI"])
-    df["PPP_USD/CAD"] = df["Canada CPI"] / df["US CPI"]
-    return df
-
-def compute_beer(df):
-    if "US 2Y Yield" in df.columns and "Canada 2Y Yield" in df.columns:
-        spread = df["US 2Y Yield"] - df["Canada 2Y Yield"]
-        df["BEER_USD/CAD"] = df["Nominal USD/CAD"].mean() * (1 + spread / 100)
-    return df
-
-def compute_feer(df, ca_us, gdp_us, ca_ca):
-    df_feer = df.copy()
-    if not ca_us.empty and not gdp_us.empty:
-        ca_us = pd.merge(ca_us, gdp_us, on="Date", how="inner")
-        ca_us["US_CA_pct_GDP"] = (ca_us["US Current Account"] / ca_us["US GDP"]) * 100
-        latest_gap = -2 - ca_us["US_CA_pct_GDP"].iloc[-1]
-        adj = 1 + (latest_gap * 0.2 / 100)
-        df_feer["FEER_USD/CAD"] = df_feer["Nominal USD/CAD"] * adj
-        df_feer = pd.merge(df_feer, ca_us[["Date", "US_CA_pct_GDP"]], on="Date", how="left")
-    if not ca_ca.empty:
-        ca_ca.rename(columns={ca_ca.columns[1]: "Canada_CA"}, inplace=True)
-        df_feer = pd.merge(df_feer, ca_ca, on="Date", how="left")
-    return df_feer
-
-def compute_yield_spread_model(df):
-    if "US 2Y Yield" in df.columns and "Canada 2Y Yield" in df.columns:
-        spread = df["US 2Y Yield"] - df["Canada 2Y Yield"]
-        if spread.iloc[-1] != 0:
-            df["Yield_Spread_Model"] = df["Nominal USD/CAD"].mean() * (1 + spread / 100)
-        else:
-            df["Yield_Spread_Model"] = None
-    return df
+
+    def _fetch(a, b):
+        params = {"vectorIds": vid, "startRefPeriod": a or "1900-01-01", "endReferencePeriod": b}
+        r = http_session().get(STATCAN_VECTOR_RANGE, params=params, timeout=30)
+        r.raise_for_status()
+        resp = r.json()
+        entry = resp[0] if isinstance(resp, list) and resp else resp
+        obj = entry.get("object", {}) if isinstance(entry, dict) else {}
+        datapoints = obj.get("vectorDataPoint", []) if isinstance(obj, dict) else []
+        rows = []
+        for dp in datapoints:
+            ref = dp.get("refPer") or dp.get("refPeriod") or dp.get("REF_DATE")
+            val = dp.get("value") or dp.get("VAL") or dp.get("VALUE")
+            if ref:
+                rows.append((pd.to_datetime(ref[:10]), val))
+        return pd.Series([v for _, v in rows], index=pd.DatetimeIndex([d for d, _ in rows]), dtype=object)
+
+    s = read_through(series_key("StatCan", f"v{vid}"), start, end, _fetch)
+    return pd.DataFrame({"Date": s.index, vector_code: s.values})
 
 # ---------- Date Config ----------
 st.sidebar.header("Date Configuration")
@@ -162,76 +139,123 @@ st.title("💱 FX Valuation Dashboard — USD/CAD")
 st.markdown("Compare Nominal FX with valuation models: RER, PPP, BEER, FEER, Yield Spread.")
 
 # ---------- Data ----------
+st.sidebar.header("Tabs")
+load_econ = st.sidebar.checkbox("Load Economics tab indicators", value=False,
+                                help="GDP, unemployment, PMI, deficit and current accounts are only fetched when enabled.")
+snapshot_controls()
+cache_controls()
+
+needed = required_inputs(model_choice, TAB_INPUTS["Overview"] + (TAB_INPUTS["Economics"] if load_econ else ()))
+obs_start, obs_end = start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d")
+empty = pd.DataFrame(columns=["Date"])
+
 with st.spinner("Fetching data from FRED and StatCan..."):
-    df = get_all_indicators()
-    df = df[(df["Date"] >= start_date) & (df["Date"] <= end_date)]
-
-    ca_us = fetch_fred_series("BOPBCA", "US Current Account")
-    gdp_us = fetch_fred_series("GDP", "US GDP")
-    ca_ca = get_statcan_vector("498153", start_date.strftime("%Y-%m-%d"), end_date.strftime("%Y-%m-%d"))
-
-    if "RER" in model_choice:
-        df = compute_rer(df)
-    if "PPP" in model_choice:
-        df = compute_ppp(df)
-    if "BEER" in model_choice:
-        df = compute_beer(df)
-    if "FEER" in model_choice:
-        df = compute_feer(df, ca_us, gdp_us, ca_ca)
-    if "Yield_Spread_Model" in model_choice:
-        df = compute_yield_spread_model(df)
+    df = get_indicators(needed, obs_start, obs_end)
+
+    ca_us = fetch_fred_series("BOPBCA", "US Current Account", obs_start, obs_end) if "US Current Account" in needed else empty
+    gdp_us = fetch_fred_series("GDP", "US GDP", obs_start, obs_end) if "US GDP" in needed else empty
+    ca_ca = (
+        get_statcan_vector(statcan_indicators["Canada Current Account"], obs_start, obs_end)
+        if "Canada Current Account" in needed else empty
+    )
+
+    with profiling.section("transforms"):
+        if "RER" in model_choice:
+            df = compute_rer(df)
+        if "PPP" in model_choice:
+            df = compute_ppp(df)
+        if "BEER" in model_choice:
+            df = compute_beer(df)
+        if "FEER" in model_choice:
+            df = compute_feer(df, ca_us, gdp_us, ca_ca)
+        if "Yield_Spread_Model" in model_choice:
+            df = compute_yield_spread_model(df)
 
 # ---------- Tabs ----------
-tab1, tab2, tab3, tab4, tab5 = st.tabs(["Overview", "Data Table", "Download", "Economics", "Yield Model"])
+tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs(["Overview", "Data Table", "Download", "Economics", "Yield Model", "Backtest"])
 
 with tab1:
     cols_to_plot = ["Nominal USD/CAD"] + [c for c in df.columns if any(m in c for m in model_choice)]
-    fig = px.line(
-        df, x="Date", y=cols_to_plot,
-        labels={"value": "Rate", "Date": "Date", "variable": "Series"}
+    fig = px_figure(
+        "line", df, x="Date", y=cols_to_plot,
+        labels={"value": "Rate", "Date": "Date", "variable": "Series"},
+        layout=DARK_LAYOUT,
     )
-    fig.update_layout(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
     st.plotly_chart(fig, use_container_width=True)
 
 with tab2:
     st.dataframe(df.tail(24))
 
 with tab3:
-    st.download_button("⬇️ Download CSV", df.to_csv(index=False).encode("utf-8"), "usd_cad_valuation.csv", "text/csv")
+    # Encoded only when the download button is clicked
+    export_controls(df, "usd_cad_valuation", index=False, key="export_fx")
 
 with tab4:
     st.subheader("🌍 Economic Indicators")
+    if not load_econ:
+        st.info("Enable 'Load Economics tab indicators' in the sidebar to fetch these series.")
     econ_series = ["US GDP", "US Unemployment", "US CPI", "ISM PMI", "Federal Deficit"]
     for series in econ_series:
         if series in df.columns:
             sub_df = df[["Date", series]].dropna()
-            sub_df = sub_df[(sub_df["Date"] >= start_date) & (sub_df["Date"] <= end_date)]
+            sub_df = date_window(sub_df, start_date, end_date)
             if not sub_df.empty:
-                fig_econ = px.line(sub_df, x="Date", y=series, title=series)
-                fig_econ.update_layout(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
+                fig_econ = px_figure("line", sub_df, x="Date", y=series, title=series, layout=DARK_LAYOUT)
                 st.plotly_chart(fig_econ, use_container_width=True)
 
-    ca_us = ca_us[(ca_us["Date"] >= start_date) & (ca_us["Date"] <= end_date)]
+    ca_us = date_window(ca_us, start_date, end_date)
     if not ca_us.empty:
-        fig_ca = px.line(ca_us, x="Date", y="US Current Account", title="US Current Account (Billions USD)")
-        fig_ca.update_layout(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
+        fig_ca = px_figure("line", ca_us, x="Date", y="US Current Account", title="US Current Account (Billions USD)", layout=DARK_LAYOUT)
         st.plotly_chart(fig_ca, use_container_width=True)
-    ca_ca = ca_ca[(ca_ca["Date"] >= start_date) & (ca_ca["Date"] <= end_date)]
+    ca_ca = date_window(ca_ca, start_date, end_date)
     if not ca_ca.empty:
-        fig_ca2 = px.line(ca_ca, x="Date", y=ca_ca.columns[1], title="Canada Current Account (Millions CAD)")
-        fig_ca2.update_layout(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
+        fig_ca2 = px_figure("line", ca_ca, x="Date", y=ca_ca.columns[1], title="Canada Current Account (Millions CAD)", layout=DARK_LAYOUT)
         st.plotly_chart(fig_ca2, use_container_width=True)
 
 with tab5:
     st.subheader("📊 Yield Spread Model")
     if "Yield_Spread_Model" in df.columns and df["Yield_Spread_Model"].notna().any():
-        fig_yield = px.line(df, x="Date", y="Yield_Spread_Model", title="USD/CAD Valuation from Yield Spread")
-        fig_yield.update_layout(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
+        fig_yield = px_figure("line", df, x="Date", y="Yield_Spread_Model", title="USD/CAD Valuation from Yield Spread", layout=DARK_LAYOUT)
         st.plotly_chart(fig_yield, use_container_width=True)
         st.dataframe(df[["Date", "Yield_Spread_Model"]].dropna().tail(24))
     else:
         st.warning("Yield spread model not available (spread = 0).")
 
+@profiling.timed("transforms")
+@memo()
+def backtest_grid(panel, thresholds, holdings, z_window):
+    return run_grid({"USD/CAD": panel}, thresholds, holdings, z_window=z_window)
+
+with tab6:
+    st.subheader("🧪 Valuation-Gap Backtest")
+    st.caption("Mean reversion: short USD/CAD when spot is rich vs a model (z-scored log gap above the threshold), long when cheap.")
+    panel = fx_panel(df)
+    if len(panel.columns) < 2:
+        st.info("Select at least one valuation model to backtest.")
+    else:
+        b1, b2, b3 = st.columns(3)
+        thresholds = b1.multiselect("Z thresholds", [0.5, 1.0, 1.5, 2.0, 2.5, 3.0], default=list(DEFAULT_THRESHOLDS))
+        holdings = b2.multiselect("Holding periods", [1, 2, 3, 6, 9, 12, 24], default=list(DEFAULT_HOLDINGS))
+        z_window = b3.slider("Gap z-score window (periods)", min_value=6, max_value=60, value=24, step=6)
+        if thresholds and holdings:
+            with st.spinner(f"Running {grid_cells({'USD/CAD': panel}, thresholds, holdings)} grid cells..."):
+                res = backtest_grid(panel, tuple(thresholds), tuple(holdings), z_window)
+            if res.empty:
+                st.info("Not enough history in the selected date range for the chosen z-score window.")
+            else:
+                best = res.loc[res["total_pnl_pct"].idxmax()]
+                st.metric("Best cell P&L (log %)", f"{best['total_pnl_pct']:.2f}",
+                          help=f"{best['model']}, z ≥ {best['threshold']}, hold {best['holding']}")
+                heat = res.pivot_table(index=["model", "holding"], columns="threshold", values="total_pnl_pct")
+                heat.index = [f"{m} · hold {h}" for m, h in heat.index]
+                fig_bt = px_figure(
+                    "imshow", heat, text_auto=".1f", aspect="auto", color_continuous_scale="RdBu", color_continuous_midpoint=0,
+                    labels={"x": "Z threshold", "y": "Model · holding", "color": "P&L %"},
+                    layout=DARK_LAYOUT,
+                )
+                st.plotly_chart(fig_bt, use_container_width=True)
+                st.dataframe(res, use_container_width=True)
+
 # ---------- Project Notes ----------
 st.markdown("---")
 st.subheader("📋 Project Task Notes")
@@ -241,3 +265,5 @@ task3 = st.checkbox("Add more FX pairs (EUR/USD, GBP/USD, etc.)")
 
 if task1:
     st.success("BEER model regression refinement task checked!")
+
+profiling.end()
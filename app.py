@@ -0,0 +1,27 @@
+# Access-Alpha — single multipage app
+# -----------------------------------
+# Runs the three dashboards as pages of one Streamlit server:
+#   streamlit run app.py
+# Shared resources (HTTP session, FRED client, series store) are st.cache_resource
+# singletons in resources.py, so they are built and warmed once per server. Each page
+# script still runs on its own with `streamlit run "<page>.py"`.
+
+import streamlit as st
+
+from resources import apply_theme, http_session, series_store
+
+st.set_page_config(page_title="Access-Alpha", page_icon="💱", layout="wide")
+
+pages = [
+    st.Page("cadVSusa.py", title="US vs Canada — CFA Dashboard", icon="🇨🇦", url_path="cad-vs-usa", default=True),
+    st.Page("Econ Dashboard.py", title="Retail Sales & H.8", icon="📊", url_path="econ"),
+    st.Page("FX Models.py", title="FX Valuation Models", icon="💱", url_path="fx-models"),
+]
+nav = st.navigation(pages)
+
+# Warm the process-wide singletons before the first page renders
+http_session()
+series_store()
+apply_theme()
+
+nav.run()
@@ -0,0 +1,130 @@
+# Valuation-gap backtest engine
+# -----------------------------
+# Turns the gap between a spot FX rate and each model fair value (valuation.py)
+# into mean-reversion signals and scores them over a grid of
+# pairs x models x thresholds x holding periods.
+#
+# - Gap = log(spot / fair), standardised with a trailing rolling z-score (no look-ahead).
+# - Signal = -sign(z) when |z| >= threshold (rich spot -> short, cheap spot -> long).
+# - Positions are overlapping holds: each signal is held for `holding` periods with
+#   weight 1/holding, built from cumulative sums instead of loops.
+# - One (pair, model, holding) job per worker; thresholds are vectorised inside the job.
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from valuation import MODEL_COLUMNS
+
+DEFAULT_THRESHOLDS = (0.5, 1.0, 1.5, 2.0)
+DEFAULT_HOLDINGS = (1, 3, 6, 12)
+
+
+# ---------- Inputs ----------
+
+def fx_panel(df: pd.DataFrame, spot_col: str = "Nominal USD/CAD") -> pd.DataFrame:
+    """Build a backtest panel from the FX Models frame: index Date, 'spot' + one column per model present."""
+    cols = {spot_col: "spot"}
+    cols.update({c: m for m, c in MODEL_COLUMNS.items() if c in df.columns})
+    panel = df.set_index("Date")[list(cols)].rename(columns=cols)
+    panel = panel.apply(pd.to_numeric, errors="coerce")
+    return panel.dropna(subset=["spot"]).sort_index()
+
+
+def gap_zscore(spot: np.ndarray, fair: np.ndarray, window: int) -> np.ndarray:
+    """Trailing z-score of log(spot / fair); NaN until `window` valid gaps exist."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        gap = np.log(spot / fair)
+    gap[~np.isfinite(gap)] = np.nan
+    g = pd.Series(gap)
+    m = g.rolling(window, min_periods=window).mean()
+    sd = g.rolling(window, min_periods=window).std()
+    return ((g - m) / sd).to_numpy()
+
+
+# ---------- Vectorised scoring ----------
+
+def _score(z: np.ndarray, ret: np.ndarray, thresholds: np.ndarray, holding: int) -> dict[str, np.ndarray]:
+    """Score every threshold for one holding period. z and ret are length T; ret[t] is the t -> t+1 log return."""
+    zz = np.nan_to_num(z)[:, None]
+    signal = np.where(np.abs(zz) >= thresholds[None, :], -np.sign(zz), 0.0)
+    signal[np.isnan(z)] = 0.0
+
+    # Overlapping holds: position[t] = mean(signal[t-holding+1 .. t])
+    csum = np.vstack([np.zeros((1, signal.shape[1])), np.cumsum(signal, axis=0)])
+    t = np.arange(1, len(z) + 1)
+    position = (csum[t] - csum[np.maximum(t - holding, 0)]) / holding
+
+    r = np.nan_to_num(ret)[:, None]
+    pnl = position * r
+    equity = np.cumsum(pnl, axis=0)
+    drawdown = equity - np.maximum.accumulate(np.maximum(equity, 0.0), axis=0)
+
+    active = (position != 0) & np.isfinite(ret)[:, None]
+    n_active = active.sum(axis=0)
+    hits = ((pnl > 0) & active).sum(axis=0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        hit_rate = np.where(n_active > 0, hits / n_active, np.nan)
+    return {
+        "signals": (signal != 0).sum(axis=0),
+        "active_periods": n_active,
+        "hit_rate": hit_rate,
+        "total_pnl_pct": equity[-1] * 100.0 if len(z) else np.zeros(len(thresholds)),
+        "max_drawdown_pct": drawdown.min(axis=0) * 100.0 if len(z) else np.zeros(len(thresholds)),
+    }
+
+
+def _run_job(job) -> list[dict]:
+    pair, model, spot, fair, thresholds, holding, z_window = job
+    z = gap_zscore(spot, fair, z_window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.append(np.log(spot[1:] / spot[:-1]), np.nan)
+    stats = _score(z, ret, thresholds, holding)
+    return [
+        {"pair": pair, "model": model, "threshold": float(thr), "holding": holding,
+         **{k: v[i].item() for k, v in stats.items()}}
+        for i, thr in enumerate(thresholds)
+    ]
+
+
+# ---------- Grid runner ----------
+
+def run_grid(
+    panels: dict[str, pd.DataFrame],
+    thresholds=DEFAULT_THRESHOLDS,
+    holdings=DEFAULT_HOLDINGS,
+    z_window: int = 36,
+    max_workers: int | None = None,
+) -> pd.DataFrame:
+    """Backtest every pair x model x threshold x holding cell.
+
+    panels: {pair_name: frame from fx_panel()}. max_workers=1 runs in-process.
+    Returns one row per grid cell.
+    """
+    thr = np.asarray(sorted(thresholds), dtype=float)
+    jobs = []
+    for pair, panel in panels.items():
+        for model in panel.columns.drop("spot"):
+            sub = panel[["spot", model]].dropna()
+            if len(sub) <= z_window:
+                continue
+            spot = sub["spot"].to_numpy(dtype=float)
+            fair = sub[model].to_numpy(dtype=float)
+            jobs += [(pair, model, spot, fair, thr, int(h), z_window) for h in holdings]
+
+    if not jobs:
+        return pd.DataFrame()
+    if max_workers == 1 or len(jobs) == 1:
+        results = map(_run_job, jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as ex:
+            results = list(ex.map(_run_job, jobs, chunksize=max(1, len(jobs) // 32)))
+    rows = [row for chunk in results for row in chunk]
+    return pd.DataFrame(rows).sort_values(["pair", "model", "holding", "threshold"], ignore_index=True)
+
+
+def grid_cells(panels: dict[str, pd.DataFrame], thresholds=DEFAULT_THRESHOLDS, holdings=DEFAULT_HOLDINGS) -> int:
+    """Number of grid cells run_grid would evaluate (before dropping short histories)."""
+    n_models = sum(len(p.columns) - 1 for p in panels.values())
+    return n_models * len(thresholds) * len(holdings)
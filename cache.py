@@ -0,0 +1,225 @@
+# Bounded memo cache for page-level data and transforms
+# -----------------------------------------------------
+# Replaces the unbounded @st.cache_data on functions whose key space grows with use (date
+# ranges, custom FRED id lists, transform choices). One process-wide cache holds every
+# memoised result under a byte budget:
+#   - sizes are measured per entry (DataFrame/Series memory_usage(deep=True), ndarray
+#     nbytes, containers summed), so the budget is in bytes, not entries;
+#   - over budget, entries are evicted LRU (default) or LFU (CACHE_POLICY=lfu);
+#   - each entry has its own TTL (memo(ttl=...)); expired entries are dropped when touched
+#     and on every insert sweep;
+#   - hits / misses / evictions / expirations are counted for the sidebar panel.
+# Keys are charts.fingerprint() of the function and its arguments, so frames can be passed
+# as arguments. Concurrent misses on one key are single-flighted.
+#
+# A memoised function that degrades instead of raising (a failed fetch replaced by an empty
+# frame plus st.warning) calls skip_cache(): that result, and the results of the memoised
+# calls it is nested in, are returned without being stored, so the next rerun retries and
+# shows the warning again.
+#
+# Results are shared between sessions. Frames are returned as shallow copies (pandas
+# copy-on-write keeps the cached one intact); other values must be treated as read-only.
+#
+# Settings: CACHE_BUDGET_MB (default 512), CACHE_POLICY (lru | lfu).
+
+from collections import OrderedDict
+import functools
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from charts import fingerprint
+from singleflight import FLIGHTS
+
+CACHE_BUDGET_MB = float(os.getenv("CACHE_BUDGET_MB", "512"))
+CACHE_POLICY = os.getenv("CACHE_POLICY", "lru").lower()
+
+
+def sizeof(obj, _seen=None) -> int:
+    """Approximate bytes held by obj (frames and arrays exactly, containers recursively)."""
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        return int(obj.memory_usage(deep=True, index=True).sum()) if isinstance(obj, pd.DataFrame) \
+            else int(obj.memory_usage(deep=True, index=True))
+    if isinstance(obj, pd.Index):
+        return int(obj.memory_usage(deep=True))
+    if isinstance(obj, np.ndarray):
+        return int(obj.nbytes)
+    _seen = _seen if _seen is not None else set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+    n = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        n += sum(sizeof(k, _seen) + sizeof(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        n += sum(sizeof(x, _seen) for x in obj)
+    elif hasattr(obj, "__dict__"):
+        n += sizeof(vars(obj), _seen)
+    return n
+
+
+def _fresh(v):
+    """Shallow copies of frames (also inside tuples/lists/dicts) so callers can reassign columns freely."""
+    if isinstance(v, (pd.DataFrame, pd.Series)):
+        return v.copy(deep=False)
+    if isinstance(v, tuple):
+        return tuple(_fresh(x) for x in v)
+    if isinstance(v, list):
+        return [_fresh(x) for x in v]
+    if isinstance(v, dict):
+        return {k: _fresh(x) for k, x in v.items()}
+    return v
+
+
+class _Entry:
+    __slots__ = ("value", "nbytes", "expires", "hits", "name")
+
+    def __init__(self, value, nbytes: int, expires: float, name: str):
+        self.value, self.nbytes, self.expires, self.name = value, nbytes, expires, name
+        self.hits = 0
+
+
+class BoundedCache:
+    """Byte-budgeted cache with LRU or LFU eviction and per-entry TTL."""
+
+    def __init__(self, budget_bytes: int, policy: str = "lru"):
+        if policy not in ("lru", "lfu"):
+            raise ValueError(f"policy must be 'lru' or 'lfu', not {policy!r}")
+        self.budget = int(budget_bytes)
+        self.policy = policy
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()   # oldest use first
+        self._lock = threading.Lock()
+        self.nbytes = 0
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "expirations": 0, "oversize": 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _drop(self, key: str, counter: str):
+        e = self._entries.pop(key)
+        self.nbytes -= e.nbytes
+        self.stats[counter] += 1
+
+    def get(self, key: str):
+        """(True, value) on a live hit, (False, None) otherwise."""
+        now = time.time()
+        with self._lock:
+            e = self._entries.get(key)
+            if e is not None and e.expires <= now:
+                self._drop(key, "expirations")
+                e = None
+            if e is None:
+                self.stats["misses"] += 1
+                return False, None
+            e.hits += 1
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return True, e.value
+
+    def put(self, key: str, value, ttl: float | None = None, name: str = ""):
+        nbytes = sizeof(value)
+        if nbytes > self.budget:
+            self.stats["oversize"] += 1          # never cache something that would evict everything
+            return
+        now = time.time()
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._entries[key] = _Entry(value, nbytes, now + ttl if ttl else float("inf"), name)
+            self.nbytes += nbytes
+            for k in [k for k, e in self._entries.items() if e.expires <= now]:
+                self._drop(k, "expirations")
+            while self.nbytes > self.budget:
+                self._drop(self._victim(exclude=key), "evictions")
+
+    def _victim(self, exclude: str) -> str:
+        if self.policy == "lru":
+            return next(k for k in self._entries if k != exclude)
+        # LFU: fewest hits, ties broken by least recent use (iteration order)
+        return min((k for k in self._entries if k != exclude), key=lambda k: self._entries[k].hits)
+
+    def clear(self, name: str | None = None):
+        """Drop every entry, or only those memoised for function `name`."""
+        with self._lock:
+            for k in [k for k, e in self._entries.items() if name is None or e.name == name]:
+                self.nbytes -= self._entries.pop(k).nbytes
+
+    def info(self) -> dict:
+        with self._lock:
+            by_fn: dict[str, list] = {}
+            for e in self._entries.values():
+                c = by_fn.setdefault(e.name, [0, 0])
+                c[0] += 1
+                c[1] += e.nbytes
+            return {**self.stats, "entries": len(self._entries), "bytes": self.nbytes,
+                    "budget": self.budget, "policy": self.policy, "by_function": by_fn}
+
+
+CACHE = BoundedCache(int(CACHE_BUDGET_MB * 1024 * 1024), CACHE_POLICY)
+
+_computing = threading.local()      # per thread: one [skip] flag per memo call being computed
+
+
+def skip_cache():
+    """Inside a memoised call: do not store its result (nor those of the memo calls around it)."""
+    for flag in getattr(_computing, "stack", ()):
+        flag[0] = True
+
+
+def memo(ttl: float | None = None, cache: BoundedCache | None = None):
+    """Memoise fn in the bounded cache; drop-in for @st.cache_data(ttl=...).
+    The wrapped function gains .clear() like Streamlit's."""
+    def deco(fn):
+        name = f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            c = CACHE if cache is None else cache
+            key = fingerprint(name, args, kwargs)
+            hit, value = c.get(key)
+            if not hit:
+                def compute():
+                    stack = _computing.__dict__.setdefault("stack", [])
+                    flag = [False]
+                    stack.append(flag)
+                    try:
+                        value = fn(*args, **kwargs)
+                    finally:
+                        stack.pop()
+                    if not flag[0]:
+                        c.put(key, value, ttl, name)
+                    return value, flag[0]
+                (value, skipped), _ = FLIGHTS.do(("memo", key), compute)   # concurrent misses wait for one call
+                if skipped:
+                    skip_cache()        # a waiter nested in its own memo call must not store it either
+            return _fresh(value)
+
+        wrapper.clear = lambda: (CACHE if cache is None else cache).clear(name)
+        return wrapper
+    return deco
+
+
+def cache_controls():
+    """Sidebar expander with memo cache usage and a clear button."""
+    import streamlit as st
+
+    with st.sidebar.expander("🧠 Data cache", expanded=False):
+        i = CACHE.info()
+        total = i["hits"] + i["misses"]
+        st.caption(f"{i['entries']} entries · {i['bytes'] / 1e6:.1f} / {i['budget'] / 1e6:.0f} MB · "
+                   f"{i['policy'].upper()} · hit rate {i['hits'] / total:.0%}" if total else
+                   f"{i['entries']} entries · budget {i['budget'] / 1e6:.0f} MB · {i['policy'].upper()}")
+        st.caption(f"{i['evictions']} evicted · {i['expirations']} expired · {i['oversize']} too large to cache")
+        if i["by_function"]:
+            st.dataframe(
+                pd.DataFrame([(fn.rsplit(".", 1)[-1], n, b / 1e6) for fn, (n, b) in i["by_function"].items()],
+                             columns=["function", "entries", "MB"]).sort_values("MB", ascending=False),
+                hide_index=True, use_container_width=True,
+            )
+        if st.button("Clear data cache"):
+            CACHE.clear()
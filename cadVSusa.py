@@ -4,7 +4,8 @@
 #   pip install streamlit requests pandas numpy plotly python-dateutil
 # 
 # How to run:
-#   streamlit run fred_statcan_cfa.py
+#   streamlit run cadVSusa.py        (standalone)
+#   streamlit run app.py             (all dashboards as one multipage app)
 # 
 # Notes:
 # - Set your FRED API key via environment variable FRED_API_KEY or the sidebar input.
@@ -13,90 +14,96 @@
 # - This dashboard compares classic CFA macro indicators between the U.S. (FRED) and Canada (StatCan vectors).
 #   You can keep extending the SERIES_MAP below — or use the "extra vectors" box to overlay any StatCan vector(s).
 
-import os
 from datetime import date, datetime
 from dateutil.relativedelta import relativedelta
 
 import numpy as np
 import pandas as pd
-import requests
 import streamlit as st
 import plotly.express as px
+import plotly.graph_objects as go
+
+import profiling
+from derived import DerivedEngine, is_plain_id, leaf_ids, split_expressions
+from endpoints import FRED_API, STATCAN_WDS
+from events import change_events, event_study, event_table, run_events
+from export import export_controls, store_batches
+from ingest import table_ingest_controls
+from regression import grouped_ols, rolling_ols, stack_periods, subperiods
+from rolling import corr_sweep, lag_ratio_2d, moving_average_2d, rolling_zscore_2d, zscore_sweep
+from cache import cache_controls, memo
+from charts import cached_figure, px_figure
+from refresh import CACHE_TTL_S
+from resources import (DARK_LAYOUT, apply_theme, default_fred_key, fred_metadata, http_session, rolling_state,
+                       series_store)
+from store import read_through, series_key, snapshot_controls
 
 # ---------- Page Config & Dark Styling ----------
 st.set_page_config(page_title="FRED vs StatCan — CFA Econ Dashboard", layout="wide")
+profiling.begin("cadVSusa")
 
-DARK_BG = "#0e1014"
-PRIMARY_TEXT = "#e5e7eb"
-
-st.markdown(
-    f"""
-    <style>
-      .stApp {{ background-color: {DARK_BG}; color: {PRIMARY_TEXT}; }}
-      .sidebar .sidebar-content {{ background-color: {DARK_BG}; }}
-    </style>
-    """,
-    unsafe_allow_html=True,
-)
+apply_theme()
+series_store()   # shared store; starts the background refresher once per server
 
 # ---------- Helper: Plotly dark template ----------
 
+def _dark(title=None) -> dict:
+    """Dark theme (+ title) as a layout dict, for px_figure(..., layout=_dark(title))."""
+    return {**DARK_LAYOUT, **({"title": title} if title else {})}
+
 def _darken(fig, title=None):
-    fig.update_layout(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
-    if title:
-        fig.update_layout(title=title)
+    fig.update_layout(**_dark(title))
     return fig
 
 # ---------- Data access: FRED ----------
-FRED_BASE = "https://api.stlouisfed.org/fred/series/observations"
-FRED_SERIES_META = "https://api.stlouisfed.org/fred/series"
+FRED_BASE = f"{FRED_API}/series/observations"
 
-@st.cache_data(show_spinner=False)
-def fred_observations(series_id: str, start: str, end: str, api_key: str) -> pd.DataFrame:
-    """Fetch monthly observations for a FRED series. start/end: 'YYYY-MM' strings."""
+def _fred_monthly(series_id: str, start: str | None, end: str) -> pd.Series:
+    """Network fetch of FRED's monthly aggregation between two YYYY-MM-DD dates."""
     params = {
         "series_id": series_id,
         "api_key": fred_key,
-        "observation_start": f"{start}-01",
-        "observation_end": f"{end}-28",
+        "observation_end": end,
         "frequency": "m",
         "file_type": "json",
         "units": "lin",
     }
-    r = requests.get(FRED_BASE, params=params, timeout=30)
+    if start:
+        params["observation_start"] = start
+    r = http_session().get(FRED_BASE, params=params, timeout=30)
     r.raise_for_status()
-    j = r.json()
-    obs = pd.DataFrame(j.get("observations", []))
+    obs = pd.DataFrame(r.json().get("observations", []))
     if obs.empty:
-        return pd.DataFrame(columns=["date", "value"]).assign(source="FRED", series=series_id)
-    obs["date"] = pd.to_datetime(obs["date"]).dt.tz_localize(None)
-    # Numeric coercion; FRED sometimes uses '.' for missing values
-    obs["value"] = pd.to_numeric(obs["value"], errors="coerce")
-    obs = obs[["date", "value"]].rename(columns={"value": series_id}).set_index("date").sort_index()
+        return pd.Series(dtype=float)
+    # Raw strings: the store's validation (quality.py) coerces FRED's '.' placeholders
+    return pd.Series(obs["value"].values, index=pd.to_datetime(obs["date"]))
+
+@profiling.timed("fetch")
+@memo(ttl=CACHE_TTL_S)
+def fred_observations(series_id: str, start: str, end: str, api_key: str) -> pd.DataFrame:
+    """Monthly observations for a FRED series. start/end: 'YYYY-MM' strings.
+    Served from the series store; only dates it does not cover yet are fetched."""
+    s = read_through(series_key("FRED", series_id, "m"), f"{start}-01", f"{end}-28",
+                     lambda a, b: _fred_monthly(series_id, a, b))
+    obs = s.rename(series_id).rename_axis("date").to_frame()
     obs["source"] = "FRED"
     obs["series"] = series_id
     return obs
 
-@st.cache_data(show_spinner=False)
+@profiling.timed("fetch")
 def fred_series_title(series_id: str, api_key: str) -> str:
+    """Title from the shared FRED metadata cache (which also tracks last_updated for refreshes)."""
     try:
-        params = {"series_id": series_id, "api_key": fred_key, "file_type": "json"}
-        r = requests.get(FRED_SERIES_META, params=params, timeout=30)
-        r.raise_for_status()
-        j = r.json()
-        items = j.get("seriess", []) or j.get("series", [])
-        if items:
-            return items[0].get("title", series_id)
+        return fred_metadata().get(series_id, api_key=api_key)["title"] or series_id
     except Exception:
-        pass
-    return series_id
+        return series_id
 
 # ---------- Data access: Statistics Canada WDS (Vectors) ----------
 # Docs: https://www.statcan.gc.ca/en/developers/wds/user-guide  
 # Method used: getDataFromVectorByReferencePeriodRange
-STATCAN_WDS = "https://www150.statcan.gc.ca/t1/wds/rest"
 
-@st.cache_data(show_spinner=False)
+@profiling.timed("fetch")
+@memo(ttl=CACHE_TTL_S)
 def statcan_vector_by_ref_period(vector_code: str, start: str, end: str) -> pd.DataFrame:
     """Fetch StatCan *vector* data for a reference period range (YYYY-MM to YYYY-MM).
     Accepts vectors like 'v41690973' or '41690973'. Returns DataFrame indexed by datetime.
@@ -115,50 +122,55 @@ def statcan_vector_by_ref_period(vector_code: str, start: str, end: str) -> pd.D
             return s + "-01-01"
         return s
 
-    params = {
-        "vectorIds": vid,
-        "startRefPeriod": _norm_ref(start),
-        "endReferencePeriod": _norm_ref(end),
-    }
-
-    url = f"{STATCAN_WDS}/getDataFromVectorByReferencePeriodRange"
-    try:
-        r = requests.get(url, params=params, timeout=30)
-        # During ~00:00–08:30 ET some methods may return 409 while tables are locked
-        if r.status_code == 409:
-            raise RuntimeError(
-                "StatCan WDS temporarily unavailable (HTTP 409) during nightly update window. Try again after 08:30 ET."
-            )
-        r.raise_for_status()
-        resp = r.json()
-    except Exception as e:
-        raise RuntimeError(f"StatCan request failed: {e}")
-
-    entry = resp[0] if isinstance(resp, list) and resp else resp
-    obj = entry.get("object", {}) if isinstance(entry, dict) else {}
-    datapoints = obj.get("vectorDataPoint", []) if isinstance(obj, dict) else []
-
-    rows = []
-    for dp in datapoints:
-        ref = dp.get("refPer") or dp.get("refPeriod") or dp.get("REF_DATE")
-        val = dp.get("value") or dp.get("VAL") or dp.get("VALUE")
-        if not ref:
-            continue
+    def _fetch(a: str | None, b: str) -> pd.Series:
+        params = {
+            "vectorIds": vid,
+            "startRefPeriod": _norm_ref(a or "1900-01"),
+            "endReferencePeriod": _norm_ref(b),
+        }
+        url = f"{STATCAN_WDS}/getDataFromVectorByReferencePeriodRange"
         try:
-            dt = datetime.strptime(ref[:10], "%Y-%m-%d").date()
-        except Exception:
-            continue
-        rows.append((dt, pd.to_numeric(val, errors="coerce")))
-
-    df = pd.DataFrame(rows, columns=["date", vector_code]).dropna()
-    if df.empty:
+            r = http_session().get(url, params=params, timeout=30)
+            # During ~00:00–08:30 ET some methods may return 409 while tables are locked
+            if r.status_code == 409:
+                raise RuntimeError(
+                    "StatCan WDS temporarily unavailable (HTTP 409) during nightly update window. Try again after 08:30 ET."
+                )
+            r.raise_for_status()
+            resp = r.json()
+        except Exception as e:
+            raise RuntimeError(f"StatCan request failed: {e}")
+
+        entry = resp[0] if isinstance(resp, list) and resp else resp
+        obj = entry.get("object", {}) if isinstance(entry, dict) else {}
+        datapoints = obj.get("vectorDataPoint", []) if isinstance(obj, dict) else []
+
+        rows = []
+        for dp in datapoints:
+            ref = dp.get("refPer") or dp.get("refPeriod") or dp.get("REF_DATE")
+            val = dp.get("value") or dp.get("VAL") or dp.get("VALUE")
+            if not ref:
+                continue
+            try:
+                dt = datetime.strptime(ref[:10], "%Y-%m-%d").date()
+            except Exception:
+                continue
+            rows.append((dt, val))
+
+        return pd.Series([v for _, v in rows], index=pd.to_datetime([d for d, _ in rows]), dtype=object)
+
+    s = read_through(series_key("StatCan", f"v{vid}"), _norm_ref(start), _norm_ref(end), _fetch)
+    if s.empty:
         return pd.DataFrame(columns=[vector_code]).assign(source="StatCan").set_index(pd.to_datetime([]))
-    df["date"] = pd.to_datetime(df["date"]).dt.tz_localize(None)
-    df = df.set_index("date").sort_index()
+    # Stored series are already numeric, sorted and tz-naive (validated at ingest)
+    df = s.rename(vector_code).rename_axis("date").to_frame()
     df["source"] = "StatCan"
     return df
 
 # ---------- CFA helpers ----------
+# Full-history versions, used for derived expressions. Plain ids go through
+# rolling_state().transformed() / .correlation(): rolling.py keeps their state per store key
+# and only feeds it newly stored points.
 
 def pct_yoy(s: pd.Series) -> pd.Series:
     return (s / s.shift(12) - 1.0) * 100.0
@@ -201,6 +213,25 @@ def rolling_corr(a: pd.Series, b: pd.Series, window: int = 24) -> pd.Series:
     idx = a.index.intersection(b.index)
     return a.loc[idx].rolling(window).corr(b.loc[idx])
 
+
+# Op pipelines (rolling.OPS) equivalent to the helpers above
+TRANSFORM_OPS = {"yoy": (("lag", 12),), "3m/3m ann.": (("lag", 3, 4.0),)}
+
+
+def transform_ops(mode: str, smooth: bool) -> tuple:
+    return ((("ma", 3),) if smooth else ()) + TRANSFORM_OPS.get(mode, ())
+
+
+def store_key_of(source: str, sid: str) -> str:
+    """Series-store key the fetchers below use for a FRED id (monthly) or StatCan vector."""
+    return (series_key("FRED", sid, "m") if source == "FRED"
+            else series_key("StatCan", f"v{int(str(sid).lower().lstrip('v'))}"))
+
+
+def plain_store_key(expr: str) -> str | None:
+    """Store key of an expression that is a single series id; None for derived expressions."""
+    return store_key_of(*leaf_ids(expr)[0]) if is_plain_id(expr) else None
+
 # ---------- Default mappings (extensible) ----------
 # Verified vectors/series:
 #  - Canada CPI all-items:            v41690973  (StatCan; CPI all-items)  
@@ -218,6 +249,9 @@ def rolling_corr(a: pd.Series, b: pd.Series, window: int = 24) -> pd.Series:
 #  - US 2Y:                           DGS2  
 #  - US 3M T-bill:                    TB3MS  
 #  - US 10Y-2Y spread:                T10Y2Y
+#
+# US_FRED / CA_STATCAN accept derived-series expressions (see derived.py), e.g.
+# "v122543 - v122538" or "DGS10 - yoy(CPIAUCSL)".
 
 SERIES_MAP = {
     "Inflation (CPI, all items)": {
@@ -257,7 +291,12 @@ SERIES_MAP = {
     },
     "Yield curve (10Y–2Y spread)": {
         "US_FRED": "T10Y2Y",   # percentage points
-        "CA_STATCAN": "v122543_minus_v122538",  # handled specially below
+        "CA_STATCAN": "v122543 - v122538",
+        "transform": "level",
+    },
+    "Real 10Y yield (10Y − CPI YoY)": {
+        "US_FRED": "DGS10 - yoy(CPIAUCSL)",
+        "CA_STATCAN": "v122543 - yoy(v41690973)",
         "transform": "level",
     },
 }
@@ -287,6 +326,9 @@ CFA_NOTES = {
     "Yield curve (10Y–2Y spread)": (
         "The 10s–2s slope (pp) is a popular recession signal once sustained inversion occurs; compare timing vs subsequent labour-market weakness."
     ),
+    "Real 10Y yield (10Y − CPI YoY)": (
+        "Ex-post real yields (nominal less trailing inflation) gauge how restrictive financial conditions are; real-rate gaps drive carry and FX."
+    ),
 }
 
 # ---------- Sidebar Controls ----------
@@ -303,19 +345,9 @@ st.sidebar.markdown("### 🔑 FRED API Key")
 # Define a safe default first — so it's always defined
 fred_key = ""
 
-# 1️⃣ Try loading from environment variable
-if os.getenv("FRED_API_KEY"):
-    fred_key = os.getenv("FRED_API_KEY")
-
-# 2️⃣ Try loading from file if not found
-else:
-    try:
-        KEYS_PATH = os.path.expanduser(r"C:\Users\nilee\Sharia\keys.txt")  # cross-platform safe path
-        if os.path.exists(KEYS_PATH):
-            with open(KEYS_PATH, "r") as f:
-                fred_key = f.read().strip()
-    except Exception as e:
-        st.sidebar.warning(f"Error reading key file: {e}")
+with profiling.section("keys"):
+    # 1️⃣ / 2️⃣ Environment variable, then key file (read once per server)
+    fred_key = default_fred_key()
 
 # 3️⃣ Let user manually input or override via sidebar
 fred_key = st.sidebar.text_input(
@@ -335,6 +367,12 @@ if not fred_key:
     st.stop()
 
 st.sidebar.checkbox("Smooth (3-month MA)", key="smooth3", value=False)
+panel_mode = st.sidebar.checkbox(
+    "Panel mode (all metrics)", value=False,
+    help="Load every metric for both countries at once and show a metrics × time divergence heatmap.",
+)
+snapshot_controls()
+cache_controls()
 
 min_start = date(1990, 1, 1)
 end_default = date.today().replace(day=1)
@@ -346,10 +384,14 @@ end_date = st.sidebar.date_input("End (YYYY-MM)", value=end_default, min_value=m
 
 st.sidebar.markdown("---")
 user_vectors = st.sidebar.text_input(
-    "StatCan extra vectors (comma-separated v#)",
+    "StatCan extra vectors (comma-separated v# or expressions)",
     value="",
-    help="Optional: add more Canadian vectors to overlay (e.g., v41690973).",
+    help="Optional: add more series to overlay (e.g., v41690973, v122543 - DGS10, v122530 - yoy(v41690973)).",
 )
+with st.sidebar.expander("📦 Load a full StatCan table", expanded=False):
+    st.caption("Stores every vector of the table locally (no per-vector WDS calls, works through the lock window). "
+               "Use the vector ids below in the extra vectors box.")
+    table_ingest_controls(http_session())
 
 # ---------- Data fetch ----------
 period_start = start_date.strftime("%Y-%m")
@@ -361,41 +403,43 @@ ca_key = SERIES_MAP[module]["CA_STATCAN"]
 if not fred_key:
     st.warning("Enter your FRED API key in the sidebar to fetch US series.")
 
-# Fetch US
-us_df = fred_observations(us_id, period_start, period_end, fred_key) if fred_key else pd.DataFrame()
-if not us_df.empty:
-    us_title = fred_series_title(us_id, fred_key)
-else:
-    us_title = us_id
-
-# Fetch Canada (handle special modules if needed)
-if module == "Yield curve (10Y–2Y spread)":
-    # Canada 10Y minus 2Y using StatCan vectors
-    ca10 = statcan_vector_by_ref_period("v122543", period_start, period_end)
-    ca02 = statcan_vector_by_ref_period("v122538", period_start, period_end)
-    cad = (
-        pd.concat([ca10["v122543"], ca02["v122538"]], axis=1)
-        .rename(columns={"v122543": "CA10", "v122538": "CA02"})
-    )
-    cad["Canada"] = cad["CA10"] - cad["CA02"]
-    ca_df = cad[["Canada"]]
-    ca_vec_label = "10Y-2Y (pp)"
-else:
-    ca_df = statcan_vector_by_ref_period(ca_key, period_start, period_end)
-    ca_vec_label = ca_key
 
-# Optional extra Canadian vectors
+def resolve_series(source: str, series_id: str) -> pd.Series:
+    """Leaf loader for derived-series expressions (cached fetchers, current period)."""
+    if source == "FRED":
+        obs = fred_observations(series_id, period_start, period_end, fred_key)
+        return obs[series_id] if series_id in obs.columns else pd.Series(dtype=float)
+    return statcan_vector_by_ref_period(series_id, period_start, period_end)[series_id]
+
+
+# One engine per session: shared inputs load once per pass, unchanged nodes are reused across reruns
+derived_engine = st.session_state.setdefault("derived_engine", DerivedEngine())
+
+# Fetch US + Canada (plain ids or derived expressions) in one pass
+us_series, ca_series = derived_engine.evaluate_many([us_id, ca_key], resolve_series)
+us_df = us_series.to_frame(us_id) if not us_series.empty else pd.DataFrame()
+us_title = fred_series_title(us_id, fred_key) if not us_df.empty and is_plain_id(us_id) else us_id
+ca_df = ca_series.to_frame(ca_key)
+ca_vec_label = ca_key
+
+# Optional extra Canadian vectors / expressions
 extra = []
 if user_vectors.strip():
-    for vec in [v.strip() for v in user_vectors.split(",") if v.strip()]:
+    for vec in split_expressions(user_vectors):
         try:
-            extra.append(statcan_vector_by_ref_period(vec, period_start, period_end))
+            extra.append(derived_engine.evaluate(vec, resolve_series).to_frame(vec))
         except Exception as e:
             st.sidebar.error(f"Failed to fetch {vec}: {e}")
 
 # ---------- Transformations ----------
 
+@profiling.timed("transforms")
 def apply_transform(df: pd.DataFrame, series_col: str, mode: str) -> pd.Series:
+    key = plain_store_key(series_col)
+    if key is not None and key in series_store():
+        # incremental per-key state over the full stored history, cut to the frame's dates
+        ops = transform_ops(mode, st.session_state.get("smooth3", False))
+        return rolling_state().transformed(key, ops).reindex(df.index).rename(series_col)
     s = df[series_col].astype(float)
     if st.session_state.get("smooth3"):
         s = s.rolling(3).mean()
@@ -405,6 +449,140 @@ def apply_transform(df: pd.DataFrame, series_col: str, mode: str) -> pd.Series:
         return pct_qoq_annualized(s)
     return s
 
+PHILLIPS_INPUTS = {
+    "US": {"infl": "CPIAUCSL", "unemp": "UNRATE"},
+    "Canada": {"infl": "v41690973", "unemp": "v2062815"},
+}
+
+
+@profiling.timed("transforms")
+@memo(ttl=CACHE_TTL_S)
+def phillips_service(start: str, end: str, api_key: str, smooth: bool, breaks: tuple, window: int):
+    """CPI YoY vs unemployment per country, with full/subperiod OLS fits and rolling slopes (closed form)."""
+    dfs = {}
+    for country, ids in PHILLIPS_INPUTS.items():
+        if country == "US":
+            if not api_key:
+                continue
+            infl = fred_observations(ids["infl"], start, end, api_key)[ids["infl"]]
+            unemp = fred_observations(ids["unemp"], start, end, api_key)[ids["unemp"]]
+        else:
+            infl = statcan_vector_by_ref_period(ids["infl"], start, end)[ids["infl"]]
+            unemp = statcan_vector_by_ref_period(ids["unemp"], start, end)[ids["unemp"]]
+        infl, unemp = infl.astype(float), unemp.astype(float)
+        if smooth:
+            infl, unemp = infl.rolling(3).mean(), unemp.rolling(3).mean()
+        dfs[country] = pd.concat([pct_yoy(infl).rename("Inflation"), unemp.rename("Unemployment")], axis=1).dropna()
+
+    long = pd.concat(
+        [stack_periods(d, subperiods(d.index, breaks)).assign(country=c) for c, d in dfs.items()]
+    )
+    fits = grouped_ols(long, "Unemployment", "Inflation", ["country", "period"])
+    roll = pd.concat(
+        {c: rolling_ols(d["Unemployment"], d["Inflation"], window)["slope"] for c, d in dfs.items()}, axis=1
+    )
+    roll.index.name = "date"
+    return dfs, fits, roll
+
+
+def phillips_figure(d: pd.DataFrame, fits: pd.DataFrame, breaks, title: str) -> go.Figure:
+    """Scatter of one country's points with a fitted line per period from the cached fits."""
+    if breaks:
+        per = stack_periods(d, subperiods(d.index, breaks))
+        per = per[per["period"] != "Full"]
+        fig = px.scatter(per, x="Unemployment", y="Inflation", color="period")
+    else:
+        fig = px.scatter(d, x="Unemployment", y="Inflation")
+    xs = np.array([d["Unemployment"].min(), d["Unemployment"].max()])
+    for _, f in fits.iterrows():
+        if breaks and f["period"] == "Full":
+            continue
+        fig.add_trace(go.Scatter(
+            x=xs, y=f["intercept"] + f["slope"] * xs, mode="lines",
+            name=f"{f['period']}: slope {f['slope']:.2f}, R² {f['r2']:.2f}",
+        ))
+    return _darken(fig, title=title)
+
+
+def window_surface(values: np.ndarray, index, windows, zlabel: str, title: str, zmid=0.0):
+    """Heatmap of a (window x time) sweep; columns before any window is full are dropped."""
+    keep = ~np.isnan(values).all(axis=0)
+    return px_figure(
+        "imshow", values[:, keep], x=index[keep], y=windows, aspect="auto", origin="lower",
+        color_continuous_scale="RdBu_r", color_continuous_midpoint=zmid,
+        labels={"x": "Date", "y": "Window (months)", "color": zlabel}, layout=_dark(title),
+    )
+
+
+@profiling.timed("merge")
+def load_panel() -> pd.DataFrame:
+    """Every SERIES_MAP metric for both countries, evaluated in one engine pass and aligned on month start.
+    Columns are a (country, metric) MultiIndex."""
+    metrics = list(SERIES_MAP)
+    exprs = [SERIES_MAP[m]["US_FRED"] for m in metrics] + [SERIES_MAP[m]["CA_STATCAN"] for m in metrics]
+    series = derived_engine.evaluate_many(exprs, resolve_series)
+    keys = [("US", m) for m in metrics] + [("Canada", m) for m in metrics]
+    return pd.concat(dict(zip(keys, series)), axis=1, sort=True).resample("MS").last()
+
+
+def panel_store_keys() -> list[str]:
+    """Series-store keys of every FRED / StatCan input referenced by SERIES_MAP."""
+    keys = []
+    for m in SERIES_MAP.values():
+        for source, sid in leaf_ids(m["US_FRED"]) + leaf_ids(m["CA_STATCAN"]):
+            key = store_key_of(source, sid)
+            if key not in keys:
+                keys.append(key)
+    return keys
+
+
+@profiling.timed("transforms")
+def panel_zspreads(panel: pd.DataFrame, smooth: bool, window: int) -> pd.DataFrame:
+    """Apply each metric's default transform, rolling z-scores and US − Canada z-spreads
+    across all columns of the panel in one vectorised pass. Returns time × metric z-spreads."""
+    X = panel.to_numpy(dtype=float)
+    if smooth:
+        X = moving_average_2d(X, 3)
+    modes = np.array([SERIES_MAP[m]["transform"] for _, m in panel.columns])
+    X = np.where(modes == "yoy", lag_ratio_2d(X, 12), X)
+    X = np.where(modes == "3m/3m ann.", lag_ratio_2d(X, 3, 4.0), X)
+    Z = rolling_zscore_2d(X, window)
+    n = len(SERIES_MAP)
+    return pd.DataFrame(Z[:, :n] - Z[:, n:], index=panel.index, columns=list(SERIES_MAP))
+
+
+def render_panel():
+    st.markdown("### 🇺🇸 vs 🇨🇦  All metrics — divergence panel")
+    pz_window = st.slider("Panel z-score window (months)", min_value=6, max_value=36, value=13)
+    try:
+        panel = load_panel()
+    except Exception as e:
+        st.error(f"Could not load the full panel: {e}")
+        return
+    zs = panel_zspreads(panel, bool(st.session_state.get("smooth3")), pz_window).dropna(how="all")
+    if zs.empty:
+        st.error("Not enough history for the selected z-score window.")
+        return
+    heat = px_figure(
+        "imshow", zs.T, x=zs.index, y=zs.columns, aspect="auto", color_continuous_scale="RdBu_r",
+        color_continuous_midpoint=0, labels={"x": "Date", "y": "Metric", "color": "z-spread"},
+        layout=_dark(f"US − Canada z-score spread ({pz_window}m), default transform per metric"),
+    )
+    st.plotly_chart(heat, use_container_width=True)
+    latest = zs.ffill().iloc[-1].rename("Latest z-spread").to_frame()
+    latest_fig = px_figure("bar", latest.reset_index(), x="Latest z-spread", y="index", orientation="h",
+                           labels={"index": "Metric"}, layout=_dark("Latest z-spread by metric"))
+    st.plotly_chart(latest_fig, use_container_width=True)
+    st.caption("Positive = US high relative to its own recent history vs Canada; negative = Canada higher.")
+    with st.expander("Export panel"):
+        st.caption("Aligned monthly panel (one column per country × metric).")
+        export_controls(panel.set_axis([f"{c} — {m}" for c, m in panel.columns], axis=1), "cadvsusa_panel",
+                        key="export_panel")
+        st.caption("Raw stored inputs, long format (series, date, value), straight from the series store.")
+        keys = panel_store_keys()
+        export_controls(lambda: store_batches(keys), "cadvsusa_panel_inputs", key="export_panel_raw")
+
+
 main_col, side_col = st.columns([0.72, 0.28])
 
 # Title
@@ -416,11 +594,8 @@ frames = []
 if not us_df.empty:
     frames.append(apply_transform(us_df, us_id, transform).rename("US"))
 
-# Canada main series (or spread)
-if module == "Yield curve (10Y–2Y spread)":
-    frames.append(apply_transform(ca_df, "Canada", transform).rename("Canada"))
-else:
-    frames.append(apply_transform(ca_df, ca_vec_label, transform).rename("Canada"))
+# Canada main series (or derived expression)
+frames.append(apply_transform(ca_df, ca_vec_label, transform).rename("Canada"))
 
 # Extra Canadian vectors from sidebar
 for dfv in extra:
@@ -431,7 +606,10 @@ for dfv in extra:
 combo = pd.concat(frames, axis=1).sort_index()
 
 # ---------- Charts ----------
-if combo.dropna(how="all").empty:
+if panel_mode:
+    with main_col:
+        render_panel()
+elif combo.dropna(how="all").empty:
     st.error("No data to display with the current settings.")
 else:
     # Decide if metric is rate-like (avoid rebasing) for level plots
@@ -457,16 +635,18 @@ else:
 
     # --- Overview (main timeseries) ---
     with tab_over:
-        fig = px.line(
+        subtitle = (
+            f"{module} — {transform}{' (3m MA)' if st.session_state.get('smooth3') else ''}"
+        )
+        fig = px_figure(
+            "line",
             plot_df.reset_index(),
             x="date",
-            y=plot_df.columns,
+            y=list(plot_df.columns),
             labels={"value": ylab, "date": "Date", "variable": "Series"},
+            layout=_dark(subtitle),
         )
-        subtitle = (
-            f"{module} — {transform}{' (3m MA)' if st.session_state.get('smooth3') else ''}"
-        )
-        st.plotly_chart(_darken(fig, title=subtitle), use_container_width=True)
+        st.plotly_chart(fig, use_container_width=True)
 
         # Lead/Lag bar (US vs CA)
         if "US" in combo.columns and "Canada" in combo.columns:
@@ -475,8 +655,8 @@ else:
             bc = float(best["corr"]) if not pd.isna(best["corr"]) else np.nan
             c1, c2 = st.columns([0.6, 0.4])
             with c1:
-                lf = px.bar(corr_df, x="lag", y="corr")
-                st.plotly_chart(_darken(lf), use_container_width=True)
+                lf = px_figure("bar", corr_df, x="lag", y="corr", layout=_dark())
+                st.plotly_chart(lf, use_container_width=True)
             with c2:
                 st.metric("Max |corr|", f"{bc:.2f}", help="Correlation at lag with highest absolute value")
                 st.caption("Positive lag ⇒ Canada lags US")
@@ -489,25 +669,59 @@ else:
                 s_ca = rebase_100(combo["Canada"]) 
             else:
                 s_us, s_ca = combo["US"], combo["Canada"]
-            zu, zc = rolling_zscore(s_us), rolling_zscore(s_ca)
+            keys = (plain_store_key(us_id), plain_store_key(ca_key))
+            if all(k is not None and k in series_store() for k in keys):
+                # z-scores are scale free, so rebasing does not change them
+                ops = transform_ops(transform, st.session_state.get("smooth3", False)) + (("z", 13),)
+                zu, zc = (rolling_state().transformed(k, ops).reindex(combo.index) for k in keys)
+            else:
+                zu, zc = rolling_zscore(s_us), rolling_zscore(s_ca)
             spread = (zu - zc)
-            fig2 = px.line(
+            fig2 = px_figure(
+                "line",
                 pd.DataFrame({"date": spread.index, "z-spread": spread.values}),
                 x="date",
                 y="z-spread",
+                layout=_dark("US–Canada z-score spread (13m)"),
             )
-            st.plotly_chart(_darken(fig2, title="US–Canada z-score spread (13m)"), use_container_width=True)
+            st.plotly_chart(fig2, use_container_width=True)
             latest = spread.dropna().iloc[-1] if not spread.dropna().empty else np.nan
             st.metric("Current z-spread", f"{latest:.2f}")
+
+            st.markdown("**Window sensitivity**")
+            z_lo, z_hi = st.slider("z-score windows (months)", min_value=3, max_value=120, value=(6, 60), key="z_sweep")
+            windows = np.arange(z_lo, z_hi + 1)
+            surface = zscore_sweep(s_us.to_numpy(), windows) - zscore_sweep(s_ca.to_numpy(), windows)
+            st.plotly_chart(
+                window_surface(surface, spread.index, windows, "z-spread",
+                               title=f"US–Canada z-score spread by window ({z_lo}–{z_hi}m)"),
+                use_container_width=True,
+            )
         else:
             st.info("Need both US and Canada series for divergence.")
 
     # --- Rolling correlation ---
     with tab_rcorr:
         if "US" in combo.columns and "Canada" in combo.columns:
-            rc = rolling_corr(combo["US"], combo["Canada"], window=24)
-            rc_fig = px.line(rc.reset_index(), x="date", y=0, labels={"0": "corr (24m)", "date": "Date"})
-            st.plotly_chart(_darken(rc_fig, title="Rolling correlation (24 months)"), use_container_width=True)
+            keys = (plain_store_key(us_id), plain_store_key(ca_key))
+            if all(k is not None and k in series_store() for k in keys):
+                ops = transform_ops(transform, st.session_state.get("smooth3", False))
+                rc = rolling_state().correlation(*keys, window=24, ops=ops)
+                rc = rc[(rc.index >= combo.index.min()) & (rc.index <= combo.index.max())].rename_axis("date")
+            else:
+                rc = rolling_corr(combo["US"], combo["Canada"], window=24)
+            rc_fig = px_figure("line", rc.reset_index(), x="date", y=0, labels={"0": "corr (24m)", "date": "Date"},
+                               layout=_dark("Rolling correlation (24 months)"))
+            st.plotly_chart(rc_fig, use_container_width=True)
+
+            c_lo, c_hi = st.slider("Correlation windows (months)", min_value=6, max_value=120, value=(6, 60), key="corr_sweep")
+            windows = np.arange(c_lo, c_hi + 1)
+            surface = corr_sweep(combo["US"].to_numpy(), combo["Canada"].to_numpy(), windows)
+            st.plotly_chart(
+                window_surface(surface, combo.index, windows, "corr",
+                               title=f"Rolling correlation by window ({c_lo}–{c_hi}m)"),
+                use_container_width=True,
+            )
         else:
             st.info("Need both US and Canada series for rolling correlation.")
 
@@ -515,41 +729,32 @@ else:
     with tab_scatter:
         # Only meaningful if we can pair CPI (yoy) vs Unemployment (level)
         try:
-            need = {
-                "US": {"infl": ("CPIAUCSL", "yoy"), "unemp": ("UNRATE", "level")},
-                "CA": {"infl": ("v41690973", "yoy"), "unemp": ("v2062815", "level")},
-            }
-            dfs = {}
-            if fred_key:
-                us_infl = apply_transform(
-                    fred_observations(need["US"]["infl"][0], period_start, period_end, fred_key),
-                    need["US"]["infl"][0],
-                    "yoy",
-                )
-                us_un = apply_transform(
-                    fred_observations(need["US"]["unemp"][0], period_start, period_end, fred_key),
-                    need["US"]["unemp"][0],
-                    "level",
-                )
-                dfs["US"] = pd.concat([us_infl.rename("Inflation"), us_un.rename("Unemployment")], axis=1).dropna()
-            ca_infl = apply_transform(
-                statcan_vector_by_ref_period(need["CA"]["infl"][0], period_start, period_end),
-                need["CA"]["infl"][0],
-                "yoy",
+            yrs = list(range(start_date.year + 1, end_date.year + 1))
+            sc1, sc2 = st.columns([0.6, 0.4])
+            breaks = [f"{y}-01-01" for y in sc1.multiselect("Split into subperiods at (Jan of year)", yrs, default=[])]
+            ph_window = sc2.slider("Rolling slope window (months)", min_value=24, max_value=120, value=60, step=12)
+            dfs, fits, roll = phillips_service(
+                period_start, period_end, fred_key, bool(st.session_state.get("smooth3")), tuple(breaks), ph_window
             )
-            ca_un = apply_transform(
-                statcan_vector_by_ref_period(need["CA"]["unemp"][0], period_start, period_end),
-                need["CA"]["unemp"][0],
-                "level",
-            )
-            dfs["Canada"] = pd.concat([ca_infl.rename("Inflation"), ca_un.rename("Unemployment")], axis=1).dropna()
 
             cols = st.columns(2)
-            if "US" in dfs:
-                figu = px.scatter(dfs["US"], x="Unemployment", y="Inflation", trendline="ols")
-                cols[0].plotly_chart(_darken(figu, title="Phillips: US (YoY CPI vs Unemployment)"), use_container_width=True)
-            figc = px.scatter(dfs["Canada"], x="Unemployment", y="Inflation", trendline="ols")
-            cols[1].plotly_chart(_darken(figc, title="Phillips: Canada (YoY CPI vs Unemployment)"), use_container_width=True)
+            titles = {"US": "Phillips: US (YoY CPI vs Unemployment)", "Canada": "Phillips: Canada (YoY CPI vs Unemployment)"}
+            for col, country in zip(cols, ["US", "Canada"]):
+                if country in dfs:
+                    fig_ph = cached_figure(phillips_figure, dfs[country], fits[fits["country"] == country],
+                                           tuple(breaks), titles[country])
+                    col.plotly_chart(fig_ph, use_container_width=True)
+            st.dataframe(
+                fits.rename(columns={"country": "Country", "period": "Period", "slope": "Slope",
+                                     "intercept": "Intercept", "r2": "R²", "n": "Obs"}).round(3),
+                use_container_width=True,
+                hide_index=True,
+            )
+            if not roll.empty:
+                roll_fig = px_figure("line", roll.reset_index(), x="date", y=list(roll.columns),
+                                     labels={"value": "slope (pp infl / pp unemp)", "date": "Date", "variable": "Country"},
+                                     layout=_dark(f"Rolling Phillips slope ({ph_window}m)"))
+                st.plotly_chart(roll_fig, use_container_width=True)
             st.caption("OLS trendline is illustrative only; not a causal estimate.")
         except Exception as e:
             st.info(f"Phillips curve requires CPI YoY and Unemployment; {e}")
@@ -571,16 +776,94 @@ st.markdown("---")
 st.subheader("CFA Takeaways")
 st.write(CFA_NOTES.get(module, ""))
 
+# ---------- Event study ----------
+# Average outcome paths around curve inversions and policy-rate cycle turns, over the whole history
+EVENT_START = "1990-01"
+EVENT_OUTCOMES = {
+    "US unemployment": ("FRED", "UNRATE", None),
+    "CA unemployment": ("StatCan", "v2062815", None),
+    "US CPI YoY": ("FRED", "CPIAUCSL", "yoy"),
+    "CA CPI YoY": ("StatCan", "v41690973", "yoy"),
+    "USD/CAD (100·log)": ("FRED", "DEXCAUS", "log"),
+}
+EVENT_TYPES = ["US inversion (T10Y2Y)", "CA inversion (10Y−2Y)", "Fed first hike", "Fed first cut",
+               "BoC first hike", "BoC first cut"]
+
+
+@profiling.timed("transforms")
+@memo(ttl=CACHE_TTL_S)
+def event_inputs(end: str, api_key: str) -> tuple[pd.DataFrame, dict]:
+    """Monthly outcome panel and the event-driving series (spreads, policy rates) from EVENT_START."""
+    def load(source, sid):
+        if source == "FRED":
+            if not api_key:
+                return pd.Series(dtype=float)
+            return fred_observations(sid, EVENT_START, end, api_key)[sid].astype(float)
+        return statcan_vector_by_ref_period(sid, EVENT_START, end)[sid].astype(float)
+
+    def monthly(s):
+        return s.resample("MS").last() if not s.empty else s
+
+    cols = {}
+    for name, (source, sid, how) in EVENT_OUTCOMES.items():
+        s = monthly(load(source, sid))
+        cols[name] = pct_yoy(s) if how == "yoy" else 100.0 * np.log(s) if how == "log" else s
+    panel = pd.concat(cols, axis=1).sort_index()
+    drivers = {
+        "US spread": monthly(load("FRED", "T10Y2Y")),
+        "CA spread": monthly(load("StatCan", "v122543")) - monthly(load("StatCan", "v122538")),
+        "Fed": monthly(load("FRED", "FEDFUNDS")),
+        "BoC": monthly(load("StatCan", "v122530")),
+    }
+    return panel, drivers
+
+
+def render_event_study():
+    c1, c2, c3 = st.columns(3)
+    chosen = c1.multiselect("Event types", EVENT_TYPES, default=EVENT_TYPES[:2], key="ev_types")
+    min_len = c2.slider("Inversion must last (months)", 1, 12, 3, key="ev_min_len")
+    gap = c2.slider("Quiet months before a first move", 1, 24, 6, key="ev_gap")
+    window = c3.slider("Window (months around event)", -36, 48, (-12, 24), key="ev_window")
+    relative = c3.toggle("Change since event month", value=True, key="ev_relative")
+
+    panel, drivers = event_inputs(period_end, fred_key)
+    detect = {
+        EVENT_TYPES[0]: lambda: run_events(drivers["US spread"], "negative", min_len),
+        EVENT_TYPES[1]: lambda: run_events(drivers["CA spread"], "negative", min_len),
+        EVENT_TYPES[2]: lambda: change_events(drivers["Fed"], 0.1, "up", gap),
+        EVENT_TYPES[3]: lambda: change_events(drivers["Fed"], 0.1, "down", gap),
+        EVENT_TYPES[4]: lambda: change_events(drivers["BoC"], 0.1, "up", gap),
+        EVENT_TYPES[5]: lambda: change_events(drivers["BoC"], 0.1, "down", gap),
+    }
+    events = {name: detect[name]() for name in chosen}
+    if panel.empty or not any(len(d) for d in events.values()):
+        st.info("No events detected for the current selection.")
+        return
+    res = event_study(panel, events, window, relative=relative)
+    fig = px_figure(
+        "line", res, x="offset", y="mean", color="event", facet_col="series", facet_col_wrap=3,
+        hover_data=["median", "q25", "q75", "n"],
+        layout=_dark("Average path around events" + (" (change since month 0)" if relative else "")),
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    st.caption("Month 0 is the first month of the inversion / the first move after the quiet spell; "
+               "paths past the end of history are averaged over the events that reach them (see n).")
+    st.dataframe(event_table(events), use_container_width=True, hide_index=True)
+
+
+st.markdown("---")
+if st.checkbox("📉 Event study: curve inversions and policy cycles", value=False, key="event_study"):
+    render_event_study()
+
 # ---------- Data Export ----------
-st.download_button(
-    label="⬇️ Download data (CSV)",
-    data=combo.to_csv(index=True).encode("utf-8"),
-    file_name=f"fred_statcan_{module.replace(' ','_').lower()}_{transform}.csv",
-    mime="text/csv",
-)
+# Encoded only when the download button is clicked
+st.markdown("**⬇️ Download data**")
+export_controls(combo, f"fred_statcan_{module.replace(' ','_').lower()}_{transform}", key="export_combo")
 
 # ---------- Footer: Sources ----------
 st.caption(
     "Sources: FRED API (Federal Reserve Bank of St. Louis), Statistics Canada Web Data Service (WDS); Bank of Canada benchmarks.\n"
     "Notes: Canada 10Y monthly vector v122543; 2Y v122538; 3M T-bill v122531; Bank rate v122530; CPI all-items v41690973; Unemployment v2062815; Participation v2062816."
 )
+
+profiling.end()
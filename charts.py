@@ -0,0 +1,115 @@
+# Figure cache keyed by data fingerprint
+# --------------------------------------
+# Plotly Express construction (trace building + validation) is most of a chart's cost on
+# a rerun: ~50-100 ms for a multi-series line vs ~5-10 ms to serialize it. Figures are
+# memoised process-wide on a fast hash of the input data, the chart spec and the theme
+# layout, so an unchanged chart skips construction entirely.
+#
+# st.plotly_chart still serializes the figure it is given on every rerun (Streamlit has no
+# public way to hand it pre-serialized JSON). That part is kept cheap by orjson, which
+# plotly picks up automatically when installed.
+#
+# Cached figures are shared between sessions: treat them as read-only (pass layout=... or
+# do post-processing inside the builder instead of calling update_* on the result).
+
+from collections import OrderedDict
+import hashlib
+import os
+import threading
+import types
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import plotly.graph_objects as go
+
+FIGURE_CACHE_SIZE = int(os.getenv("FIGURE_CACHE_SIZE", "256"))
+
+_cache: "OrderedDict[str, go.Figure]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+
+
+def _update(h, obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        h.update(pd.util.hash_pandas_object(obj, index=True).to_numpy().tobytes())
+        cols = list(obj.columns) if isinstance(obj, pd.DataFrame) else [obj.name]
+        h.update(repr((type(obj).__name__, obj.shape, cols, obj.index.name, list(obj.index.names))).encode())
+    elif isinstance(obj, pd.Index):
+        _update(h, pd.Series(obj))
+    elif isinstance(obj, np.ndarray):
+        h.update(repr((obj.shape, obj.dtype.str)).encode())
+        h.update(np.ascontiguousarray(obj).tobytes())
+    elif isinstance(obj, dict):
+        h.update(b"{")
+        for k in sorted(obj, key=repr):
+            h.update(repr(k).encode())
+            _update(h, obj[k])
+        h.update(b"}")
+    elif isinstance(obj, (list, tuple)):
+        h.update(b"[")
+        for x in obj:
+            _update(h, x)
+        h.update(b"]")
+    elif isinstance(obj, types.CodeType):
+        h.update(f"{obj.co_filename}:{getattr(obj, 'co_qualname', obj.co_name)}:{obj.co_firstlineno}".encode())
+        h.update(obj.co_code)
+        _update(h, obj.co_consts)                 # nested code objects recurse, no addresses
+    elif callable(obj):
+        code = getattr(obj, "__code__", None)
+        if code is None:                          # builtins, partials, callable instances
+            h.update(repr(obj).encode())
+            return
+        # two lambdas / closures of one module share a qualname: key on the code itself and
+        # on what it captured
+        _update(h, code)
+        _update(h, obj.__defaults__ or ())
+        _update(h, [c.cell_contents for c in obj.__closure__ or ()])
+    else:
+        h.update(repr(obj).encode())
+
+
+def fingerprint(*parts) -> str:
+    """128-bit blake2b over frames (values + index + labels), arrays, containers and scalars."""
+    h = hashlib.blake2b(digest_size=16)
+    for p in parts:
+        _update(h, p)
+        h.update(b"|")
+    return h.hexdigest()
+
+
+def cached_figure(build, *args, **kwargs) -> go.Figure:
+    """build(*args, **kwargs), memoised on fingerprint(build, args, kwargs). LRU, FIGURE_CACHE_SIZE entries."""
+    key = fingerprint(build, args, kwargs)
+    with _lock:
+        fig = _cache.get(key)
+        if fig is not None:
+            _cache.move_to_end(key)
+            _stats["hits"] += 1
+            return fig
+        _stats["misses"] += 1
+    fig = build(*args, **kwargs)
+    with _lock:
+        _cache[key] = fig
+        while len(_cache) > FIGURE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return fig
+
+
+def _px(kind: str, data, layout: dict | None, spec: dict, _defaults=None) -> go.Figure:
+    fig = getattr(px, kind)(data, **spec)
+    if layout:
+        fig.update_layout(**layout)
+    return fig
+
+
+def px_figure(kind: str, data, layout: dict | None = None, **spec) -> go.Figure:
+    """Cached px.<kind>(data, **spec) with `layout` (theme, title, height...) applied."""
+    # px.defaults (template, colours) change the built figure, so they are part of the key
+    defaults = (px.defaults.template, px.defaults.color_discrete_sequence, px.defaults.width, px.defaults.height)
+    return cached_figure(_px, kind, data, layout, spec, _defaults=defaults)
+
+
+def cache_info() -> dict:
+    with _lock:
+        return {**_stats, "size": len(_cache), "max": FIGURE_CACHE_SIZE}
@@ -0,0 +1,182 @@
+# Derived-series expressions
+# --------------------------
+# Small expression language over FRED and StatCan ids, compiled to a DAG of shared nodes.
+#
+#   v122543 - v122538                 Canada 10Y–2Y spread (StatCan vectors)
+#   DGS10 - yoy(CPIAUCSL)             US real 10Y yield
+#   DGS10 - v122543                   US–Canada 10Y differential
+#   fred("DGS10") / statcan("v122543") explicit sources (for ids that are not valid names)
+#
+# Names that look like 'v<digits>' are StatCan vectors, every other name is a FRED id.
+# Operators: + - * / and unary minus. Functions: see FUNCTIONS below.
+#
+# Nodes are keyed by their canonical text, so an input or sub-expression used by several
+# expressions is loaded and transformed once per pass. Each node keeps (version, result):
+# a leaf's version is a hash of its data, an inner node's version a hash of its children's,
+# so only nodes whose inputs changed are recomputed on the next pass.
+
+import ast
+import operator
+import re
+
+import numpy as np
+import pandas as pd
+
+STATCAN_RE = re.compile(r"^v\d+$", re.IGNORECASE)
+
+FUNCTIONS = {
+    "yoy": lambda s: (s / s.shift(12) - 1.0) * 100.0,
+    "ann3m": lambda s: ((s / s.shift(3)) ** 4 - 1.0) * 100.0,
+    "diff": lambda s, n=1: s.diff(int(n)),
+    "lag": lambda s, n=1: s.shift(int(n)),
+    "ma": lambda s, n=3: s.rolling(int(n)).mean(),
+    "log": lambda s: np.log(s),
+    "rebase": lambda s: s / s.dropna().iloc[0] * 100.0 if not s.dropna().empty else s,
+}
+
+_BINOPS = {ast.Add: "+", ast.Sub: "-", ast.Mult: "*", ast.Div: "/"}
+_OPS = {"+": operator.add, "-": operator.sub, "*": operator.mul, "/": operator.truediv}
+
+
+def leaf_ids(text: str) -> list[tuple[str, str]]:
+    """(source, id) pairs referenced by an expression, in order of first use."""
+    out = []
+
+    def walk(n):
+        if isinstance(n, ast.Name):
+            out.append(_source_of(n.id))
+        elif isinstance(n, ast.Call) and isinstance(n.func, ast.Name) and n.func.id in ("fred", "statcan"):
+            out.append(("FRED" if n.func.id == "fred" else "StatCan", str(n.args[0].value)))
+        elif isinstance(n, ast.Call):
+            for a in n.args:              # the function name itself is not a series
+                walk(a)
+        else:
+            for c in ast.iter_child_nodes(n):
+                walk(c)
+
+    walk(ast.parse(text.strip(), mode="eval"))
+    return list(dict.fromkeys(out))
+
+
+def _source_of(name: str) -> tuple[str, str]:
+    return ("StatCan", name.lower()) if STATCAN_RE.match(name) else ("FRED", name)
+
+
+def split_expressions(text: str) -> list[str]:
+    """Split a comma-separated list of expressions, ignoring commas inside function calls."""
+    parts, depth, cur = [], 0, ""
+    for ch in text:
+        depth += (ch == "(") - (ch == ")")
+        if ch == "," and depth == 0:
+            parts.append(cur)
+            cur = ""
+        else:
+            cur += ch
+    parts.append(cur)
+    return [p.strip() for p in parts if p.strip()]
+
+
+def is_plain_id(text: str) -> bool:
+    """True when the expression is a single series id (no operators or functions)."""
+    return re.fullmatch(r"[A-Za-z_][A-Za-z0-9_]*", text.strip()) is not None
+
+
+class DerivedEngine:
+    """Compiles expressions into shared nodes and evaluates them with a persistent memo.
+
+    resolve(source, series_id) -> pd.Series is passed per evaluation, so the same engine
+    can be kept across reruns while date ranges or keys change.
+    """
+
+    def __init__(self):
+        self.nodes: dict[str, tuple] = {}   # key -> (kind, payload, child keys)
+        self.memo: dict[str, tuple] = {}    # key -> (version, Series)
+
+    # ----- compile -----
+    def compile(self, text: str) -> str:
+        """Parse an expression and intern its nodes; returns the root node key."""
+        try:
+            tree = ast.parse(text.strip(), mode="eval").body
+        except SyntaxError as e:
+            raise ValueError(f"Invalid expression '{text}': {e.msg}") from None
+        return self._intern(tree)
+
+    def _add(self, key, kind, payload, children=()):
+        self.nodes.setdefault(key, (kind, payload, tuple(children)))
+        return key
+
+    def _intern(self, n) -> str:
+        if isinstance(n, ast.Name):
+            src, sid = _source_of(n.id)
+            return self._add(f"{src}:{sid}", "leaf", (src, sid))
+        if isinstance(n, ast.Constant) and isinstance(n.value, (int, float)):
+            return self._add(repr(float(n.value)), "const", float(n.value))
+        if isinstance(n, ast.UnaryOp) and isinstance(n.op, ast.USub):
+            c = self._intern(n.operand)
+            return self._add(f"(-{c})", "neg", None, [c])
+        if isinstance(n, ast.BinOp) and type(n.op) in _BINOPS:
+            a, b = self._intern(n.left), self._intern(n.right)
+            op = _BINOPS[type(n.op)]
+            return self._add(f"({a} {op} {b})", "binop", op, [a, b])
+        if isinstance(n, ast.Call) and isinstance(n.func, ast.Name):
+            name = n.func.id
+            if name in ("fred", "statcan"):
+                if len(n.args) != 1 or not isinstance(n.args[0], ast.Constant):
+                    raise ValueError(f"{name}() takes one quoted series id")
+                src = "FRED" if name == "fred" else "StatCan"
+                sid = str(n.args[0].value)
+                return self._add(f"{src}:{sid}", "leaf", (src, sid))
+            if name not in FUNCTIONS or not n.args:
+                raise ValueError(f"Unknown function '{name}'. Available: {', '.join(FUNCTIONS)}")
+            c = self._intern(n.args[0])
+            params = []
+            for p in n.args[1:]:
+                if not isinstance(p, ast.Constant):
+                    raise ValueError(f"{name}(): extra arguments must be numbers")
+                params.append(p.value)
+            return self._add(f"{name}({c}{''.join(f', {p}' for p in params)})", "func", (name, tuple(params)), [c])
+        raise ValueError(f"Unsupported syntax: {ast.unparse(n)}")
+
+    # ----- evaluate -----
+    def evaluate(self, text: str, resolve) -> pd.Series:
+        return self.evaluate_many([text], resolve)[0]
+
+    def evaluate_many(self, texts, resolve) -> list[pd.Series]:
+        """Evaluate several expressions in one pass; shared leaves and sub-expressions run once."""
+        roots = [self.compile(t) for t in texts]
+        seen: dict[str, int] = {}
+        out = []
+        for key, text in zip(roots, texts):
+            res = self._eval(key, resolve, seen)
+            if not isinstance(res, pd.Series):
+                raise ValueError(f"Expression '{text}' must reference at least one series")
+            out.append(res.rename(text.strip()))
+        return out
+
+    def _eval(self, key: str, resolve, seen: dict):
+        if key not in seen:
+            kind, payload, children = self.nodes[key]
+            if kind == "leaf":
+                data = resolve(*payload).astype(float)
+                version = int(pd.util.hash_pandas_object(data).sum()) if len(data) else 0
+                if key not in self.memo or self.memo[key][0] != version:
+                    self.memo[key] = (version, data)
+            else:
+                for c in children:
+                    self._eval(c, resolve, seen)
+                version = hash((key,) + tuple(seen[c] for c in children))
+                if key not in self.memo or self.memo[key][0] != version:
+                    self.memo[key] = (version, self._apply(kind, payload, [self.memo[c][1] for c in children]))
+            seen[key] = self.memo[key][0]
+        return self.memo[key][1]
+
+    @staticmethod
+    def _apply(kind, payload, args):
+        if kind == "const":
+            return payload
+        if kind == "neg":
+            return -args[0]
+        if kind == "binop":
+            return _OPS[payload](*args)
+        name, params = payload
+        return FUNCTIONS[name](args[0], *params)
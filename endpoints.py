@@ -0,0 +1,11 @@
+# Upstream data service endpoints
+# -------------------------------
+# Base URLs of FRED and the StatCan WDS, overridable so the apps can run against a local
+# stand-in service (loadtest.py) or a caching proxy:
+#   FRED_API_BASE     default https://api.stlouisfed.org/fred
+#   STATCAN_WDS_BASE  default https://www150.statcan.gc.ca/t1/wds/rest
+
+import os
+
+FRED_API = os.getenv("FRED_API_BASE", "https://api.stlouisfed.org/fred").rstrip("/")
+STATCAN_WDS = os.getenv("STATCAN_WDS_BASE", "https://www150.statcan.gc.ca/t1/wds/rest").rstrip("/")
@@ -0,0 +1,115 @@
+# Event studies (numpy only)
+# --------------------------
+# Event detection with run-length logic and average outcome paths around events, for the
+# CFA notes in cadVSusa.py (curve inversion as a recession signal, policy-rate moves).
+#
+# Detection:
+#   run_events()    starts of runs where a condition holds for at least min_len periods
+#                   (e.g. T10Y2Y < 0 for 3+ months), found from the edges of the boolean
+#                   mask in one vectorised pass.
+#   change_events() periods where a series moves by at least a threshold (e.g. FEDFUNDS or
+#                   the Bank rate v122530 up/down), optionally only the first move after a
+#                   quiet spell of `gap` periods (the start of a cycle).
+# Paths:
+#   event_study()   gathers a (events x offsets x series) block from the panel with a single
+#                   fancy-index over every event of every type, rebases each path to its
+#                   event-date value and reduces per event type: mean, median, quartiles, n.
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def runs(mask) -> tuple[np.ndarray, np.ndarray]:
+    """(start positions, lengths) of the True runs in a boolean array."""
+    m = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.r_[0, m.view(np.int8), 0])
+    starts = np.flatnonzero(edges == 1)
+    return starts, np.flatnonzero(edges == -1) - starts
+
+
+def run_events(s: pd.Series, condition="negative", min_len: int = 1, at: str = "start") -> pd.DatetimeIndex:
+    """Dates of runs where condition(s) holds for at least min_len consecutive observations.
+
+    condition: "negative", "positive" or a callable Series -> bool Series. NaN breaks a run.
+    at: "start" (first period of the run) or "confirm" (period the run reaches min_len).
+    """
+    s = s.dropna()
+    if callable(condition):
+        mask = np.asarray(condition(s), dtype=bool)
+    else:
+        mask = {"negative": s.to_numpy() < 0, "positive": s.to_numpy() > 0}[condition]
+    starts, lengths = runs(mask)
+    starts = starts[lengths >= min_len]
+    pos = starts if at == "start" else starts + min_len - 1
+    return pd.DatetimeIndex(s.index[pos])
+
+
+def change_events(s: pd.Series, threshold: float = 0.0, direction: str = "both", gap: int = 0) -> pd.DatetimeIndex:
+    """Dates where s changes by more than `threshold` (up, down or both).
+    gap > 0 keeps only moves with no qualifying move in the previous `gap` observations."""
+    s = s.dropna()
+    d = np.diff(s.to_numpy(), prepend=np.nan)
+    up, down = d > threshold, d < -threshold
+    hit = {"up": up, "down": down, "both": up | down}[direction]
+    pos = np.flatnonzero(hit)
+    if gap > 0 and len(pos):
+        quiet = np.diff(np.r_[-gap - 1, pos]) > gap
+        pos = pos[quiet]
+    return pd.DatetimeIndex(s.index[pos])
+
+
+def event_study(panel: pd.DataFrame, events: dict, window: tuple[int, int] = (-12, 24),
+                relative: bool = True) -> pd.DataFrame:
+    """Average paths of every panel column around every event, in one gather.
+
+    panel: outcomes on a common, sorted index (e.g. month starts). events: {name: dates}; dates
+    are matched to the panel row at or after them. relative=True rebases each path to its
+    value at offset 0 (the event row, whether or not the window includes it). Returns long form: event, offset, series, mean, median, q25, q75, n.
+    """
+    lo, hi = window
+    if lo > hi:
+        raise ValueError(f"empty event window {window}")
+    offsets = np.arange(lo, hi + 1)
+    names, pos = [], []
+    for name, dates in events.items():
+        p = panel.index.searchsorted(pd.DatetimeIndex(dates))
+        p = p[p < len(panel)]
+        names += [name] * len(p)
+        pos.append(p)
+    cols = ["event", "offset", "series", "mean", "median", "q25", "q75", "n"]
+    if not names:
+        return pd.DataFrame(columns=cols)
+    pos = np.concatenate(pos)
+    labels = np.asarray(names)
+
+    x = panel.to_numpy(dtype=float)
+    idx = pos[:, None] + offsets[None, :]                         # events x offsets
+    inside = (idx >= 0) & (idx < len(x))
+    block = x[np.clip(idx, 0, len(x) - 1)]                        # events x offsets x series
+    block[~inside] = np.nan
+    if relative:
+        block = block - x[pos][:, None, :]
+
+    out = []
+    for name in dict.fromkeys(names):
+        b = block[labels == name]
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # all-NaN offsets past the end of history
+            q25, med, q75 = np.nanpercentile(b, [25, 50, 75], axis=0)
+            stats = {"mean": np.nanmean(b, axis=0), "median": med, "q25": q25, "q75": q75,
+                     "n": np.isfinite(b).sum(axis=0).astype(float)}
+        k, s = np.meshgrid(offsets, np.arange(b.shape[2]), indexing="ij")
+        out.append(pd.DataFrame({"event": name, "offset": k.ravel(), "series": panel.columns[s.ravel()],
+                                 **{key: v.ravel() for key, v in stats.items()}}))
+    res = pd.concat(out, ignore_index=True)
+    res["n"] = res["n"].astype(int)
+    return res[cols]
+
+
+def event_table(events: dict) -> pd.DataFrame:
+    """One row per detected event: event type and date."""
+    rows = [(name, d) for name, dates in events.items() for d in pd.DatetimeIndex(dates)]
+    return pd.DataFrame(rows, columns=["event", "date"]).sort_values(["event", "date"], ignore_index=True)
+
@@ -0,0 +1,136 @@
+# Lazy, streamed and columnar data export
+# ---------------------------------------
+# Download buttons hand Streamlit a callable, so nothing is encoded on a normal rerun:
+# the file is built only when the user clicks, on Streamlit's download thread.
+#
+# Files are written chunk by chunk (CHUNK_ROWS rows / one record batch at a time) into a
+# spooled temp file, so peak memory is one chunk plus the output rather than a full CSV
+# string and its encoded copy. Formats: CSV, gzip CSV, Parquet and Arrow IPC (file format).
+#
+# store_batches() exports series straight from the SeriesStore in long form
+# (series, date, value): each batch wraps the store's date/value arrays as Arrow buffers
+# without copying them (mapped snapshot arrays included).
+
+import gzip
+import io
+import tempfile
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as ipc
+import pyarrow.parquet as pq
+import streamlit as st
+
+from store import SeriesStore, get_store
+
+CHUNK_ROWS = 50_000
+SPOOL_BYTES = 32 * 1024 * 1024   # larger exports spill to a temp file on disk
+
+FORMATS = {
+    "CSV": (".csv", "text/csv"),
+    "CSV (gzip)": (".csv.gz", "application/gzip"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+    "Arrow IPC": (".arrow", "application/vnd.apache.arrow.file"),
+}
+
+STORE_SCHEMA = pa.schema([
+    ("series", pa.dictionary(pa.int32(), pa.string())),
+    ("date", pa.timestamp("ns")),
+    ("value", pa.float64()),
+])
+
+
+# ---------- Batch sources ----------
+
+def frame_batches(df: pd.DataFrame, index: bool = True, chunk_rows: int = CHUNK_ROWS):
+    """RecordBatches over row slices of a frame (index written as a column when index=True)."""
+    schema = pa.Schema.from_pandas(df, preserve_index=index)   # fixed up front so every slice matches
+    for i in range(0, max(len(df), 1), chunk_rows):
+        yield pa.RecordBatch.from_pandas(df.iloc[i:i + chunk_rows], schema=schema, preserve_index=index)
+
+
+def store_batches(keys, store: SeriesStore | None = None):
+    """One RecordBatch per stored series, long form (series, date, value).
+    date/value wrap the store's arrays without copying; series is a dictionary-encoded column."""
+    store = store or get_store()
+    keys = [k for k in keys if k in store]
+    names = pa.array(keys, pa.string())   # one dictionary shared by every batch (IPC files need that)
+    for i, key in enumerate(keys):
+        dates, values = store._dates[key], store._values[key]
+        n = len(dates)
+        yield pa.RecordBatch.from_arrays(
+            [
+                pa.DictionaryArray.from_arrays(pa.array(np.full(n, i, dtype=np.int32)), names),
+                pa.Array.from_buffers(pa.timestamp("ns"), n, [None, pa.py_buffer(dates)]),
+                pa.Array.from_buffers(pa.float64(), n, [None, pa.py_buffer(values)]),
+            ],
+            schema=STORE_SCHEMA,
+        )
+
+
+# ---------- Writers ----------
+
+def _write_csv(sink, df: pd.DataFrame, index: bool):
+    text = io.TextIOWrapper(sink, encoding="utf-8", newline="", write_through=True)
+    for i in range(0, max(len(df), 1), CHUNK_ROWS):
+        df.iloc[i:i + CHUNK_ROWS].to_csv(text, index=index, header=(i == 0))
+    text.flush()
+    text.detach()
+
+
+def _write_csv_batches(sink, batches):
+    text = io.TextIOWrapper(sink, encoding="utf-8", newline="", write_through=True)
+    for i, b in enumerate(batches):
+        b.to_pandas().to_csv(text, index=False, header=(i == 0))
+    text.flush()
+    text.detach()
+
+
+def export(source, fmt: str, index: bool = True):
+    """Encode `source` as `fmt` into a spooled temp file, rewound and ready to read.
+
+    source: a DataFrame, or a zero-arg callable returning a DataFrame or an iterable of
+    RecordBatches (e.g. lambda: store_batches(keys)). Called here, i.e. only on demand.
+    """
+    if callable(source):
+        source = source()
+    out = tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES)
+    if fmt in ("CSV", "CSV (gzip)"):
+        sink = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=6) if fmt == "CSV (gzip)" else out
+        if isinstance(source, pd.DataFrame):
+            _write_csv(sink, source, index)
+        else:
+            _write_csv_batches(sink, source)
+        if sink is not out:
+            sink.close()
+    else:
+        batches = frame_batches(source, index) if isinstance(source, pd.DataFrame) else iter(source)
+        first = next(batches, None)
+        schema = first.schema if first is not None else STORE_SCHEMA
+        writer = pq.ParquetWriter(out, schema) if fmt == "Parquet" else ipc.new_file(out, schema)
+        with writer:
+            for b in ([first] if first is not None else []):
+                writer.write_batch(b)
+            for b in batches:
+                writer.write_batch(b)
+    out.seek(0)
+    return out
+
+
+# ---------- UI ----------
+
+def export_controls(source, file_stem: str, index: bool = True, key: str = "export", container=None):
+    """Format picker + download button; the file is generated only when the button is clicked."""
+    container = container or st
+    c1, c2 = container.columns([0.4, 0.6])
+    fmt = c1.selectbox("Format", list(FORMATS), key=f"{key}_fmt", label_visibility="collapsed")
+    ext, mime = FORMATS[fmt]
+    c2.download_button(
+        f"⬇️ Download {fmt}",
+        data=lambda: export(source, fmt, index),
+        file_name=f"{file_stem}{ext}",
+        mime=mime,
+        key=f"{key}_btn",
+        on_click="ignore",
+    )
@@ -0,0 +1,89 @@
+# Frequency-aware growth rates
+# ----------------------------
+# Period-over-period, YoY and annualized % changes for a wide frame of series with mixed
+# frequencies. Columns are grouped by their stored frequency code (FRED 'frequency_short':
+# D, W, BW, M, Q, SA, A) and each group is transformed as one block, so quarterly GDP uses
+# 4 periods for YoY, weekly H.8 uses 52, and daily yields compare with the value one
+# calendar year earlier.
+
+import numpy as np
+import pandas as pd
+
+PERIODS_PER_YEAR = {"D": 260, "W": 52, "BW": 26, "M": 12, "Q": 4, "SA": 2, "A": 1}
+PERIOD_LABEL = {"D": "DoD", "W": "WoW", "BW": "2W", "M": "MoM", "Q": "QoQ", "SA": "HoH", "A": "YoY"}
+KINDS = ("period", "yoy", "annualized")
+
+
+def normalize_frequency(code: str) -> str:
+    """Map FRED frequency codes/names (e.g. 'W', 'Weekly, Ending Wednesday', 'Monthly') to a PERIODS_PER_YEAR key."""
+    code = (code or "").strip().upper()
+    if code in PERIODS_PER_YEAR:
+        return code
+    for prefix, key in (("D", "D"), ("BIW", "BW"), ("W", "W"), ("M", "M"), ("Q", "Q"), ("SEMI", "SA"), ("A", "A")):
+        if code.startswith(prefix):
+            return key
+    return ""
+
+
+def infer_frequency(s: pd.Series) -> str:
+    """Fallback when no metadata is stored: classify by median spacing between observations."""
+    idx = s.dropna().index
+    if len(idx) < 2:
+        return "M"
+    days = float(np.median(np.diff(idx.values).astype("timedelta64[D]").astype(float)))
+    for limit, key in ((4, "D"), (10, "W"), (20, "BW"), (45, "M"), (120, "Q"), (250, "SA")):
+        if days <= limit:
+            return key
+    return "A"
+
+
+def growth_rates(df: pd.DataFrame, freqs: dict[str, str] | None = None, kinds=("period", "yoy")) -> pd.DataFrame:
+    """% changes for every column of a wide, date-indexed frame.
+
+    freqs maps column -> frequency code (missing/unknown codes are inferred from the data).
+    kinds: any of 'period' (vs previous observation), 'yoy', 'annualized' (period change compounded
+    to a year). Columns with fewer than 3 observations are skipped.
+    """
+    freqs = freqs or {}
+    groups: dict[str, list[str]] = {}
+    for col in df.columns:
+        if df[col].count() < 3:
+            continue
+        f = normalize_frequency(freqs.get(col, "")) or infer_frequency(df[col])
+        groups.setdefault(f, []).append(col)
+
+    out = {}
+    for f, cols in groups.items():
+        block = df[cols].dropna(how="all").astype(float)
+        ppy = PERIODS_PER_YEAR[f]
+        prev = block.ffill().shift(1)
+        res = {}
+        if "period" in kinds:
+            res["period"] = (block / prev - 1.0) * 100.0
+        if "annualized" in kinds:
+            res["annualized"] = ((block / prev) ** ppy - 1.0) * 100.0
+        if "yoy" in kinds:
+            if f == "D":
+                # Irregular business-day calendar: compare with the last value on or before t - 1 year
+                base = block.ffill().reindex(block.index - pd.DateOffset(years=1), method="ffill")
+                base.index = block.index
+            else:
+                # ppy observations back in each column's own dates: a group's combined index can hold
+                # several rows per period (weekly series ending on different weekdays)
+                base = pd.concat({c: block[c].dropna().shift(ppy) for c in cols}, axis=1, sort=True).reindex(block.index)
+            res["yoy"] = (block / base - 1.0) * 100.0
+        out[f] = res
+
+    names = {"period": "{c} — Δ% ({p})", "yoy": "{c} — Δ% (YoY)", "annualized": "{c} — Δ% ({p}, ann.)"}
+    freq_of = {col: f for f, cols in groups.items() for col in cols}
+    series = []
+    for col in df.columns:
+        f = freq_of.get(col)
+        if f is None:
+            continue
+        for kind in KINDS:
+            if kind in out[f]:
+                series.append(out[f][kind][col].rename(names[kind].format(c=col, p=PERIOD_LABEL[f])))
+    if not series:
+        return pd.DataFrame(index=df.index)
+    return pd.concat(series, axis=1, sort=True)
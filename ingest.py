@@ -0,0 +1,316 @@
+# Bulk FRED and StatCan ingestion
+# -------------------------------
+# Loads every series of a FRED release (e.g. 21 = H.8, 9 = Advance Retail Sales) or
+# category into the series store. The member list is paged from fred/release/series or
+# fred/category/series (1000 per page) and seeds the metadata cache with title, frequency
+# and last_updated, so no per-series metadata calls follow.
+#
+# Observations are fetched by a thread pool through store.read_through(), so each member
+# lands under the same "FRED:<id>" key the dashboards use, is single-flighted against
+# concurrent page loads and is picked up by the background refresher. Every request takes
+# a token from the shared FRED limiter (FRED_RATE_PER_MIN, 120/min by default) under the
+# caller's session, so a bulk load queues fairly with other users; 500 series take about
+# four minutes at the default rate.
+#
+# StatCan full tables: getFullTableDownloadCSV gives the URL of a table's CSV zip (e.g.
+# 18-10-0004 CPI, 14-10-0287 LFS). The zip is streamed to a temp file on disk (a zip can only
+# be read from its end), then the CSV member is decompressed and parsed TABLE_CHUNK_ROWS
+# rows at a time, keeping only REF_DATE / VECTOR / VALUE as int64/int64/float64 columns.
+# At the end the rows are sorted once by (vector, date) and every vector is written to the
+# store as "StatCan:v<id>" with full-history coverage. So memory is ~24 bytes per
+# observation on top of the stored arrays, never the CSV text or a string DataFrame.
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+import pandas as pd
+import requests
+
+from endpoints import FRED_API, STATCAN_WDS
+from metadata import FredMetadata
+from singleflight import LIMITERS, current_session, session_scope
+from store import SeriesStore, get_store, in_statcan_lock_window, read_through, series_key
+
+LIST_PAGE = 1000
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "8"))
+MAX_SERIES = 2000            # refuse to bulk-load anything bigger in one go
+
+TABLE_CHUNK_ROWS = 200_000
+DOWNLOAD_CHUNK = 1 << 20
+
+LISTINGS = {"release": ("release/series", "release_id"), "category": ("category/series", "category_id")}
+
+
+def list_series(kind: str, group_id: int, api_key: str, session: requests.Session | None = None) -> list[dict]:
+    """Every series object (id, title, frequency_short, last_updated, ...) of a release or category."""
+    path, param = LISTINGS[kind]
+    session = session or requests.Session()
+    params = {param: int(group_id), "api_key": api_key, "file_type": "json",
+              "limit": LIST_PAGE, "offset": 0, "order_by": "series_id"}
+    out = []
+    while True:
+        LIMITERS["FRED"].acquire()
+        r = session.get(f"{FRED_API}/{path}", params=params, timeout=60)
+        r.raise_for_status()
+        j = r.json()
+        items = j.get("seriess", [])
+        out += items
+        params["offset"] += len(items)
+        if len(items) < LIST_PAGE or params["offset"] >= int(j.get("count", 0)):
+            return out
+
+
+def fred_observations(series_id: str, api_key: str, session: requests.Session, start=None, end=None) -> pd.Series:
+    """Raw observations of one series (FRED's native frequency), values as FRED sends them;
+    the store's validation drops '.' placeholders and counts them in the quality report."""
+    params = {"series_id": series_id, "api_key": api_key, "file_type": "json"}
+    if start:
+        params["observation_start"] = start
+    if end:
+        params["observation_end"] = end
+    r = session.get(f"{FRED_API}/series/observations", params=params, timeout=60)
+    r.raise_for_status()
+    obs = r.json().get("observations", [])
+    return pd.Series([o["value"] for o in obs], index=pd.to_datetime([o["date"] for o in obs]),
+                     name=series_id, dtype=object)
+
+
+def ingest(series_ids, api_key: str, session: requests.Session | None = None, start=None, end=None,
+           store: SeriesStore | None = None, workers: int = INGEST_WORKERS, progress=None) -> dict:
+    """Load series_ids into the store concurrently (rate limited through read_through).
+
+    progress(done, total, series_id, error) is called on the calling thread after each series.
+    Returns {"loaded": [...], "failed": {id: message}, "seconds": elapsed}.
+    """
+    store = store or get_store()
+    session = session or requests.Session()
+    ids = list(dict.fromkeys(series_ids))
+    owner = current_session()          # workers queue on the limiter as the calling session
+
+    def load(sid):
+        with session_scope(owner):
+            read_through(series_key("FRED", sid), start, end,
+                         lambda a, b: fred_observations(sid, api_key, session, a, b), store)
+
+    t0 = time.perf_counter()
+    loaded, failed = [], {}
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ingest") as pool:
+        futures = {pool.submit(load, sid): sid for sid in ids}
+        for i, fut in enumerate(as_completed(futures), 1):
+            sid, err = futures[fut], fut.exception()
+            if err is None:
+                loaded.append(sid)
+            else:
+                failed[sid] = str(err)[:200]
+            if progress is not None:
+                progress(i, len(ids), sid, err)
+    return {"loaded": loaded, "failed": failed, "seconds": time.perf_counter() - t0}
+
+
+def record_frequencies(items, store: SeriesStore | None = None):
+    """Store each member's FRED frequency on its series so the refresher picks the right TTL."""
+    store = store or get_store()
+    for it in items:
+        f = it.get("frequency_short", "")
+        if f:
+            store.meta.setdefault(series_key("FRED", it["id"]), {})["frequency"] = f
+
+
+# ---------- StatCan full tables ----------
+
+def product_id(table: str) -> int:
+    """'18-10-0004-01' / '1810000401' / '18100004' -> 18100004 (the 8-digit product id)."""
+    digits = "".join(c for c in str(table) if c.isdigit())
+    if len(digits) not in (8, 10):
+        raise ValueError(f"not a StatCan table id: {table!r}")
+    return int(digits[:8])
+
+
+def download_table_zip(pid: int, session: requests.Session, dest) -> int:
+    """Stream the table's CSV zip into the open binary file `dest`; returns bytes written."""
+    if in_statcan_lock_window():
+        raise RuntimeError("StatCan tables are locked for the nightly release until 08:30 ET.")
+    LIMITERS["StatCan"].acquire()
+    r = session.get(f"{STATCAN_WDS}/getFullTableDownloadCSV/{pid}/en", timeout=30)
+    if r.status_code == 409:
+        raise RuntimeError("StatCan WDS temporarily unavailable (HTTP 409) during nightly update window.")
+    r.raise_for_status()
+    url = r.json()["object"]
+    LIMITERS["StatCan"].acquire()
+    n = 0
+    with session.get(url, stream=True, timeout=300) as z:
+        z.raise_for_status()
+        for block in z.iter_content(DOWNLOAD_CHUNK):
+            dest.write(block)
+            n += len(block)
+    return n
+
+
+def _ref_dates(ref: pd.Series) -> np.ndarray:
+    # REF_DATE is YYYY, YYYY-MM or YYYY-MM-DD; anything else (e.g. fiscal "2023/2024") becomes NaT
+    return pd.to_datetime(ref, format="ISO8601", errors="coerce").to_numpy("datetime64[ns]").view("i8")
+
+
+def parse_table_csv(fileobj, chunk_rows: int = TABLE_CHUNK_ROWS, progress=None):
+    """(vector ids, dates ns, values, {vector id: title}) from a StatCan table CSV, parsed in chunks."""
+    vecs, dates, values, titles = [], [], [], {}
+    rows = 0
+    skip = {"DGUID", "UOM_ID", "SCALAR_FACTOR", "SCALAR_ID", "COORDINATE", "STATUS", "SYMBOL", "TERMINATED", "DECIMALS"}
+    reader = pd.read_csv(fileobj, chunksize=chunk_rows, dtype=str, keep_default_na=False, encoding="utf-8-sig",
+                         usecols=lambda c: c not in skip)
+    for chunk in reader:
+        cols = list(chunk.columns)
+        # member columns sit between GEO and UOM: they label what each vector measures
+        dims = cols[cols.index("GEO"): cols.index("UOM")] if "GEO" in cols and "UOM" in cols else []
+        v = pd.to_numeric(chunk["VECTOR"].str.lstrip("v"), errors="coerce")
+        x = pd.to_numeric(chunk["VALUE"], errors="coerce")
+        d = _ref_dates(chunk["REF_DATE"])
+        ok = (v.notna() & x.notna()).to_numpy() & (d != np.iinfo(np.int64).min)
+        if dims:
+            first = chunk.loc[ok].drop_duplicates("VECTOR")
+            first = first[~v[first.index].isin(titles.keys())]
+            if len(first):
+                labels = first[dims[0]].str.cat([first[c] for c in dims[1:]], sep="; ")
+                titles.update(zip(v[first.index].astype(np.int64), labels))
+        vecs.append(v.to_numpy()[ok].astype(np.int64))
+        dates.append(d[ok])
+        values.append(x.to_numpy()[ok].astype(np.float64))
+        rows += len(chunk)
+        if progress is not None:
+            progress(rows)
+    if not vecs:
+        return np.empty(0, np.int64), np.empty(0, np.int64), np.empty(0, np.float64), titles
+    return np.concatenate(vecs), np.concatenate(dates), np.concatenate(values), titles
+
+
+def ingest_statcan_table(table: str, session: requests.Session | None = None,
+                         store: SeriesStore | None = None, progress=None) -> dict:
+    """Download, stream-parse and store every vector of a StatCan table.
+
+    progress(stage, amount) reports ("download", bytes), ("parse", rows) and ("store", vectors).
+    Returns {"table", "vectors", "observations", "seconds"}.
+    """
+    store = store or get_store()
+    session = session or requests.Session()
+    pid = product_id(table)
+    t0 = time.perf_counter()
+    with tempfile.TemporaryFile() as tmp:
+        nbytes = download_table_zip(pid, session, tmp)
+        if progress is not None:
+            progress("download", nbytes)
+        tmp.seek(0)
+        with zipfile.ZipFile(tmp) as zf:
+            member = next((n for n in zf.namelist() if n.endswith(".csv") and "MetaData" not in n), None)
+            if member is None:
+                raise ValueError(f"table {pid}: no data CSV in the zip")
+            with zf.open(member) as f:     # decompressed as read, chunk by chunk
+                vec, dates, values, titles = parse_table_csv(f, progress=(lambda n: progress("parse", n)) if progress else None)
+
+    order = np.lexsort((dates, vec))
+    vec, dates, values = vec[order], dates[order], values[order]
+    bounds = np.flatnonzero(np.diff(vec)) + 1
+    starts, ends = np.r_[0, bounds], np.r_[bounds, len(vec)]
+    today = pd.Timestamp.today().normalize()
+    for i, (a, b) in enumerate(zip(starts, ends) if len(vec) else ()):
+        v = int(vec[a])
+        s = pd.Series(values[a:b], index=pd.DatetimeIndex(dates[a:b].view("datetime64[ns]")))
+        store.merge(series_key("StatCan", f"v{v}"), s, coverage=(None, today),
+                    meta={"table": pid, "title": titles.get(v, "")})
+        if progress is not None and (i % 500 == 0 or i == len(starts) - 1):
+            progress("store", i + 1)
+    return {"table": pid, "vectors": len(starts) if len(vec) else 0, "observations": len(vec),
+            "seconds": time.perf_counter() - t0}
+
+
+def table_vectors(pid: int, store: SeriesStore | None = None) -> pd.DataFrame:
+    """Vectors of a table already in the store: vector, title, observations, first, last."""
+    store = store or get_store()
+    rows = []
+    for k in store.keys():
+        m = store.meta.get(k, {})
+        if k.startswith("StatCan:") and m.get("table") == pid:
+            d = store._dates[k]
+            rows.append((k.split(":", 1)[1], m.get("title", ""), len(d),
+                         pd.Timestamp(d[0]).date() if len(d) else None, pd.Timestamp(d[-1]).date() if len(d) else None))
+    return pd.DataFrame(rows, columns=["vector", "title", "observations", "first", "last"])
+
+
+# ---------- UI ----------
+
+def bulk_ingest_controls(api_key: str, session: requests.Session, metadata: FredMetadata,
+                         start=None, end=None, key: str = "bulk") -> list[str]:
+    """Release/category picker, member listing and a 'Load all' button with a progress bar.
+    Returns the ids loaded in this session (kept in session_state across reruns)."""
+    import streamlit as st
+
+    c1, c2 = st.columns([0.4, 0.6])
+    kind = c1.radio("Group", list(LISTINGS), horizontal=True, key=f"{key}_kind",
+                    format_func=str.capitalize)
+    group_id = c2.number_input(f"FRED {kind} id", min_value=0, step=1, value=21 if kind == "release" else 0,
+                               key=f"{key}_id", help="e.g. release 21 = H.8, release 9 = Advance Retail Sales")
+    listing_key = f"{key}_members_{kind}_{group_id}"
+    if st.button("List series", key=f"{key}_list"):
+        try:
+            st.session_state[listing_key] = list_series(kind, group_id, api_key, session)
+            metadata.seed(st.session_state[listing_key])     # once per listing, not on every rerun
+        except Exception as e:
+            st.error(f"Could not list {kind} {group_id}: {e}")
+    items = st.session_state.get(listing_key)
+    if items:
+        freqs = sorted({it.get("frequency_short", "") for it in items} - {""})
+        chosen = st.multiselect("Frequencies", freqs, default=freqs, key=f"{key}_freqs")
+        items = [it for it in items if it.get("frequency_short", "") in chosen]
+        st.caption(f"{len(items)} series in {kind} {group_id}")
+        st.dataframe(pd.DataFrame(items, columns=["id", "title", "frequency_short", "units", "last_updated"]),
+                     hide_index=True, height=240, use_container_width=True)
+        if len(items) > MAX_SERIES:
+            st.warning(f"More than {MAX_SERIES} series; narrow the frequency filter.")
+        elif st.button(f"Load all {len(items)}", key=f"{key}_load", type="primary"):
+            record_frequencies(items)
+            bar = st.progress(0.0, text="Starting…")
+
+            def progress(done, total, sid, err):
+                bar.progress(done / total, text=f"{done}/{total} · {sid}" + (" (failed)" if err else ""))
+
+            res = ingest([it["id"] for it in items], api_key, session, start, end, progress=progress)
+            st.session_state[f"{key}_loaded"] = res["loaded"]
+            st.success(f"Loaded {len(res['loaded'])} series in {res['seconds']:.0f}s")
+            if res["failed"]:
+                with st.expander(f"{len(res['failed'])} failed"):
+                    st.json(res["failed"])
+    return st.session_state.get(f"{key}_loaded", [])
+
+
+def table_ingest_controls(session: requests.Session, key: str = "table") -> pd.DataFrame:
+    """Table id box + 'Download table' button; lists the table's stored vectors once loaded."""
+    import streamlit as st
+
+    table = st.text_input("StatCan table id", value="18-10-0004-01", key=f"{key}_id",
+                          help="e.g. 18-10-0004-01 (CPI), 14-10-0287-01 (LFS)")
+    try:
+        pid = product_id(table)
+    except ValueError as e:
+        st.warning(str(e))
+        return pd.DataFrame()
+    if st.button("Download table", key=f"{key}_load"):
+        status = st.empty()
+
+        def progress(stage, n):
+            unit = {"download": f"{n / 1e6:.1f} MB downloaded", "parse": f"{n:,} rows parsed",
+                    "store": f"{n:,} vectors stored"}[stage]
+            status.caption(f"Table {pid}: {unit}")
+
+        try:
+            res = ingest_statcan_table(table, session, progress=progress)
+            status.success(f"Stored {res['vectors']:,} vectors ({res['observations']:,} observations) "
+                           f"from table {pid} in {res['seconds']:.0f}s")
+        except Exception as e:
+            status.error(f"Table {pid} failed: {e}")
+    vectors = table_vectors(pid)
+    if not vectors.empty:
+        st.dataframe(vectors, hide_index=True, height=240, use_container_width=True)
+    return vectors
@@ -0,0 +1,321 @@
+# Concurrent-session load test
+# ----------------------------
+# How many simultaneous analysts can one server process carry? For each N in --sessions,
+# a fresh worker process runs N concurrent simulated sessions of one app (Streamlit's
+# AppTest, one thread per session, sharing the process-wide caches and store like a real
+# server). Each session renders the app, then makes --steps random widget changes
+# (selectboxes, multiselects, checkboxes, radios, sliders, in the sidebar and in every
+# tab) and reruns after each one.
+#
+# All upstream traffic goes to a local stand-in for FRED and the StatCan WDS started here
+# (deterministic synthetic series; optional --upstream-ms latency), selected through
+# FRED_API_BASE / STATCAN_WDS_BASE (endpoints.py). The provider rate limits are lifted
+# unless --respect-limits is given, so the numbers measure the server, not the quota.
+#
+# Reported per N: rerun latency p50/p95/p99 (ms), reruns per second, peak RSS (MB; via
+# resource on Unix, psutil on Windows when installed, else n/a),
+# upstream requests (total and per endpoint) and script errors.
+#
+#   python loadtest.py --app "Econ Dashboard.py" --sessions 1,2,4,8 --steps 8
+
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import io
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+import zipfile
+import zlib
+
+import numpy as np
+import pandas as pd
+
+try:                        # Unix only
+    import resource
+except ImportError:
+    resource = None
+try:                        # optional; gives the peak working set on Windows
+    import psutil
+except ImportError:
+    psutil = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+APPS = ("cadVSusa.py", "Econ Dashboard.py", "FX Models.py")
+WIDGET_KINDS = ("selectbox", "radio", "multiselect", "checkbox", "select_slider", "slider")
+WEEKLY_IDS = {"ICSA", "TBCBST", "SABST", "TOTLL", "BUSLOANS", "REALLN", "CONSUMER", "DPSACBW027SBOG", "CASACBW027SBOG"}
+QUARTERLY_IDS = {"GDP", "GDPC1", "BOPBCA"}
+
+
+# ---------- Stand-in data service ----------
+
+def synthetic_series(series_id: str, start=None, end=None) -> pd.Series:
+    """Deterministic random walk per id; daily for D*/T10Y* ids, weekly for H.8/claims, else monthly."""
+    sid = series_id.upper()
+    freq = ("B" if sid.startswith(("D", "T10Y")) else "W-WED" if sid in WEEKLY_IDS
+            else "QS" if sid in QUARTERLY_IDS else "MS")
+    idx = pd.date_range(max(pd.Timestamp(start or "1990-01-01"), pd.Timestamp("1990-01-01")),
+                        min(pd.Timestamp(end or "today"), pd.Timestamp.today()).normalize(), freq=freq)
+    rng = np.random.default_rng(zlib.crc32(sid.encode()))
+    walk = np.cumsum(rng.normal(0.05, 1.0, len(idx)))
+    return pd.Series(100.0 + walk, index=idx)
+
+
+def _table_zip(pid: int, vectors: int = 50) -> bytes:
+    months = pd.period_range("2000-01", pd.Timestamp.today().to_period("M"), freq="M").strftime("%Y-%m")
+    out = io.StringIO()
+    out.write("REF_DATE,GEO,DGUID,Characteristic,UOM,UOM_ID,SCALAR_FACTOR,SCALAR_ID,VECTOR,COORDINATE,VALUE,"
+              "STATUS,SYMBOL,TERMINATED,DECIMALS\n")
+    for i, m in enumerate(months):
+        for v in range(vectors):
+            out.write(f"{m},Canada,,Item {v},Units,1,units,0,v{pid * 100 + v},1.{v},{100 + i * 0.1 + v:.1f},,,,1\n")
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr(f"{pid}.csv", out.getvalue())
+        z.writestr(f"{pid}_MetaData.csv", "")
+    return buf.getvalue()
+
+
+class StandIn:
+    """Local FRED + StatCan WDS stand-in on 127.0.0.1, counting requests per endpoint."""
+
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000.0
+        self.counts: dict[str, int] = {}
+        self._lock = threading.Lock()
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                stand_in._handle(self)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def start(self) -> "StandIn":
+        threading.Thread(target=self.server.serve_forever, name="stand-in", daemon=True).start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+
+    def reset(self) -> dict:
+        with self._lock:
+            counts, self.counts = self.counts, {}
+        return counts
+
+    def _handle(self, h: BaseHTTPRequestHandler):
+        u = urlparse(h.path)
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        path = u.path
+        name = path.split("/fred/", 1)[-1] if path.startswith("/fred/") else path.rsplit("/wds/", 1)[-1].split("/")[0]
+        with self._lock:
+            self.counts[name] = self.counts.get(name, 0) + 1
+        if self.latency:
+            time.sleep(self.latency)
+        as_json = q.get("file_type") == "json"
+        try:
+            body, ctype = self._route(path, q, as_json)
+            status = 200
+        except KeyError as e:
+            body, ctype, status = json.dumps({"error": f"unknown endpoint {e}"}).encode(), "application/json", 404
+        h.send_response(status)
+        h.send_header("Content-Type", ctype)
+        h.send_header("Content-Length", str(len(body)))
+        h.end_headers()
+        h.wfile.write(body)
+
+    def _route(self, path: str, q: dict, as_json: bool) -> tuple[bytes, str]:
+        if path.endswith("/fred/series/observations"):
+            s = synthetic_series(q["series_id"], q.get("observation_start"), q.get("observation_end"))
+            obs = [(d.strftime("%Y-%m-%d"), f"{v:.4f}") for d, v in s.items()]
+            if as_json:
+                return json.dumps({"observations": [{"date": d, "value": v} for d, v in obs]}).encode(), "application/json"
+            rows = "".join(f'<observation date="{d}" value="{v}"/>' for d, v in obs)
+            return f"<observations>{rows}</observations>".encode(), "text/xml"
+        if path.endswith("/fred/series"):
+            sid = q["series_id"]
+            s = synthetic_series(sid, "2020-01-01")
+            freq = "D" if s.index.freqstr == "B" else {"W-WED": "W", "QS-JAN": "Q"}.get(s.index.freqstr, "M")
+            meta = {"id": sid, "title": f"{sid} (stand-in)", "frequency_short": freq, "units": "Index",
+                    "last_updated": "2026-01-01 07:00:00-06", "observation_start": "1990-01-01",
+                    "observation_end": s.index[-1].strftime("%Y-%m-%d")}
+            if as_json:
+                return json.dumps({"seriess": [meta]}).encode(), "application/json"
+            attrs = " ".join(f'{k}="{v}"' for k, v in meta.items())
+            return f"<seriess><series {attrs}/></seriess>".encode(), "text/xml"
+        if path.endswith("/fred/series/updates"):
+            return json.dumps({"count": 0, "seriess": []}).encode(), "application/json"
+        if path.endswith(("/fred/release/series", "/fred/category/series")):
+            items = [{"id": f"SYN{i:03d}", "title": f"Synthetic {i}", "frequency_short": "M", "units": "Index",
+                      "last_updated": "2026-01-01 07:00:00-06"} for i in range(50)]
+            return json.dumps({"count": len(items), "seriess": items}).encode(), "application/json"
+        if path.endswith("/getDataFromVectorByReferencePeriodRange"):
+            vid = q["vectorIds"]
+            s = synthetic_series(f"V{vid}", q.get("startRefPeriod"), q.get("endReferencePeriod"))
+            points = [{"refPer": d.strftime("%Y-%m-%d"), "value": round(v, 3)} for d, v in s.items()]
+            return json.dumps([{"status": "SUCCESS", "object": {"vectorId": int(vid), "vectorDataPoint": points}}]).encode(), \
+                "application/json"
+        if "/getFullTableDownloadCSV/" in path:
+            pid = int(path.split("/getFullTableDownloadCSV/", 1)[1].split("/")[0])
+            return json.dumps({"status": "SUCCESS", "object": f"{self.url}/wds/table/{pid}.zip"}).encode(), "application/json"
+        if "/wds/table/" in path:
+            return _table_zip(int(path.rsplit("/", 1)[1].split(".")[0])), "application/zip"
+        raise KeyError(path)
+
+
+# ---------- Simulated sessions (worker process) ----------
+
+def _mutate(at, rng: random.Random) -> str | None:
+    """Change one random widget to a random value; returns a description, None if nothing changed."""
+    widgets = [(kind, w) for kind in WIDGET_KINDS for w in getattr(at, kind) if not w.disabled]
+    rng.shuffle(widgets)
+    for kind, w in widgets:
+        try:
+            if kind == "checkbox":
+                w.set_value(not w.value)
+            elif kind == "multiselect":
+                opts = list(w.options)
+                if not opts:
+                    continue
+                w.set_value(rng.sample(opts, rng.randint(1, min(3, len(opts)))))
+            elif kind == "selectbox":
+                w.select_index(rng.randrange(len(w.options)))
+            elif kind in ("radio", "select_slider"):
+                w.set_value(rng.choice(list(w.options)))
+            else:
+                lo, hi = w.min, w.max
+                w.set_value(rng.randint(lo, hi) if isinstance(lo, int) else rng.uniform(lo, hi))
+            return f"{kind}:{w.label}"
+        except Exception:
+            continue
+    return None
+
+
+def _session(app: str, steps: int, seed: int, timeout: float, latencies: list, errors: list, lock):
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(seed)
+    at = AppTest.from_file(app, default_timeout=timeout)
+    for step in range(steps + 1):
+        action = "initial render" if step == 0 else _mutate(at, rng)
+        if action is None:
+            break
+        t0 = time.perf_counter()
+        try:
+            at.run()
+            failed = [e.message for e in at.exception]
+        except Exception as e:                      # timeout or harness failure
+            failed = [f"{type(e).__name__}: {e}"]
+        ms = (time.perf_counter() - t0) * 1000.0
+        with lock:
+            latencies.append(ms)
+            errors.extend(f"{action}: {m}" for m in failed)
+
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB (NaN when the platform offers no measure)."""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024.0   # bytes on macOS, KB on Linux
+    if psutil is not None:
+        mem = psutil.Process().memory_info()
+        return getattr(mem, "peak_wset", mem.rss) / 2**20
+    return float("nan")
+
+
+def run_worker(app: str, sessions: int, steps: int, seed: int, timeout: float) -> dict:
+    latencies, errors, lock = [], [], threading.Lock()
+    threads = [threading.Thread(target=_session, name=f"session-{i}",
+                                args=(app, steps, seed * 1000 + i, timeout, latencies, errors, lock))
+               for i in range(sessions)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    lat = np.asarray(latencies)
+    pct = np.percentile(lat, [50, 95, 99]) if len(lat) else [np.nan] * 3
+    return {
+        "sessions": sessions, "reruns": len(lat), "p50_ms": pct[0], "p95_ms": pct[1], "p99_ms": pct[2],
+        "reruns_per_s": len(lat) / wall if wall else np.nan, "wall_s": wall,
+        "peak_rss_mb": peak_rss_mb(),
+        "errors": len(errors), "first_errors": errors[:3],
+    }
+
+
+# ---------- Driver ----------
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Concurrent-session load test against a local stand-in data service")
+    ap.add_argument("--app", default="Econ Dashboard.py", choices=APPS)
+    ap.add_argument("--sessions", default="1,2,4,8", help="comma-separated N values")
+    ap.add_argument("--steps", type=int, default=8, help="random widget changes per session")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--timeout", type=float, default=300.0, help="per-rerun timeout (s)")
+    ap.add_argument("--upstream-ms", type=float, default=0.0, help="added latency per stand-in request")
+    ap.add_argument("--respect-limits", action="store_true", help="keep the FRED/StatCan rate limits")
+    ap.add_argument("--json", help="also write the results to this file")
+    ap.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args(argv)
+    app = os.path.join(HERE, args.app)
+
+    if args.worker is not None:
+        print(json.dumps(run_worker(app, args.worker, args.steps, args.seed, args.timeout)))
+        return
+
+    stand_in = StandIn(args.upstream_ms).start()
+    scratch = tempfile.mkdtemp(prefix="loadtest-")
+    env = {
+        **os.environ,
+        "FRED_API_BASE": f"{stand_in.url}/fred", "STATCAN_WDS_BASE": f"{stand_in.url}/wds",
+        "FRED_API_KEY": "loadtest", "SNAPSHOT_PATH": os.path.join(scratch, "none.aasnap"),
+        "SHARED_CACHE_DIR": "", "PYTHONPATH": HERE + os.pathsep + os.environ.get("PYTHONPATH", ""),
+    }
+    if not args.respect_limits:
+        env.update(FRED_RATE_PER_MIN="1000000", STATCAN_RATE_PER_S="1000000")
+
+    rows = []
+    try:
+        for n in (int(x) for x in args.sessions.split(",") if x.strip()):
+            stand_in.reset()
+            cmd = [sys.executable, os.path.abspath(__file__), "--app", args.app, "--worker", str(n),
+                   "--steps", str(args.steps), "--seed", str(args.seed), "--timeout", str(args.timeout)]
+            proc = subprocess.run(cmd, env=env, cwd=HERE, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr[-2000:], file=sys.stderr)
+                raise SystemExit(f"worker for N={n} failed")
+            row = json.loads(proc.stdout.strip().splitlines()[-1])
+            counts = stand_in.reset()
+            row["upstream"] = sum(counts.values())
+            row["upstream_by_endpoint"] = counts
+            rows.append(row)
+            print(f"N={n:<3} p50 {row['p50_ms']:7.0f} ms  p95 {row['p95_ms']:7.0f} ms  p99 {row['p99_ms']:7.0f} ms  "
+                  f"{row['reruns_per_s']:5.2f} reruns/s  RSS {row['peak_rss_mb']:6.0f} MB  "
+                  f"upstream {row['upstream']:4d}  errors {row['errors']}", flush=True)
+            for e in row["first_errors"]:
+                print(f"      {e[:160]}")
+    finally:
+        stand_in.stop()
+
+    table = pd.DataFrame(rows).set_index("sessions")
+    print()
+    print(table[["reruns", "p50_ms", "p95_ms", "p99_ms", "reruns_per_s", "peak_rss_mb", "upstream", "errors"]]
+          .round(1).to_string())
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(rows, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
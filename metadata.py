@@ -0,0 +1,163 @@
+# FRED series metadata cache and conditional refresh
+# --------------------------------------------------
+# Keeps title, last_updated, frequency, units and observation bounds per FRED series id.
+# The background refresher (refresh.py) asks versions() for the current last_updated of the
+# series it is about to refresh and skips the observation download when it matches the
+# value recorded with the stored copy, so most refreshes cost one metadata call.
+#
+# Batching: when many cached series are due at once, one paged call to fred/series/updates
+# (every series FRED revised in a time window, at most the last two weeks) replaces one
+# fred/series call per series; ids absent from the feed are known to be unchanged.
+
+from datetime import datetime, timedelta
+import threading
+import time
+from zoneinfo import ZoneInfo
+
+import requests
+
+from endpoints import FRED_API
+from singleflight import LIMITERS
+
+FRED_SERIES = f"{FRED_API}/series"
+FRED_UPDATES = f"{FRED_API}/series/updates"
+FIELDS = ("title", "last_updated", "frequency_short", "units", "observation_start", "observation_end")
+META_TTL_S = 3600          # cached metadata younger than this is used as is
+FAIL_BACKOFF_S = 300       # don't re-ask for an id that just failed
+BATCH_MIN = 5              # use the updates feed when at least this many ids need checking
+FEED_WINDOW = timedelta(days=13)
+UPDATES_PAGE = 1000
+
+_FRED_TZ = ZoneInfo("America/Chicago")
+
+
+def _updated(stamp: str) -> datetime:
+    """FRED last_updated ('2024-01-05 07:52:02-06') as an aware datetime; unparsable -> oldest."""
+    try:
+        return datetime.fromisoformat(stamp).astimezone(_FRED_TZ)
+    except (TypeError, ValueError):
+        return datetime.min.replace(tzinfo=_FRED_TZ)
+
+
+def fred_id(key: str) -> str | None:
+    """'FRED:DGS10' / 'FRED:DGS10|m' -> 'DGS10'; None for non-FRED keys."""
+    return key.split(":", 1)[1].split("|", 1)[0] if key.startswith("FRED:") else None
+
+
+class FredMetadata:
+    """Process-wide cache of FRED series metadata, keyed by series id."""
+
+    def __init__(self, api_key: str = "", session: requests.Session | None = None, ttl_s: float = META_TTL_S):
+        self.api_key = api_key
+        self.session = session or requests.Session()
+        self.ttl_s = ttl_s
+        self.cache: dict[str, dict] = {}
+        self.failed_at: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.calls = {"series": 0, "updates": 0}
+
+    # ----- single series -----
+    def _fetch(self, series_id: str, api_key: str) -> dict:
+        params = {"series_id": series_id, "api_key": api_key, "file_type": "json"}
+        LIMITERS["FRED"].acquire()
+        r = self.session.get(FRED_SERIES, params=params, timeout=30)
+        r.raise_for_status()
+        self.calls["series"] += 1
+        j = r.json()
+        items = j.get("seriess", []) or j.get("series", [])
+        if not items:
+            raise KeyError(series_id)
+        return {k: items[0].get(k, "") for k in FIELDS} | {"fetched_at": time.time()}
+
+    def get(self, series_id: str, api_key: str | None = None, max_age: float | None = None) -> dict:
+        """Metadata for one series, refetched when older than max_age (default ttl_s)."""
+        max_age = self.ttl_s if max_age is None else max_age
+        with self._lock:
+            m = self.cache.get(series_id)
+        if m is None or time.time() - m["fetched_at"] > max_age:
+            if m is None and time.time() - self.failed_at.get(series_id, 0.0) < FAIL_BACKOFF_S:
+                raise LookupError(f"metadata for {series_id} recently unavailable")
+            try:
+                m = self._fetch(series_id, api_key or self.api_key)
+            except Exception:
+                self.failed_at[series_id] = time.time()
+                if m is None:
+                    raise
+                return m                   # keep serving the older copy
+            with self._lock:
+                self.cache[series_id] = m
+        return m
+
+    def seed(self, items):
+        """Cache metadata already in hand, e.g. the series objects of a release/category listing
+        just fetched. Entries with the same or a newer last_updated are kept as they are."""
+        now = time.time()
+        with self._lock:
+            for it in items:
+                old = self.cache.get(it["id"])
+                if old is not None and _updated(old["last_updated"]) >= _updated(it.get("last_updated", "")):
+                    continue
+                self.cache[it["id"]] = {k: it.get(k, "") for k in FIELDS} | {"fetched_at": now}
+
+    # ----- batch -----
+    def updated_between(self, start: datetime, end: datetime, api_key: str | None = None) -> dict[str, str]:
+        """{series id: last_updated} for every series FRED updated in [start, end] (paged)."""
+        fmt = "%Y%m%d%H%M"
+        params = {
+            "api_key": api_key or self.api_key, "file_type": "json", "filter_value": "all",
+            "start_time": start.astimezone(_FRED_TZ).strftime(fmt), "end_time": end.astimezone(_FRED_TZ).strftime(fmt),
+            "limit": UPDATES_PAGE, "offset": 0,
+        }
+        out = {}
+        while True:
+            LIMITERS["FRED"].acquire()
+            r = self.session.get(FRED_UPDATES, params=params, timeout=60)
+            r.raise_for_status()
+            self.calls["updates"] += 1
+            j = r.json()
+            items = j.get("seriess", [])
+            out.update({it["id"]: it.get("last_updated", "") for it in items})
+            params["offset"] += len(items)
+            if len(items) < UPDATES_PAGE or params["offset"] >= int(j.get("count", 0)):
+                return out
+
+    def refresh_many(self, series_ids) -> dict[str, dict]:
+        """Bring metadata for many ids up to date, batching through the updates feed when possible."""
+        now = time.time()
+        with self._lock:
+            due = [s for s in dict.fromkeys(series_ids) if now - self.cache.get(s, {}).get("fetched_at", 0) > self.ttl_s]
+            known = [s for s in due if s in self.cache]
+            oldest = min((self.cache[s]["fetched_at"] for s in known), default=now)
+        unknown = [s for s in due if s not in known]
+
+        since = datetime.fromtimestamp(oldest).astimezone()
+        if len(known) >= BATCH_MIN and datetime.now().astimezone() - since < FEED_WINDOW:
+            try:
+                feed = self.updated_between(since - timedelta(minutes=5), datetime.now().astimezone())
+                with self._lock:
+                    for s in known:
+                        if s in feed and feed[s] != self.cache[s]["last_updated"]:
+                            unknown.append(s)             # changed: pull full metadata (bounds, units)
+                        else:
+                            self.cache[s]["fetched_at"] = now
+            except requests.RequestException:
+                unknown += known
+        else:
+            unknown += known
+
+        for s in unknown:
+            try:
+                self.get(s, max_age=0)
+            except Exception:
+                continue
+        with self._lock:
+            return {s: self.cache[s] for s in series_ids if s in self.cache}
+
+    # ----- refresher hook -----
+    def versions(self, keys) -> dict[str, str]:
+        """{store key: last_updated} for the FRED keys among `keys` (refresh.Refresher validator)."""
+        if not self.api_key:
+            return {}
+        ids = {k: fred_id(k) for k in keys if fred_id(k)}
+        meta = self.refresh_many(list(dict.fromkeys(ids.values())))
+        return {k: meta[s]["last_updated"] for k, s in ids.items() if s in meta}
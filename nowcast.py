@@ -0,0 +1,143 @@
+# Mixed-frequency nowcast of monthly retail sales from weekly data
+# ----------------------------------------------------------------
+# Bridge/MIDAS regression of monthly RSAFS growth on monthly growth of weekly indicators
+# (H.8 bank credit aggregates, ICSA claims), with time-varying coefficients estimated by a
+# Kalman filter:
+#   y_m = x_m' b_m + e_m,   b_m = b_{m-1} + w_m      (e ~ N(0, r), w ~ N(0, q I))
+# y_m is RSAFS month-on-month % change; x_m is [1, growth of each weekly series' month
+# average vs the previous month's average]. For the month being nowcast only some weeks
+# are in ("ragged edge"), so x uses the average of the weeks published so far; each new
+# weekly print moves the nowcast through x alone.
+#
+# The filter state (b, P, r, last month absorbed) is kept per model in a process-wide
+# registry. update() only runs measurement steps for months whose RSAFS print arrived since
+# the last call; the full history is re-filtered only on first use or when an already
+# absorbed month was revised.
+
+import threading
+
+import numpy as np
+import pandas as pd
+
+PRIOR_VAR = 10.0        # diffuse prior on coefficients (growth rates are O(1) %)
+STATE_NOISE = 1e-3      # q: how fast coefficients may drift per month
+R_DECAY = 0.97          # EWMA weight for the measurement-noise estimate
+MIN_WEEKS = 1           # weeks needed in the current month before nowcasting it
+
+
+def monthly_growth_features(weekly: pd.DataFrame) -> tuple[pd.DataFrame, pd.Series]:
+    """(features, weeks per month): % change of each column's month average vs the
+    previous complete month. The last month may be partial (ragged edge)."""
+    weekly = weekly.sort_index()
+    by_month = weekly.groupby(weekly.index.to_period("M"))
+    avg = by_month.mean()
+    weeks = by_month.size()
+    feats = avg.pct_change(fill_method=None) * 100.0
+    return feats, weeks
+
+
+def target_growth(level: pd.Series) -> pd.Series:
+    """Month-on-month % change of a monthly level series, indexed by Period[M]."""
+    level = level.dropna()
+    level.index = pd.DatetimeIndex(level.index).to_period("M")
+    return level.groupby(level.index).last().pct_change(fill_method=None).mul(100.0).dropna()
+
+
+class KalmanNowcaster:
+    """Time-varying-parameter bridge regression with persistent filter state."""
+
+    def __init__(self, columns: tuple[str, ...], q: float = STATE_NOISE):
+        self.columns = tuple(columns)
+        self.q = q
+        self.b: np.ndarray | None = None
+        self.P: np.ndarray | None = None
+        self.r = 1.0
+        self.last: pd.Period | None = None
+        self.absorbed: dict = {}          # month -> y used, to detect revisions
+        self.history: list = []           # (month, one-step prediction, actual)
+        self.steps = 0
+
+    def reset(self):
+        k = len(self.columns) + 1
+        self.b, self.P, self.r = np.zeros(k), np.eye(k) * PRIOR_VAR, 1.0
+        self.last, self.absorbed, self.history, self.steps = None, {}, [], 0
+
+    def _x(self, feats: pd.DataFrame, month) -> np.ndarray | None:
+        if month not in feats.index:
+            return None
+        row = feats.loc[month, list(self.columns)].to_numpy(dtype=float)
+        return None if not np.isfinite(row).all() else np.r_[1.0, row]
+
+    def _step(self, x: np.ndarray, y: float) -> float:
+        # predict (random-walk coefficients) then update with one monthly observation
+        self.P = self.P + self.q * np.eye(len(self.b))
+        pred = float(x @ self.b)
+        s = float(x @ self.P @ x) + self.r
+        gain = self.P @ x / s
+        err = y - pred
+        self.b = self.b + gain * err
+        self.P = self.P - np.outer(gain, x @ self.P)
+        self.r = R_DECAY * self.r + (1 - R_DECAY) * err * err
+        self.steps += 1
+        return pred
+
+    def update(self, target: pd.Series, weekly: pd.DataFrame) -> dict | None:
+        """Absorb newly published target months, then nowcast the first month without a print.
+
+        Returns {"month", "growth" (%), "std" (%), "level", "weeks", "coefficients", "history"}
+        or None when there is nothing to nowcast yet."""
+        y = target_growth(target)
+        feats, weeks = monthly_growth_features(weekly[list(self.columns)])
+        if self.b is None or any(abs(y.get(m, np.nan) - v) > 1e-9 for m, v in self.absorbed.items()
+                                 if m in y.index) or any(m not in y.index for m in self.absorbed):
+            self.reset()                         # first use or a revised month: re-filter once
+        for month, val in y.items():
+            if self.last is not None and month <= self.last:
+                continue
+            x = self._x(feats, month)
+            if x is None:
+                continue
+            pred = self._step(x, float(val))
+            self.history.append((month, pred, float(val)))
+            self.absorbed[month] = float(val)
+            self.last = month
+        if self.last is None:
+            return None
+        month = self.last + 1
+        levels = target.dropna()
+        levels.index = pd.DatetimeIndex(levels.index).to_period("M")
+        levels = levels.groupby(levels.index).last()
+        if month in levels.index:
+            return None                          # already printed; its weekly features are not in yet
+        x = self._x(feats, month)
+        n_weeks = int(weeks.get(month, 0))
+        if x is None or n_weeks < MIN_WEEKS:
+            return None
+        growth = float(x @ self.b)
+        std = float(np.sqrt(x @ self.P @ x + self.r))
+        base = levels.get(self.last)             # compound from the last absorbed month's level
+        level = float(base) * (1 + growth / 100.0) if base is not None else None
+        return {
+            "month": month, "growth": growth, "std": std, "level": level, "weeks": n_weeks,
+            "coefficients": pd.Series(self.b, index=["const", *self.columns]),
+            "history": pd.DataFrame(self.history, columns=["month", "predicted", "actual"]),
+        }
+
+
+# ---------- Process-wide models ----------
+_models: dict[tuple, KalmanNowcaster] = {}
+_lock = threading.Lock()
+
+
+def nowcast(target: pd.Series, weekly: pd.DataFrame, q: float = STATE_NOISE) -> dict | None:
+    """Nowcast with the persistent filter for this (target, regressor set, q)."""
+    key = (target.name, tuple(weekly.columns), q)
+    with _lock:
+        model = _models.setdefault(key, KalmanNowcaster(tuple(weekly.columns), q))
+        return model.update(target, weekly)
+
+
+def model_info() -> list[dict]:
+    with _lock:
+        return [{"target": k[0], "regressors": len(k[1]), "q": k[2], "months": m.steps,
+                 "last": str(m.last)} for k, m in _models.items()]
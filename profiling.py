@@ -0,0 +1,254 @@
+# Rerun profiling for the Streamlit apps (opt-in)
+# -----------------------------------------------
+# Times named sections of each script rerun (keys, fetch, merge, transforms, figures,
+# figure serialization) and optionally captures a profile of the slowest reruns.
+#
+# Enable with either:
+#   PROFILE_RERUNS=1                 every session, every rerun
+#   ?profile=1 in the app URL        just that session
+# Optional capture of the slowest reruns (env only, written to PROFILE_DIR):
+#   PROFILE_CAPTURE=cprofile         cProfile .prof dumps (open with snakeviz / pstats)
+#   PROFILE_CAPTURE=sample           sampled stacks as .folded files (flamegraph.pl / speedscope)
+#   PROFILE_DIR=./profiles  PROFILE_KEEP=5  PROFILE_SAMPLE_MS=5
+#
+# Usage in a script:
+#   profiling.begin("cadVSusa")           right after st.set_page_config
+#   with profiling.section("keys"): ...   or @profiling.timed("fetch") on helpers
+#   profiling.end()                       last line; shows the table in the sidebar
+# Sections nest; each reports exclusive time. Plotly Express builders and st.plotly_chart
+# are wrapped automatically ("figures" / "figure serialization").
+# A rerun cut short by st.stop() or an exception never reaches end(); begin() frees any
+# capture such a rerun left running.
+
+from collections import defaultdict
+import contextlib
+import cProfile
+import functools
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+import streamlit as st
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_CAPTURE = os.getenv("PROFILE_CAPTURE", "").lower()
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "5"))
+PROFILE_SAMPLE_MS = float(os.getenv("PROFILE_SAMPLE_MS", "5"))
+
+_local = threading.local()
+_owner = None                         # the rerun holding the one cProfile/sampler capture per process
+_owner_lock = threading.Lock()
+_slowest: list[tuple[float, str]] = []  # min-heap of (seconds, path) across all sessions
+_slowest_lock = threading.Lock()
+_instrumented = False
+
+
+def enabled() -> bool:
+    if os.getenv("PROFILE_RERUNS", "") not in ("", "0"):
+        return True
+    try:
+        return st.query_params.get("profile") == "1"
+    except Exception:
+        return False
+
+
+class _Rerun:
+    def __init__(self, app: str):
+        self.app = app
+        self.t0 = time.perf_counter()
+        self.times: dict[str, float] = defaultdict(float)
+        self.counts: dict[str, int] = defaultdict(int)
+        self.stack: list[list] = []     # [name, start, child_time]
+        self.profiler = None
+        self.sampler = None
+        self.thread = threading.current_thread()
+
+
+def _current() -> _Rerun | None:
+    return getattr(_local, "rerun", None)
+
+
+# ---------- Sections ----------
+
+@contextlib.contextmanager
+def section(name: str):
+    """Attribute the enclosed time (minus nested sections) to `name`."""
+    run = _current()
+    if run is None:
+        yield
+        return
+    frame = [name, time.perf_counter(), 0.0]
+    run.stack.append(frame)
+    try:
+        yield
+    finally:
+        run.stack.pop()
+        elapsed = time.perf_counter() - frame[1]
+        run.times[name] += elapsed - frame[2]
+        run.counts[name] += 1
+        if run.stack:
+            run.stack[-1][2] += elapsed
+
+
+def timed(name: str):
+    """Decorator form of section(); put it above @memo so cache hits are timed too."""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with section(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+
+def _instrument():
+    """Wrap Plotly Express builders and plotly_chart once per process (no-op outside a profiled rerun)."""
+    global _instrumented
+    if _instrumented:
+        return
+    import plotly.express as px
+    from streamlit.delta_generator import DeltaGenerator
+
+    for fn in ("line", "bar", "scatter", "imshow", "area", "histogram"):
+        setattr(px, fn, timed("figures")(getattr(px, fn)))
+    DeltaGenerator.plotly_chart = timed("figure serialization")(DeltaGenerator.plotly_chart)
+    st.plotly_chart = timed("figure serialization")(st.plotly_chart)
+    _instrumented = True
+
+
+# ---------- Capture (slowest reruns) ----------
+
+class _Sampler(threading.Thread):
+    """Samples the script thread's Python stack every PROFILE_SAMPLE_MS into folded-stack counts."""
+
+    def __init__(self, thread_id: int):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.stacks: dict[str, int] = defaultdict(int)
+        self.stop_event = threading.Event()
+
+    def run(self):
+        while not self.stop_event.wait(PROFILE_SAMPLE_MS / 1000.0):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                frame = frame.f_back
+            if names:
+                self.stacks[";".join(reversed(names))] += 1
+
+    def write(self, path: str):
+        with open(path, "w") as f:
+            for stack, n in sorted(self.stacks.items()):
+                f.write(f"{stack} {n}\n")
+
+
+def _start_capture(run: _Rerun):
+    global _owner
+    if PROFILE_CAPTURE not in ("cprofile", "sample"):
+        return
+    with _owner_lock:
+        if _owner is not None:
+            return
+        _owner = run
+    try:
+        if PROFILE_CAPTURE == "cprofile":
+            run.profiler = cProfile.Profile()
+            run.profiler.enable()
+        else:
+            run.sampler = _Sampler(threading.get_ident())
+            run.sampler.start()
+    except ValueError:  # another profiler already active in this interpreter
+        run.profiler = None
+        with _owner_lock:
+            _owner = None
+
+
+def _stop_capture(run: _Rerun) -> bool:
+    """Stop run's profiler/sampler and free the capture slot. False if run did not hold it."""
+    global _owner
+    with _owner_lock:
+        if _owner is not run:
+            return False
+        _owner = None
+    if run.profiler is not None:
+        with contextlib.suppress(Exception):
+            run.profiler.disable()
+    if run.sampler is not None:
+        run.sampler.stop_event.set()
+        run.sampler.join()
+    return True
+
+
+def _release_stale():
+    """Free a capture left open by a rerun that never reached end() (st.stop(), an exception):
+    the previous rerun on this thread, or one whose script thread has exited."""
+    if _current() is not None:
+        _stop_capture(_current())
+    owner = _owner
+    if owner is not None and not owner.thread.is_alive():
+        _stop_capture(owner)
+
+
+def _finish_capture(run: _Rerun, total: float):
+    if not _stop_capture(run):
+        return
+    with _slowest_lock:
+        if len(_slowest) >= PROFILE_KEEP and total <= _slowest[0][0]:
+            return
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        ext = "prof" if run.profiler is not None else "folded"
+        path = os.path.join(PROFILE_DIR, f"{run.app}_{time.strftime('%Y%m%d-%H%M%S')}_{total * 1000:.0f}ms.{ext}")
+        if run.profiler is not None:
+            run.profiler.dump_stats(path)
+        else:
+            run.sampler.write(path)
+        heapq.heappush(_slowest, (total, path))
+        if len(_slowest) > PROFILE_KEEP:
+            _, evicted = heapq.heappop(_slowest)
+            with contextlib.suppress(OSError):
+                os.remove(evicted)
+
+
+# ---------- Rerun lifecycle ----------
+
+def begin(app: str):
+    """Start timing this rerun (no-op unless profiling is enabled)."""
+    _release_stale()
+    _local.rerun = None
+    if not enabled():
+        return
+    _instrument()
+    run = _Rerun(app)
+    _local.rerun = run
+    _start_capture(run)
+
+
+def end():
+    """Finish the rerun: log timings to PROFILE_DIR/reruns.jsonl and show them in the sidebar."""
+    run = _current()
+    if run is None:
+        return
+    _local.rerun = None
+    total = time.perf_counter() - run.t0
+    _finish_capture(run, total)
+
+    timed_total = sum(run.times.values())
+    row = {"app": run.app, "ts": time.time(), "total_s": round(total, 4),
+           **{k: round(v, 4) for k, v in run.times.items()}, "other": round(total - timed_total, 4)}
+    with contextlib.suppress(OSError):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        with open(os.path.join(PROFILE_DIR, "reruns.jsonl"), "a") as f:
+            f.write(json.dumps(row) + "\n")
+
+    table = pd.DataFrame(
+        [(k, v * 1000, run.counts[k]) for k, v in run.times.items()] + [("other", (total - timed_total) * 1000, 0)],
+        columns=["section", "ms", "calls"],
+    ).sort_values("ms", ascending=False)
+    with st.sidebar.expander(f"⏱️ Rerun profile — {total * 1000:.0f} ms", expanded=False):
+        st.dataframe(table.round(1), hide_index=True, use_container_width=True)
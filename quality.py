@@ -0,0 +1,182 @@
+# Data-quality validation at ingest
+# ---------------------------------
+# One vectorised pass over every series written to the store (store.SeriesStore.put/merge).
+# The store keeps the cleaned arrays (float64 values, tz-naive int64 ns dates, sorted, one
+# value per date, no NaN) and the report under meta["quality"], so readers can use stored
+# series as they are: no to_numeric / dropna / sort_index / tz_localize on the read path.
+#
+# clean()     raw Series -> arrays + counts for this write: non-numeric values (FRED's "."),
+#             missing values, rows without a date, duplicate dates (and how many disagree;
+#             the last one wins), whether the input was out of order.
+# inspect()   properties of the whole stored series: nominal frequency from the median
+#             spacing, gaps (spacing above that frequency's bound), frequency breaks (a
+#             sustained change of spacing, e.g. quarterly history followed by monthly data),
+#             outliers (first differences beyond OUTLIER_Z robust z-scores).
+# revisions() changes to already-stored observations in this write; "jumps" are revisions
+#             larger than OUTLIER_Z robust z-scores of the series' usual move.
+#
+# Reports are plain JSON types (they travel in snapshot / shared-cache bundle headers) and
+# list at most MAX_EXAMPLES dates per issue.
+
+import numpy as np
+import pandas as pd
+
+DAY_NS = 86_400 * 10**9
+# Frequency classes by spacing in days: upper bound of a normal step (business days with a
+# holiday, 7 days, month, quarter, year). A step above the nominal class's bound is a gap.
+FREQ_BOUNDS = {"D": 5, "W": 10, "M": 45, "Q": 135, "A": 500}
+OUTLIER_Z = 8.0          # robust z (MAD of first differences) beyond which a move is flagged
+BREAK_MIN = 6            # consecutive steps of another frequency class that count as a break
+MAX_EXAMPLES = 5
+
+_CLASSES = np.array(list(FREQ_BOUNDS))
+_EDGES = np.array(list(FREQ_BOUNDS.values()), dtype=float)
+
+
+def _iso(ns) -> str:
+    return str(np.datetime64(int(ns), "ns").astype("datetime64[D]"))
+
+
+def _examples(dates_ns, pos) -> list[str]:
+    return [_iso(dates_ns[p]) for p in pos[:MAX_EXAMPLES]]
+
+
+def _scale(dx: np.ndarray) -> tuple[float, float]:
+    """(median, robust scale) of first differences; scale 0 for step series (policy rates)."""
+    dx = dx[np.isfinite(dx)]
+    if not len(dx):
+        return 0.0, 0.0
+    med = float(np.median(dx))
+    return med, 1.4826 * float(np.median(np.abs(dx - med)))
+
+
+def clean(raw: pd.Series) -> tuple[np.ndarray, np.ndarray, dict]:
+    """(dates ns, values, counts): sorted, unique, finite observations of one raw write."""
+    idx = pd.DatetimeIndex(raw.index)
+    if idx.tz is not None:
+        idx = idx.tz_localize(None)
+    d = idx.as_unit("ns").asi8
+    obj = raw.to_numpy()
+    missing = pd.isna(obj)
+    v = pd.to_numeric(obj, errors="coerce").astype(np.float64, copy=False)
+    bad = ~np.isfinite(v)
+    nodate = idx.isna()
+    keep = ~bad & ~nodate
+    d, v = d[keep], v[keep]
+
+    unsorted = bool(len(d) > 1 and (np.diff(d) < 0).any())
+    order = np.argsort(d, kind="stable")
+    d, v = d[order], v[order]
+    same = d[1:] == d[:-1]
+    conflicting = int((same & (v[1:] != v[:-1])).sum())
+    last = np.r_[~same, True] if len(d) else np.zeros(0, dtype=bool)    # last value per date wins
+    counts = {
+        "rows": len(raw),
+        "missing": int((missing & ~nodate).sum()),
+        "non_numeric": int((bad & ~missing & ~nodate).sum()),
+        "no_date": int(nodate.sum()),
+        "duplicates": int(same.sum()),
+        "conflicting": conflicting,
+        "unsorted": unsorted,
+    }
+    return d[last], v[last], counts
+
+
+def inspect(d: np.ndarray, v: np.ndarray) -> dict:
+    """Frequency, gaps, frequency breaks and outliers of a clean sorted series."""
+    rep = {"n": len(d), "first": _iso(d[0]) if len(d) else None, "last": _iso(d[-1]) if len(d) else None,
+           "frequency": None, "gaps": 0, "gap_dates": [], "breaks": [], "outliers": 0, "outlier_dates": []}
+    if len(d) < 3:
+        return rep
+    step = np.diff(d) / DAY_NS
+    cls = np.minimum(np.searchsorted(_EDGES, step), len(_EDGES) - 1)     # frequency class of each step
+    nominal = int(np.minimum(np.searchsorted(_EDGES, np.median(step)), len(_EDGES) - 1))
+    rep["frequency"] = str(_CLASSES[nominal])
+
+    # runs of one step class; long runs are regimes, a change of class between regimes is a break
+    starts = np.r_[0, np.flatnonzero(np.diff(cls)) + 1]
+    lengths = np.diff(np.r_[starts, len(cls)])
+    long = starts[lengths >= BREAK_MIN]
+    if len(long) > 1:
+        turn = np.flatnonzero(cls[long[1:]] != cls[long[:-1]]) + 1
+        rep["breaks"] = [{"date": _iso(d[long[i]]), "from": str(_CLASSES[cls[long[i - 1]]]),
+                          "to": str(_CLASSES[cls[long[i]]])} for i in turn[:MAX_EXAMPLES]]
+
+    # a gap is a step above the bound of the regime it falls in (so quarterly history before a
+    # switch to monthly is a break, not a run of gaps)
+    regime = np.full(len(cls), nominal)
+    if len(long):
+        at = np.full(len(cls), -1)
+        at[long] = long
+        at = np.maximum.accumulate(at)
+        regime = np.where(at >= 0, cls[np.maximum(at, 0)], cls[long[0]])
+    gaps = np.flatnonzero(step > _EDGES[regime])
+    rep["gaps"] = len(gaps)
+    rep["gap_dates"] = _examples(d, gaps[np.argsort(-step[gaps], kind="stable")] + 1)   # first date after, largest first
+
+    dx = np.diff(v)
+    med, scale = _scale(dx)
+    if scale > 0:
+        z = np.abs(dx - med) / scale
+        out = np.flatnonzero(z > OUTLIER_Z)
+        rep["outliers"] = len(out)
+        rep["outlier_dates"] = _examples(d, out[np.argsort(-z[out], kind="stable")] + 1)
+    return rep
+
+
+def revisions(old_d: np.ndarray, old_v: np.ndarray, new_d: np.ndarray, new_v: np.ndarray) -> dict:
+    """Stored observations this write changes: count, largest change and outsized jumps."""
+    _, io, inew = np.intersect1d(old_d, new_d, assume_unique=True, return_indices=True)
+    delta = new_v[inew] - old_v[io]
+    changed = np.flatnonzero(np.abs(delta) > 1e-9 * np.maximum(1.0, np.abs(old_v[io])))
+    rep = {"overlap": len(io), "revised": len(changed), "max_revision": 0.0, "jumps": 0, "jump_dates": []}
+    if not len(changed):
+        return rep
+    rep["max_revision"] = float(np.abs(delta[changed]).max())
+    _, scale = _scale(np.diff(old_v))
+    if scale > 0:
+        jumps = changed[np.abs(delta[changed]) > OUTLIER_Z * scale]
+        rep["jumps"] = len(jumps)
+        rep["jump_dates"] = _examples(new_d, inew[jumps])
+    return rep
+
+
+def flags(report: dict) -> list[str]:
+    """Names of the issues present in a report (empty for a clean series)."""
+    w = report.get("write", {})
+    checks = {
+        "gaps": report.get("gaps", 0), "frequency break": report.get("breaks"), "outliers": report.get("outliers", 0),
+        "duplicates": w.get("conflicting", 0), "non-numeric": w.get("non_numeric", 0),
+        "revision jumps": w.get("jumps", 0),
+    }
+    return [name for name, hit in checks.items() if hit]
+
+
+def validate(raw: pd.Series, old: tuple[np.ndarray, np.ndarray] | None = None) -> tuple[np.ndarray, np.ndarray, dict]:
+    """Clean one write and, when `old` (dates, values) is given, splice it over the stored copy
+    (new values win on equal dates). Returns (dates, values, report) for the resulting series."""
+    d, v, write = clean(raw)
+    if old is not None and len(old[0]):
+        od, ov = old
+        write.update(revisions(od, ov, d, v))
+        keep = ~np.isin(od, d, assume_unique=True)
+        d, v = np.concatenate([od[keep], d]), np.concatenate([ov[keep], v])
+        order = np.argsort(d, kind="stable")
+        d, v = d[order], v[order]
+    report = inspect(d, v) | {"write": write}
+    report["flags"] = flags(report)
+    return d, v, report
+
+
+def quality_table(meta: dict) -> pd.DataFrame:
+    """One row per series with a report: key, n, frequency, issue counts and flags."""
+    rows = []
+    for key, m in meta.items():
+        q = m.get("quality")
+        if q:
+            w = q.get("write", {})
+            rows.append({"series": key, "n": q["n"], "frequency": q["frequency"], "gaps": q["gaps"],
+                         "breaks": len(q["breaks"]), "outliers": q["outliers"], "revised": w.get("revised", 0),
+                         "jumps": w.get("jumps", 0), "flags": ", ".join(q.get("flags", []))})
+    return pd.DataFrame(rows, columns=["series", "n", "frequency", "gaps", "breaks", "outliers", "revised",
+                                       "jumps", "flags"])
@@ -0,0 +1,156 @@
+# Background refresh with per-frequency TTL (stale-while-revalidate)
+# ------------------------------------------------------------------
+# A daemon thread keeps the series store fresh so page reruns never wait on the network
+# for data the store already has. Every series read through store.read_through() registers
+# its fetch function here; once the series is older than its TTL, readers get the stored
+# copy immediately and the refresh is queued. The daemon also sweeps all registered
+# series every POLL_S seconds.
+#
+# TTL follows the series' frequency: daily data (DGS10, DEXCAUS) daily, weekly (H.8, ICSA)
+# weekly, monthly (CPI, retail) monthly, quarterly (GDP) quarterly. The frequency comes from
+# meta["frequency"] if set, "|m" keys are monthly, otherwise it is inferred from the dates.
+# StatCan series are not refreshed during the 00:00-08:30 ET lock window.
+#
+# Page-level memo wrappers (cache.py) use CACHE_TTL_S so refreshed data reaches reruns.
+#
+# An optional validator (e.g. metadata.FredMetadata.versions) maps due keys to a source
+# version token such as FRED's last_updated; a series whose token matches the one stored
+# with it is marked fresh without downloading observations.
+
+import os
+import threading
+import time
+
+import pandas as pd
+
+from growth import infer_frequency, normalize_frequency
+from singleflight import FLIGHTS, limited
+from store import SeriesStore, in_statcan_lock_window
+
+DAY_S = 86400
+TTL_S = {"D": DAY_S, "W": 7 * DAY_S, "BW": 14 * DAY_S, "M": 30 * DAY_S, "Q": 91 * DAY_S,
+         "SA": 182 * DAY_S, "A": 365 * DAY_S}
+POLL_S = float(os.getenv("REFRESH_POLL_S", "300"))
+CACHE_TTL_S = int(os.getenv("REFRESH_CACHE_TTL_S", "600"))
+RETRY_S = 900          # wait after a failed refresh before trying that series again
+
+
+class Refresher(threading.Thread):
+    """Daemon that refreshes stale series in the store; attach with store.refresher = Refresher(store)."""
+
+    def __init__(self, store: SeriesStore, poll_s: float = POLL_S, validator=None):
+        super().__init__(name="series-refresher", daemon=True)
+        self.store = store
+        self.poll_s = poll_s
+        self.validator = validator        # keys -> {key: version token}
+        self.fetchers: dict = {}
+        self.pending: list[str] = []
+        self.retry_at: dict[str, float] = {}
+        self.cond = threading.Condition()
+        self.refreshed = 0
+        self.failed = 0
+        self.unchanged = 0
+        self.last_sweep: float | None = None
+
+    # ----- bookkeeping -----
+    def register(self, key: str, fetch):
+        with self.cond:
+            self.fetchers[key] = fetch
+
+    def frequency(self, key: str) -> str:
+        meta = self.store.meta.get(key, {})
+        f = normalize_frequency(meta.get("frequency", ""))
+        if f:
+            return f
+        if key.endswith("|m"):
+            return "M"
+        s = self.store.get(key)
+        if s is None or len(s) < 2:
+            return "D"
+        f = self.store.meta.setdefault(key, {})["frequency"] = infer_frequency(s)
+        return f
+
+    def is_stale(self, key: str, now: float | None = None) -> bool:
+        updated = self.store.meta.get(key, {}).get("updated_at", 0.0)
+        return (now or time.time()) - updated > TTL_S[self.frequency(key)]
+
+    def request(self, key: str):
+        """Queue a refresh (no-op if already queued); returns immediately."""
+        with self.cond:
+            if key not in self.pending:
+                self.pending.append(key)
+                self.cond.notify()
+
+    # ----- work -----
+    def _versions(self, keys: list[str]) -> dict:
+        if self.validator is None or not keys:
+            return {}
+        try:
+            return self.validator(keys)
+        except Exception:
+            return {}
+
+    def _refresh(self, key: str, version=None):
+        if self.store.sync(key) and not self.is_stale(key):
+            return                             # another worker process already refreshed it
+        fetch = self.fetchers.get(key)
+        cov = self.store.coverage(key)
+        if fetch is None or cov is None:
+            return
+        now = time.time()
+        if now < self.retry_at.get(key, 0.0) or (key.startswith("StatCan:") and in_statcan_lock_window()):
+            return
+        meta = self.store.meta.setdefault(key, {})
+        if version is not None and version == meta.get("source_version"):
+            meta["updated_at"] = now           # source unchanged since the stored copy
+            self.unchanged += 1
+            return
+        today = pd.Timestamp.today().normalize()
+        last = self.store.last_date(key)
+        start = min(last, cov[1]) if last is not None else cov[1]
+        fetch = limited(key, fetch)
+        try:
+            FLIGHTS.do(key, lambda: self.store.merge(
+                key, fetch(start.strftime("%Y-%m-%d"), today.strftime("%Y-%m-%d")),
+                coverage=(start, today), meta={"source_version": version} if version else None,
+            ))
+            self.refreshed += 1
+        except Exception as e:
+            self.failed += 1
+            self.retry_at[key] = now + RETRY_S
+            self.store.meta.setdefault(key, {})["last_error"] = str(e)[:200]
+
+    def _due(self) -> list[str]:
+        now = time.time()
+        with self.cond:
+            keys = list(self.fetchers)
+        return [k for k in keys if self.is_stale(k, now)]
+
+    def run(self):
+        next_sweep = 0.0
+        while True:
+            with self.cond:
+                if not self.pending:
+                    self.cond.wait(timeout=max(0.0, next_sweep - time.time()))
+                batch, self.pending = self.pending, []
+            if time.time() >= next_sweep:
+                batch += [k for k in self._due() if k not in batch]
+                self.last_sweep = time.time()
+                next_sweep = self.last_sweep + self.poll_s
+            versions = self._versions(batch)
+            for key in batch:
+                self._refresh(key, versions.get(key))
+
+    def status(self) -> dict:
+        with self.cond:
+            return {"tracked": len(self.fetchers), "pending": len(self.pending),
+                    "refreshed": self.refreshed, "unchanged": self.unchanged, "failed": self.failed,
+                    "last_sweep": self.last_sweep}
+
+
+def start_refresher(store: SeriesStore, poll_s: float = POLL_S, validator=None) -> Refresher:
+    """Attach and start a refresher for `store` (idempotent)."""
+    if getattr(store, "refresher", None) is None:
+        store.refresher = Refresher(store, poll_s, validator)
+        store.refresher.start()
+    return store.refresher
@@ -0,0 +1,82 @@
+# Closed-form OLS helpers (numpy only)
+# ------------------------------------
+# Simple y = a + b x regressions from sufficient statistics (n, Σx, Σy, Σxx, Σxy, Σyy).
+# Used for Phillips-curve fits in cadVSusa.py instead of plotly's statsmodels trendline.
+
+import numpy as np
+import pandas as pd
+
+
+def _from_sums(n, sx, sy, sxx, sxy, syy):
+    """Slope, intercept and R² from sufficient statistics (all array-like, same shape)."""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vxx = n * sxx - sx * sx
+        vyy = n * syy - sy * sy
+        cxy = n * sxy - sx * sy
+        slope = cxy / vxx
+        intercept = (sy - slope * sx) / n
+        r2 = (cxy * cxy) / (vxx * vyy)
+    return slope, intercept, r2
+
+
+def ols_fit(x, y) -> dict[str, float]:
+    """Single OLS fit of y on x, ignoring pairs with a NaN."""
+    x, y = np.asarray(x, dtype=float), np.asarray(y, dtype=float)
+    ok = np.isfinite(x) & np.isfinite(y)
+    x, y = x[ok], y[ok]
+    slope, intercept, r2 = _from_sums(len(x), x.sum(), y.sum(), (x * x).sum(), (x * y).sum(), (y * y).sum())
+    return {"slope": float(slope), "intercept": float(intercept), "r2": float(r2), "n": int(len(x))}
+
+
+def grouped_ols(frame: pd.DataFrame, x: str, y: str, by: list[str]) -> pd.DataFrame:
+    """One OLS fit per group in a single pass (bincount sums over group codes)."""
+    sub = frame[by + [x, y]].dropna()
+    if sub.empty:
+        return pd.DataFrame(columns=by + ["slope", "intercept", "r2", "n"])
+    codes, uniques = pd.MultiIndex.from_frame(sub[by]).factorize()
+    xv, yv = sub[x].to_numpy(float), sub[y].to_numpy(float)
+    k = len(uniques)
+    n = np.bincount(codes, minlength=k).astype(float)
+    sums = [np.bincount(codes, weights=w, minlength=k) for w in (xv, yv, xv * xv, xv * yv, yv * yv)]
+    slope, intercept, r2 = _from_sums(n, *sums)
+    out = pd.DataFrame(list(uniques), columns=by)
+    out["slope"], out["intercept"], out["r2"], out["n"] = slope, intercept, r2, n.astype(int)
+    return out
+
+
+def rolling_ols(x: pd.Series, y: pd.Series, window: int) -> pd.DataFrame:
+    """Rolling slope/intercept/R² over `window` aligned observations, via cumulative sums."""
+    xy = pd.concat([x.rename("x"), y.rename("y")], axis=1).dropna()
+    if len(xy) < window:
+        return pd.DataFrame(columns=["slope", "intercept", "r2"], index=xy.index[:0])
+    xv, yv = xy["x"].to_numpy(float), xy["y"].to_numpy(float)
+
+    def wsum(v):
+        c = np.concatenate([[0.0], np.cumsum(v)])
+        return c[window:] - c[:-window]
+
+    slope, intercept, r2 = _from_sums(
+        float(window), wsum(xv), wsum(yv), wsum(xv * xv), wsum(xv * yv), wsum(yv * yv)
+    )
+    return pd.DataFrame({"slope": slope, "intercept": intercept, "r2": r2}, index=xy.index[window - 1:])
+
+
+def subperiods(index: pd.DatetimeIndex, breaks) -> dict[str, tuple[pd.Timestamp, pd.Timestamp]]:
+    """'Full' sample plus consecutive segments split at each break date (segments exclude their end break)."""
+    if len(index) == 0:
+        return {}
+    lo, hi = index.min(), index.max()
+    edges = [lo] + sorted(pd.Timestamp(b) for b in breaks if lo < pd.Timestamp(b) < hi) + [hi]
+    periods = {"Full": (lo, hi)}
+    if len(edges) > 2:
+        for a, b in zip(edges[:-1], edges[1:]):
+            if b < hi:
+                b = b - pd.Timedelta(days=1)
+            periods[f"{a:%Y-%m}–{b:%Y-%m}"] = (a, b)
+    return periods
+
+
+def stack_periods(frame: pd.DataFrame, periods: dict[str, tuple]) -> pd.DataFrame:
+    """Long frame with one copy of the rows in each period, tagged by a 'period' column."""
+    parts = [frame.loc[a:b].assign(period=name) for name, (a, b) in periods.items()]
+    return pd.concat(parts) if parts else frame.assign(period=pd.Series(dtype=str))
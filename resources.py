@@ -0,0 +1,100 @@
+# Process-wide shared resources
+# -----------------------------
+# st.cache_resource singletons shared by every page and session of the multipage app
+# (app.py), so connection pools, clients and the series store are built once per server
+# rather than once per script. The pages also import these when run standalone.
+
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import streamlit as st
+from fredapi import Fred
+
+from endpoints import FRED_API
+from metadata import FredMetadata
+from refresh import start_refresher
+from rolling import IncrementalTransforms
+from store import SeriesStore, get_store
+
+DARK_BG = "#0e1014"
+PRIMARY_TEXT = "#e5e7eb"
+DARK_LAYOUT = dict(template="plotly_dark", paper_bgcolor=DARK_BG, plot_bgcolor=DARK_BG)
+
+# Key file locations used by the original scripts; FRED_KEYS_PATH overrides
+KEYS_PATHS = (
+    r"C:\Users\nilee\OneDrive\Documents\keys.txt",
+    r"C:\Users\nilee\Sharia\keys.txt",
+)
+
+
+@st.cache_resource(show_spinner=False)
+def default_fred_key() -> str:
+    """FRED key from FRED_API_KEY or the first readable key file; '' if none."""
+    key = os.getenv("FRED_API_KEY", "")
+    if key:
+        return key
+    for path in filter(None, (os.getenv("FRED_KEYS_PATH"), *KEYS_PATHS)):
+        try:
+            with open(os.path.expanduser(path), "r") as f:
+                key = f.read().strip()
+            if key:
+                return key
+        except OSError:
+            continue
+    return ""
+
+
+@st.cache_resource(show_spinner=False)
+def http_session() -> requests.Session:
+    """Pooled keep-alive session for FRED / StatCan REST calls (retries transient 5xx/429, never 409)."""
+    s = requests.Session()
+    retry = Retry(total=2, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504),
+                  allowed_methods=("GET",), raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    return s
+
+
+@st.cache_resource(show_spinner=False)
+def fred_client(api_key: str) -> Fred:
+    fred = Fred(api_key=api_key)
+    fred.root_url = FRED_API
+    return fred
+
+
+@st.cache_resource(show_spinner=False)
+def series_store() -> SeriesStore:
+    """The shared series store (loads the startup snapshot on first use) with its background
+    refresher running, unless REFRESH_DISABLE=1."""
+    store = get_store()
+    if os.getenv("REFRESH_DISABLE", "") in ("", "0"):
+        start_refresher(store, validator=fred_metadata().versions)
+    return store
+
+
+@st.cache_resource(show_spinner=False)
+def rolling_state() -> IncrementalTransforms:
+    """Per-key rolling/YoY state over the shared store, updated from its write notifications."""
+    return IncrementalTransforms(series_store())
+
+
+@st.cache_resource(show_spinner=False)
+def fred_metadata() -> FredMetadata:
+    """Shared FRED metadata cache (title, last_updated, frequency, units, bounds)."""
+    return FredMetadata(default_fred_key(), http_session())
+
+
+def apply_theme():
+    """Dark background CSS; cheap, so injected on every rerun of every page."""
+    st.markdown(
+        f"""
+        <style>
+          .stApp {{ background-color: {DARK_BG}; color: {PRIMARY_TEXT}; }}
+          .sidebar .sidebar-content {{ background-color: {DARK_BG}; }}
+        </style>
+        """,
+        unsafe_allow_html=True,
+    )
@@ -0,0 +1,407 @@
+# Rolling statistics: incremental and panel-vectorised
+# ----------------------------------------------------
+# Stateful versions of the CFA helpers in cadVSusa.py (pct_yoy, pct_qoq_annualized,
+# rolling_zscore, rolling_corr). Each keeps only its window and updates in O(1) per new
+# observation, so a refresh that appends a few points does not recompute full history.
+# IncrementalTransforms keeps that state per series-store key across refreshes.
+#
+# Outputs match the pandas versions: NaN until the window is full or while it contains
+# a NaN; rolling std uses ddof=1. Windowed mean / co-moments use Welford add/remove
+# updates and are re-summed from the window every RESYNC_EVERY removals to bound drift.
+
+from collections import deque
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+RESYNC_EVERY = 1024
+
+
+class LagRatio:
+    """(x_t / x_{t-lag}) ** power - 1, in percent. lag=12 -> YoY; lag=3, power=4 -> 3m/3m annualized."""
+
+    def __init__(self, lag: int = 12, power: float = 1.0):
+        self.lag, self.power = lag, power
+        self.buf: deque = deque(maxlen=lag)
+
+    def update(self, x: float) -> float:
+        out = np.nan
+        if len(self.buf) == self.lag:
+            base = self.buf[0]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                out = ((x / base) ** self.power - 1.0) * 100.0
+        self.buf.append(float(x))
+        return out
+
+    def extend(self, values) -> np.ndarray:
+        return np.array([self.update(v) for v in values], dtype=float)
+
+
+def yoy(lag: int = 12) -> LagRatio:
+    return LagRatio(lag, 1.0)
+
+
+def ann3m() -> LagRatio:
+    return LagRatio(3, 4.0)
+
+
+class _Window:
+    """Fixed-size window of (x, y) pairs with running means and co-moments."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.buf: deque = deque()
+        self.nans = 0
+        self._reset()
+
+    def _reset(self):
+        self.n, self.mx, self.my, self.mxx, self.myy, self.cxy = 0, 0.0, 0.0, 0.0, 0.0, 0.0
+        self.removals = 0
+
+    def _add(self, x, y):
+        self.n += 1
+        dx, dy = x - self.mx, y - self.my
+        self.mx += dx / self.n
+        self.my += dy / self.n
+        self.mxx += dx * (x - self.mx)
+        self.myy += dy * (y - self.my)
+        self.cxy += dx * (y - self.my)
+
+    def _remove(self, x, y):
+        self.n -= 1
+        if self.n == 0:
+            self._reset()
+            return
+        dx, dy = x - self.mx, y - self.my
+        self.mx -= dx / self.n
+        self.my -= dy / self.n
+        self.mxx -= dx * (x - self.mx)
+        self.myy -= dy * (y - self.my)
+        self.cxy -= dx * (y - self.my)
+        self.removals += 1
+        if self.removals >= RESYNC_EVERY:
+            self._resync()
+
+    def _resync(self):
+        self._reset()
+        for x, y in self.buf:
+            if not (math.isnan(x) or math.isnan(y)):
+                self._add(x, y)
+
+    def push(self, x: float, y: float = 0.0) -> bool:
+        """Add a point, evicting the oldest; True when the window is full and NaN-free."""
+        x, y = float(x), float(y)
+        if len(self.buf) == self.window:
+            ox, oy = self.buf.popleft()
+            if math.isnan(ox) or math.isnan(oy):
+                self.nans -= 1
+            else:
+                self._remove(ox, oy)
+        self.buf.append((x, y))
+        if math.isnan(x) or math.isnan(y):
+            self.nans += 1
+        else:
+            self._add(x, y)
+        return len(self.buf) == self.window and self.nans == 0
+
+
+class RollingZScore:
+    """(x - rolling mean) / rolling std over `window` points, updated in O(1)."""
+
+    def __init__(self, window: int = 13):
+        self.w = _Window(window)
+
+    def update(self, x: float) -> float:
+        if not self.w.push(x) or self.w.n < 2:
+            return np.nan
+        var = self.w.mxx / (self.w.n - 1)
+        return (float(x) - self.w.mx) / math.sqrt(var) if var > 0 else np.nan
+
+    def extend(self, values) -> np.ndarray:
+        return np.array([self.update(v) for v in values], dtype=float)
+
+
+class RollingCorr:
+    """Rolling Pearson correlation of aligned (a, b) pairs over `window` points, updated in O(1)."""
+
+    def __init__(self, window: int = 24):
+        self.w = _Window(window)
+
+    def update(self, a: float, b: float) -> float:
+        if not self.w.push(a, b):
+            return np.nan
+        den = math.sqrt(self.w.mxx * self.w.myy)
+        return self.w.cxy / den if den > 0 else np.nan
+
+    def extend(self, a_values, b_values) -> np.ndarray:
+        return np.array([self.update(a, b) for a, b in zip(a_values, b_values)], dtype=float)
+
+
+class RollingMean:
+    """Trailing mean over `window` points (NaN while the window holds a NaN), updated in O(1)."""
+
+    def __init__(self, window: int = 3):
+        self.w = _Window(window)
+
+    def update(self, x: float) -> float:
+        return self.w.mx if self.w.push(x) else np.nan
+
+    def extend(self, values) -> np.ndarray:
+        return np.array([self.update(v) for v in values], dtype=float)
+
+
+# ---------- Per-key state kept across refreshes ----------
+# IncrementalTransforms listens to a SeriesStore: every write (merge, background refresh,
+# pick-up from another worker) reports the earliest date it changed, and the pipelines on
+# that key remember it. On the next read each pipeline
+#   - feeds only the points after the last one it absorbed (O(1) per point),
+#   - restores the state saved before its latest point and feeds it again when that point
+#     was revised (read_through re-reads from the last stored date),
+#   - replays the whole series when anything older changed (backfilled history, deep revision).
+# Pipelines are op specs applied in order, e.g. (("ma", 3), ("lag", 12)) = YoY of the 3-month
+# average; correlation() pairs two pipelines' outputs on common dates.
+
+OPS = {"ma": RollingMean, "lag": LagRatio, "z": RollingZScore}
+
+
+def _clone(obj):
+    """Copy of an op's state: deques are copied (C speed), nested ops cloned, scalars shared."""
+    if isinstance(obj, deque):
+        return deque(obj, obj.maxlen)
+    if isinstance(obj, list):
+        return [_clone(x) for x in obj]
+    if hasattr(obj, "__dict__"):
+        new = object.__new__(type(obj))
+        new.__dict__.update({k: _clone(v) for k, v in obj.__dict__.items()})
+        return new
+    return obj
+
+
+class _Chain:
+    def __init__(self, spec):
+        self.ops = [OPS[name](*params) for name, *params in spec]
+
+    def update(self, x: float) -> float:
+        for op in self.ops:
+            x = op.update(x)
+        return x
+
+
+class _Tracked:
+    """A stateful op over its input(s): outputs so far, the state saved before the latest point
+    and the earliest input date changed since the last catch-up (None: up to date)."""
+
+    def __init__(self, make):
+        self.make = make
+        self.pending: int | None = np.iinfo(np.int64).min
+        self._reset()
+
+    def _reset(self):
+        self.state, self.before_last = self.make(), None
+        self.dates = np.empty(0, dtype=np.int64)      # buffers grown by doubling; first n are valid
+        self.out = np.empty(0)
+        self.n = 0
+        self.series: pd.Series | None = None
+
+    def _reserve(self, extra: int):
+        if self.n + extra > len(self.dates):
+            size = max(2 * len(self.dates), self.n + extra, 64)
+            self.dates = np.resize(self.dates, size)
+            self.out = np.resize(self.out, size)
+
+    def mark(self, changed_ns: int):
+        self.pending = changed_ns if self.pending is None else min(self.pending, changed_ns)
+
+    def catch_up(self, t: int | None, inputs) -> int | None:
+        """Absorb input changes from date t (ns) on. inputs(since_ns | None) -> (dates ns, [value
+        arrays]) from since_ns on (None: all). Returns t, or None when nothing changed."""
+        if t is None:
+            return None
+        last = int(self.dates[self.n - 1]) if self.n else None
+        if last is None or t < last or (t == last and self.before_last is None):
+            self._reset()
+            since = None
+        elif t == last:
+            self.state, self.before_last = self.before_last, None
+            self.n -= 1
+            since = last
+        else:
+            since = last + 1
+        d, xs = inputs(since)
+        self._reserve(len(d))
+        update = self.state.update
+        for i in range(len(d)):
+            if i == len(d) - 1:
+                self.before_last = _clone(self.state)
+            self.out[self.n] = update(*(float(x[i]) for x in xs))
+            self.dates[self.n] = d[i]
+            self.n += 1
+        self.series = None
+        return t
+
+    def tail(self, since: int | None) -> tuple[np.ndarray, np.ndarray]:
+        i = 0 if since is None else int(np.searchsorted(self.dates[: self.n], since))
+        return self.dates[i: self.n], self.out[i: self.n]
+
+    def to_series(self) -> pd.Series:
+        """Full output (a copy: the buffers are written in place on the next catch-up)."""
+        if self.series is None:
+            self.series = pd.Series(self.out[: self.n].copy(), dtype=float,
+                                    index=pd.DatetimeIndex(self.dates[: self.n].copy().view("datetime64[ns]")))
+        return self.series
+
+
+class IncrementalTransforms:
+    """Pipelines over store keys, updated from the store's write notifications."""
+
+    def __init__(self, store):
+        self.store = store
+        self._single: dict[str, dict[tuple, _Tracked]] = {}
+        self._pairs: dict[tuple, _Tracked] = {}
+        self._lock = threading.RLock()            # pipelines (reads)
+        self._mark_lock = threading.Lock()        # pending marks (taken inside the store's lock)
+        store.listeners.append(self._on_write)
+
+    def _on_write(self, key: str, changed_ns: int):
+        # ops are trailing (output at t depends on inputs up to t), so a pipeline's output
+        # changes from changed_ns on and the pairs over it can take the same mark
+        with self._mark_lock:
+            for t in self._single.get(key, {}).values():
+                t.mark(changed_ns)
+            for (key_a, key_b, *_), t in self._pairs.items():
+                if key in (key_a, key_b):
+                    t.mark(changed_ns)
+
+    def _single_up(self, key: str, ops: tuple) -> _Tracked:
+        with self._mark_lock:
+            t = self._single.setdefault(key, {}).get(ops)
+            if t is None:
+                t = self._single[key][ops] = _Tracked(lambda: _Chain(ops))
+            pending, t.pending = t.pending, None
+
+        def inputs(since):
+            r = self.store.range(key)
+            if r is None:
+                return np.zeros(0, dtype=np.int64), [np.zeros(0)]
+            d, v = r
+            i = 0 if since is None else int(np.searchsorted(d, since))
+            return d[i:], [v[i:]]
+
+        t.catch_up(pending, inputs)
+        return t
+
+    def transformed(self, key: str, ops: tuple = ()) -> pd.Series:
+        """The stored series `key` through the op pipeline `ops`, full history."""
+        with self._lock:
+            return self._single_up(key, tuple(ops)).to_series()
+
+    def correlation(self, key_a: str, key_b: str, window: int = 24, ops: tuple = ()) -> pd.Series:
+        """Rolling correlation of the two keys' `ops` outputs over their common dates."""
+        ops = tuple(ops)
+        with self._lock:
+            a = self._single_up(key_a, ops)
+            b = self._single_up(key_b, ops)
+
+            def inputs(since):
+                (da, xa), (db, xb) = a.tail(since), b.tail(since)
+                d, ia, ib = np.intersect1d(da, db, assume_unique=True, return_indices=True)
+                return d, [xa[ia], xb[ib]]
+
+            with self._mark_lock:       # the pair's own marks, set by _on_write for either key
+                pair = self._pairs.get((key_a, key_b, window, ops))
+                if pair is None:
+                    pair = self._pairs[(key_a, key_b, window, ops)] = _Tracked(lambda: RollingCorr(window))
+                pending, pair.pending = pair.pending, None
+            pair.catch_up(pending, inputs)
+            return pair.to_series()
+
+
+# ---------- Vectorised panel versions ----------
+# Same statistics computed for every column of a (time x series) array at once, for
+# panel views that transform many series in one pass.
+
+def _window_sums(a: np.ndarray, window: int) -> np.ndarray:
+    """Trailing sums over `window` rows for each column; rows before the first full window are NaN."""
+    c = np.vstack([np.zeros((1, a.shape[1])), np.cumsum(a, axis=0)])
+    out = np.full(a.shape, np.nan)
+    out[window - 1:] = c[window:] - c[:-window]
+    return out
+
+
+def lag_ratio_2d(X: np.ndarray, lag: int, power: float = 1.0) -> np.ndarray:
+    """Column-wise (x_t / x_{t-lag}) ** power - 1, in percent."""
+    out = np.full(X.shape, np.nan)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        out[lag:] = ((X[lag:] / X[:-lag]) ** power - 1.0) * 100.0
+    return out
+
+
+def moving_average_2d(X: np.ndarray, window: int) -> np.ndarray:
+    """Column-wise trailing mean; NaN if the window contains a NaN (pandas rolling semantics)."""
+    nan = np.isnan(X)
+    return np.where(_window_sums(nan.astype(float), window) > 0, np.nan,
+                    _window_sums(np.where(nan, 0.0, X), window) / window)
+
+
+def rolling_zscore_2d(X: np.ndarray, window: int) -> np.ndarray:
+    """Column-wise (x - rolling mean) / rolling std (ddof=1), matching rolling_zscore per column."""
+    nan = np.isnan(X)
+    # Demean per column first so the cumulative sums of squares stay well conditioned
+    centre = np.nanmean(np.where(nan.all(axis=0), 0.0, X), axis=0) if X.size else 0.0
+    D = np.where(nan, 0.0, X - centre)
+    s1, s2 = _window_sums(D, window), _window_sums(D * D, window)
+    mean = s1 / window
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (s2 - s1 * mean) / (window - 1)
+        z = (D - mean) / np.sqrt(np.where(var > 0, var, np.nan))
+    z[_window_sums(nan.astype(float), window) > 0] = np.nan
+    return z
+
+
+# ---------- Multi-window sweeps ----------
+# Many window lengths at once from one set of cumulative sums: row i of the result is the
+# statistic for windows[i], so a window x time surface costs one cumsum per moment.
+
+def _sweep_sums(v: np.ndarray, windows: np.ndarray) -> np.ndarray:
+    """(len(windows), T) trailing sums of v for each window; NaN where the window is not yet full."""
+    c = np.concatenate([[0.0], np.cumsum(v)])
+    ends = np.arange(1, len(v) + 1)
+    starts = ends[None, :] - windows[:, None]
+    out = c[ends][None, :] - c[np.clip(starts, 0, None)]
+    out[starts < 0] = np.nan
+    return out
+
+
+def zscore_sweep(x, windows) -> np.ndarray:
+    """Rolling z-score of x for every window in `windows`; shape (len(windows), len(x))."""
+    x = np.asarray(x, dtype=float)
+    w = np.asarray(windows)
+    nan = np.isnan(x)
+    d = np.where(nan, 0.0, x - (np.nanmean(x) if (~nan).any() else 0.0))
+    s1, s2 = _sweep_sums(d, w), _sweep_sums(d * d, w)
+    mean = s1 / w[:, None]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        var = (s2 - s1 * mean) / (w[:, None] - 1)
+        z = (d[None, :] - mean) / np.sqrt(np.where(var > 0, var, np.nan))
+    z[_sweep_sums(nan.astype(float), w) > 0] = np.nan
+    return z
+
+
+def corr_sweep(a, b, windows) -> np.ndarray:
+    """Rolling correlation of aligned a, b for every window in `windows`; shape (len(windows), len(a))."""
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    w = np.asarray(windows)
+    nan = np.isnan(a) | np.isnan(b)
+    da = np.where(nan, 0.0, a - (np.nanmean(a[~nan]) if (~nan).any() else 0.0))
+    db = np.where(nan, 0.0, b - (np.nanmean(b[~nan]) if (~nan).any() else 0.0))
+    n = w[:, None].astype(float)
+    sa, sb = _sweep_sums(da, w), _sweep_sums(db, w)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = _sweep_sums(da * db, w) - sa * sb / n
+        va = _sweep_sums(da * da, w) - sa * sa / n
+        vb = _sweep_sums(db * db, w) - sb * sb / n
+        r = cov / np.sqrt(va * vb)
+    r[_sweep_sums(nan.astype(float), w) > 0] = np.nan
+    return r
@@ -0,0 +1,156 @@
+# Single-flight request coalescing and fair rate limiting
+# -------------------------------------------------------
+# SingleFlight: concurrent callers asking for the same key share one in-flight call; the
+# first runs it, the rest block on it and receive its result (or its exception).
+# store.read_through() single-flights the network fill per series key, so a herd of
+# sessions opening the dashboard after a cache expiry makes one FRED/StatCan request.
+#
+# FairLimiter: token bucket per upstream (FRED, StatCan). When it is saturated, waiting
+# requests are granted tokens round-robin across sessions rather than first come first
+# served, so one session loading a 20-series panel cannot starve another's single chart.
+# Rates: FRED_RATE_PER_MIN (default 120, FRED's documented limit), STATCAN_RATE_PER_S (20).
+
+from collections import deque
+import os
+import threading
+import time
+
+
+_local = threading.local()
+
+
+class session_scope:
+    """Attribute work on this thread to `session` (e.g. pool workers fetching for one user)."""
+
+    def __init__(self, session: str):
+        self.session = session
+
+    def __enter__(self):
+        self.prev = getattr(_local, "session", None)
+        _local.session = self.session
+
+    def __exit__(self, *exc):
+        _local.session = self.prev
+
+
+def current_session() -> str:
+    """Streamlit session id of the calling script thread; the thread name elsewhere (e.g. refresher)."""
+    if getattr(_local, "session", None):
+        return _local.session
+    try:
+        from streamlit.runtime.scriptrunner import get_script_run_ctx
+
+        ctx = get_script_run_ctx(suppress_warning=True)
+        if ctx is not None:
+            return ctx.session_id
+    except Exception:
+        pass
+    return threading.current_thread().name
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error: BaseException | None = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    def __init__(self):
+        self._calls: dict = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        """Run fn() once per key at a time. Returns (result, shared); shared=True for callers
+        that waited on someone else's call. Exceptions propagate to every caller."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+
+class FairLimiter:
+    """Token bucket (rate per second, burst) with round-robin grants across sessions."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate, self.burst = rate, burst
+        self.tokens = burst
+        self.stamp = time.monotonic()
+        self.queues: dict[str, deque] = {}
+        self.ring: deque[str] = deque()      # sessions with waiting requests, in turn order
+        self.cond = threading.Condition()
+        self.waited = 0                      # acquire() calls that did not get a token at once
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def acquire(self, session: str | None = None):
+        session = session or current_session()
+        ticket = object()
+        with self.cond:
+            q = self.queues.setdefault(session, deque())
+            q.append(ticket)
+            if session not in self.ring:
+                self.ring.append(session)
+            first = True
+            while True:
+                self._refill()
+                if self.tokens >= 1 and self.ring[0] == session and q[0] is ticket:
+                    self.tokens -= 1
+                    q.popleft()
+                    self.ring.popleft()
+                    if q:
+                        self.ring.append(session)     # back of the line for its next request
+                    else:
+                        del self.queues[session]
+                    self.cond.notify_all()
+                    return
+                if first:
+                    self.waited += 1
+                    first = False
+                self.cond.wait(timeout=max((1 - self.tokens) / self.rate, 0.005) if self.tokens < 1 else None)
+
+
+FLIGHTS = SingleFlight()
+LIMITERS = {
+    "FRED": FairLimiter(rate=float(os.getenv("FRED_RATE_PER_MIN", "120")) / 60.0, burst=10),
+    "StatCan": FairLimiter(rate=float(os.getenv("STATCAN_RATE_PER_S", "20")), burst=20),
+}
+
+
+def limited(key: str, fetch):
+    """Wrap fetch so each call first takes a token from the limiter of the key's source."""
+    limiter = LIMITERS.get(key.split(":", 1)[0])
+    if limiter is None:
+        return fetch
+
+    def call(*args, **kwargs):
+        limiter.acquire()
+        return fetch(*args, **kwargs)
+
+    return call
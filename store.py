@@ -0,0 +1,518 @@
+# Series store and snapshot bundles
+# ---------------------------------
+# Process-wide store of observation series shared by the apps, keyed by
+# "<source>:<id>[|<variant>]" (e.g. "FRED:DGS10", "FRED:DGS10|m" for FRED's monthly
+# aggregation, "StatCan:v122543"). Each entry is a sorted int64 (ns) date array, a float64
+# value array and a small metadata dict, including the date range already fetched ("coverage").
+# Every write is validated once (quality.py): stored arrays are clean (numeric, tz-naive, sorted,
+# one value per date) and meta["quality"] records gaps, outliers, duplicates, frequency breaks
+# and revisions, so read paths do not re-coerce.
+# Listeners (store.listeners) are called as fn(key, changed_ns) after every write or
+# cross-process pick-up that changes a series, with the earliest date (int64 ns) that differs
+# from the previous copy; rolling.IncrementalTransforms uses this to update only the tail.
+# Range reads binary-search the sorted dates (np.searchsorted) and return views of both
+# arrays, so a one-year window of a 50-year daily series touches only that year's bytes
+# (with a mapped snapshot, only those pages are read from disk).
+#
+# read_through() serves a request from the store and only goes to the network for the part
+# of the range the store does not cover yet (older history, or observations newer than the
+# last stored date). When the fetch fails (network down, StatCan nightly lock) the stored copy
+# is returned instead, and that key skips the network for OFFLINE_BACKOFF_S.
+#
+# Snapshots: export_snapshot() writes the whole store into one file; load_snapshot() maps it
+# with np.memmap so arrays are zero-copy views and startup does not parse anything.
+#   layout: b"AASNAP1\n" | u64 header length | JSON header | pad to 64 | raw arrays (64-byte aligned)
+# A ".gz" path gives a gzip-compressed bundle for shipping; it is decompressed into memory on
+# load since compressed bytes cannot be memory mapped.
+#
+# Mapped files are never overwritten (Windows refuses to replace or delete a mapped file):
+# every write goes to a new generation, <name>~<hex ns><ext>, the store switches its mapping
+# to it and older generations are removed once nothing maps them. get_store() opens the newest
+# generation of SNAPSHOT_PATH (a plain SNAPSHOT_PATH, e.g. one shipped with the app, counts as
+# the oldest).
+#
+# Shared cache (SHARED_CACHE_DIR): with several server processes on one host, every series
+# merged by any process is published as a one-series bundle generation <dir>/<key>~<gen>.aaser
+# and a small pointer file <dir>/<key>.aaptr naming it. The pointer is written to a temp file
+# and os.replace()d (it is read and closed, never mapped), so readers see the old or the new
+# generation, never a partial one. Each process memory-maps the published bundles; sync()
+# re-maps a key when its pointer changed (stat check), so a refresh in one worker reaches all
+# of them without a copy in each heap. Mappings of a retired generation stay valid until dropped.
+
+from datetime import datetime, time as dtime
+import gzip
+import json
+import os
+import threading
+import time
+from urllib.parse import unquote
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from quality import quality_table, validate
+from singleflight import FLIGHTS, LIMITERS, limited
+
+MAGIC = b"AASNAP1\n"
+ALIGN = 64
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join("snapshots", "series.aasnap"))
+OFFLINE = os.getenv("SNAPSHOT_OFFLINE", "") not in ("", "0")   # never hit the network for stored series
+OFFLINE_BACKOFF_S = 300                                          # after a failed fetch, skip the network for that key this long
+SHARED_CACHE_DIR = os.getenv("SHARED_CACHE_DIR", "")             # "" = no cross-process sharing
+SHARED_EXT = ".aaser"
+POINTER_EXT = ".aaptr"
+GEN_SEP = "~"                                                    # never in a percent-encoded key name
+
+_TORONTO = ZoneInfo("America/Toronto")
+
+
+def series_key(source: str, series_id: str, variant: str = "") -> str:
+    return f"{source}:{series_id}" + (f"|{variant}" if variant else "")
+
+
+def in_statcan_lock_window(now: datetime | None = None) -> bool:
+    """StatCan WDS locks tables for the nightly release between 00:00 and 08:30 Eastern (HTTP 409)."""
+    now = (now or datetime.now(_TORONTO)).astimezone(_TORONTO)
+    return now.time() < dtime(8, 30)
+
+
+def _ts(x) -> pd.Timestamp | None:
+    return None if x is None or x == "" else pd.Timestamp(x).tz_localize(None).normalize()
+
+
+def _iso(t: pd.Timestamp | None) -> str | None:
+    return None if t is None else t.strftime("%Y-%m-%d")
+
+
+def _bounds(dates_ns: np.ndarray, start=None, end=None) -> tuple[int, int]:
+    """Slice bounds of [start, end] (whole days, inclusive) in a sorted int64 ns date array."""
+    lo, hi = _ts(start), _ts(end)
+    i = 0 if lo is None else int(np.searchsorted(dates_ns, lo.value, side="left"))
+    j = len(dates_ns) if hi is None else int(np.searchsorted(dates_ns, hi.value, side="right"))
+    return i, max(i, j)
+
+
+def date_window(df: pd.DataFrame, start=None, end=None, col: str = "Date") -> pd.DataFrame:
+    """Rows of a frame sorted by `col` with start <= col <= end, found by binary search.
+    A positional slice (a view under copy-on-write) instead of a full boolean mask."""
+    if df.empty:
+        return df
+    dates = df[col].to_numpy(dtype="datetime64[ns]").view("i8")
+    i, j = _bounds(dates, start, end)
+    return df.iloc[i:j]
+
+
+# ---------- Bundle format ----------
+
+def _write_bundle(path: str, series: dict, fsync: bool = False):
+    """Write {key: (dates, values, meta)} as one bundle via temp file + atomic rename."""
+    entries, off = {}, 0
+    for k, (d, _, meta) in series.items():
+        entries[k] = {"n": len(d), "off": off, "meta": meta}
+        off += -(-16 * len(d) // ALIGN) * ALIGN
+    header = json.dumps({"version": 1, "created": time.time(), "series": entries}).encode()
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGN) * ALIGN
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(tmp, "wb") as f:
+        f.write(MAGIC + len(header).to_bytes(8, "little") + header)
+        f.write(b"\0" * (data_start - len(MAGIC) - 8 - len(header)))
+        for d, v, _ in series.values():
+            f.write(d.astype("<i8").tobytes() + v.astype("<f8").tobytes())
+            f.write(b"\0" * (-(16 * len(d)) % ALIGN))
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    _replace(tmp, path)
+
+
+def _replace(tmp: str, path: str, tries: int = 50):
+    """os.replace, retrying briefly while a reader has `path` open (Windows refuses then)."""
+    for i in range(tries):
+        try:
+            return os.replace(tmp, path)
+        except PermissionError:
+            if i == tries - 1:
+                raise
+            time.sleep(0.01)
+
+
+def _split_ext(path: str) -> tuple[str, str]:
+    root, ext = os.path.splitext(path)
+    if ext == ".gz":
+        root, inner = os.path.splitext(root)
+        ext = inner + ext
+    return root, ext
+
+
+def _new_generation(path: str) -> str:
+    """A fresh file name for the next version of `path`: <root>~<hex ns><ext>."""
+    root, ext = _split_ext(path)
+    return f"{root}{GEN_SEP}{time.time_ns():016x}{ext}"
+
+
+def _generations(path: str) -> list[str]:
+    """Existing versions of `path`, oldest first; the plain path itself (if present) is the oldest."""
+    root, ext = _split_ext(path)
+    head, stem = os.path.split(root)
+    try:
+        names = os.listdir(head or ".")
+    except FileNotFoundError:
+        return []
+    prefix = stem + GEN_SEP
+    gens = sorted(n for n in names if n.startswith(prefix) and n.endswith(ext)
+                  and len(n) == len(prefix) + 16 + len(ext))
+    return ([path] if os.path.exists(path) else []) + [os.path.join(head, n) for n in gens]
+
+
+def _remove_files(paths) -> list[str]:
+    """Delete what can be deleted; returns the paths still in use (mapped somewhere on Windows)."""
+    busy = []
+    for p in paths:
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            busy.append(p)
+    return busy
+
+
+def _read_bundle(path: str) -> dict:
+    """{key: (dates, values, meta)}; arrays are read-only views into the mapped file."""
+    if path.endswith(".gz"):
+        with gzip.open(path, "rb") as f:
+            buf = np.frombuffer(f.read(), dtype=np.uint8)
+    else:
+        buf = np.memmap(path, dtype=np.uint8, mode="r")
+    if bytes(buf[: len(MAGIC)]) != MAGIC:
+        raise ValueError(f"{path} is not a series snapshot")
+    hlen = int.from_bytes(bytes(buf[len(MAGIC): len(MAGIC) + 8]), "little")
+    header = json.loads(bytes(buf[len(MAGIC) + 8: len(MAGIC) + 8 + hlen]))
+    data_start = -(-(len(MAGIC) + 8 + hlen) // ALIGN) * ALIGN
+    out = {}
+    for k, e in header["series"].items():
+        n, off = e["n"], data_start + e["off"]
+        out[k] = (np.frombuffer(buf, dtype="<i8", count=n, offset=off),
+                  np.frombuffer(buf, dtype="<f8", count=n, offset=off + 8 * n), e["meta"])
+    return out
+
+
+def _first_change(old_d, old_v, d, v) -> int | None:
+    """Earliest date (ns) at which (d, v) differs from (old_d, old_v); None if identical."""
+    if old_d is None:
+        return int(d[0]) if len(d) else None
+    n = min(len(old_d), len(d))
+    diff = np.flatnonzero((old_d[:n] != d[:n]) | (old_v[:n] != v[:n]))    # stored values hold no NaN
+    if len(diff):
+        return int(min(old_d[diff[0]], d[diff[0]]))
+    if len(d) != len(old_d):
+        return int(d[n]) if len(d) > n else int(old_d[n])
+    return None
+
+
+def _shared_name(key: str, root: str) -> str:
+    # keys hold ":" and "|"; percent-encode anything outside a safe set so names round-trip
+    return os.path.join(root, "".join(c if c.isalnum() or c in "-_." else f"%{ord(c):02X}" for c in key))
+
+
+def _read_pointer(path: str) -> str | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_pointer(path: str, target: str):
+    tmp = f"{path}.tmp{os.getpid()}.{threading.get_ident()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(target)
+    _replace(tmp, path)
+
+
+def _file_sig(path: str):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class SeriesStore:
+    """Thread-safe in-memory store; arrays may be read-only views into a mapped snapshot."""
+
+    def __init__(self):
+        self._dates: dict[str, np.ndarray] = {}
+        self._values: dict[str, np.ndarray] = {}
+        self.meta: dict[str, dict] = {}
+        self._lock = threading.RLock()
+        self.offline_until: dict[str, float] = {}     # key -> time before which the network is skipped
+        self.source_path: str | None = None
+        self.refresher = None        # refresh.Refresher when background refresh is running
+        self.shared_dir = SHARED_CACHE_DIR or None
+        self._shared_sig: dict[str, tuple] = {}
+        self.shared_loads = 0
+        self._retired: list[str] = []  # old generations still mapped somewhere; removal retried
+        self.listeners: list = []      # fn(key, changed_ns) after a series changed
+
+    # ----- reads -----
+    def __contains__(self, key: str) -> bool:
+        return key in self._dates
+
+    def keys(self) -> list[str]:
+        return sorted(self._dates)
+
+    def range(self, key: str, start=None, end=None) -> tuple[np.ndarray, np.ndarray] | None:
+        """(dates ns, values) for start <= date <= end as zero-copy views (binary search on dates)."""
+        with self._lock:             # dates and values of the same version
+            d, v = self._dates.get(key), self._values.get(key)
+        if d is None:
+            return None
+        lo, hi = _bounds(d, start, end)
+        return d[lo:hi], v[lo:hi]
+
+    def get(self, key: str, start=None, end=None) -> pd.Series | None:
+        r = self.range(key, start, end)
+        if r is None:
+            return None
+        d, v = r
+        return pd.Series(v, index=pd.DatetimeIndex(d.view("datetime64[ns]")), name=key, copy=False)
+
+    def last_date(self, key: str) -> pd.Timestamp | None:
+        d = self._dates.get(key)
+        return pd.Timestamp(d[-1]) if d is not None and len(d) else None
+
+    def coverage(self, key: str) -> tuple[pd.Timestamp | None, pd.Timestamp] | None:
+        cov = self.meta.get(key, {}).get("coverage")
+        return None if cov is None else (_ts(cov[0]), _ts(cov[1]))
+
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in self._dates.values()) + sum(a.nbytes for a in self._values.values())
+
+    # ----- writes -----
+    def put(self, key: str, s: pd.Series, meta: dict | None = None):
+        """Replace a series (validated and cleaned by quality.validate)."""
+        d, v, report = validate(s)
+        self._set(key, d, v, {**(meta or {}), "quality": report})
+
+    def merge(self, key: str, s: pd.Series, coverage=None, meta: dict | None = None):
+        """Upsert observations (new values win on equal dates) and widen the covered range."""
+        with self._lock:
+            self.sync(key)           # build on the latest copy any worker has published
+            d, v, report = validate(s, self.range(key))
+            meta = {**(meta or {}), "quality": report}
+            if coverage is not None:
+                lo, hi = coverage
+                prev = self.coverage(key)
+                if prev is not None:
+                    lo = None if lo is None or prev[0] is None else min(lo, prev[0])
+                    hi = max(hi, prev[1])
+                meta["coverage"] = [_iso(lo), _iso(hi)]
+            self._set(key, d, v, meta)
+            if self.shared_dir:
+                self.publish(key)
+
+    def _set(self, key: str, d: np.ndarray, v: np.ndarray, meta: dict):
+        with self._lock:
+            changed = _first_change(self._dates.get(key), self._values.get(key), d, v) if self.listeners else None
+            self._dates[key], self._values[key] = d, v
+            self.meta[key] = {**self.meta.get(key, {}), **meta, "updated_at": time.time()}
+            self._notify(key, changed)
+
+    def _notify(self, key: str, changed: int | None):
+        if changed is not None:
+            for fn in self.listeners:
+                fn(key, changed)
+
+    # ----- cross-process sharing -----
+    def publish(self, key: str):
+        """Write `key` to a new generation in the shared directory, point <key>.aaptr at it and
+        serve the key from the mapped file."""
+        name = _shared_name(key, self.shared_dir)
+        pointer = name + POINTER_EXT
+        with self._lock:
+            data = _new_generation(name + SHARED_EXT)
+            _write_bundle(data, {key: (self._dates[key], self._values[key], self.meta.get(key, {}))})
+            old = _read_pointer(pointer)
+            _write_pointer(pointer, os.path.basename(data))
+            self._adopt(key, pointer)
+            if old:
+                self._retired.append(os.path.join(self.shared_dir, old))
+            self._retired = _remove_files(self._retired)
+
+    def _adopt(self, key: str, pointer: str) -> bool:
+        """Serve `key` from the generation `pointer` names unless the copy we hold was updated later."""
+        sig = _file_sig(pointer)
+        target = _read_pointer(pointer)
+        if target is None:
+            return False
+        try:
+            d, v, meta = _read_bundle(os.path.join(self.shared_dir, target))[key]
+        except (OSError, ValueError, KeyError):
+            return False
+        with self._lock:
+            self._shared_sig[key] = sig
+            if meta.get("updated_at", 0.0) < self.meta.get(key, {}).get("updated_at", 0.0):
+                return False
+            changed = _first_change(self._dates.get(key), self._values.get(key), d, v) if self.listeners else None
+            self._dates[key], self._values[key], self.meta[key] = d, v, meta
+            self._notify(key, changed)
+        return True
+
+    def sync(self, key: str) -> bool:
+        """Pick up a newer copy of `key` published by another process. True if re-mapped."""
+        if not self.shared_dir:
+            return False
+        pointer = _shared_name(key, self.shared_dir) + POINTER_EXT
+        sig = _file_sig(pointer)
+        if sig is None or sig == self._shared_sig.get(key):
+            return False
+        if self._adopt(key, pointer):
+            self.shared_loads += 1
+            return True
+        return False
+
+    def sync_all(self) -> int:
+        """Map every series published in the shared directory that is new or changed."""
+        if not self.shared_dir or not os.path.isdir(self.shared_dir):
+            return 0
+        n = 0
+        for name in os.listdir(self.shared_dir):
+            if name.endswith(POINTER_EXT):
+                n += self.sync(unquote(name[: -len(POINTER_EXT)]))
+        return n
+
+    # ----- snapshots -----
+    def export_snapshot(self, path: str = SNAPSHOT_PATH) -> str:
+        """Write every series + metadata to a new generation of `path` (gzip when it ends with .gz)
+        and return its name. A plain bundle becomes the store's mapping; older generations of
+        `path` are removed once nothing maps them (the plain path itself is kept)."""
+        new = _new_generation(path)
+        with self._lock:
+            keys = self.keys()
+            _write_bundle(new, {k: (self._dates[k], self._values[k], self.meta.get(k, {})) for k in keys})
+            if not new.endswith(".gz"):
+                for k, (d, v, _) in _read_bundle(new).items():      # same contents, now from the new file
+                    self._dates[k], self._values[k] = d, v
+                self.source_path = new
+            old = [p for p in _generations(path) if p not in (path, new)]
+            self._retired = _remove_files(self._retired + old)
+        return new
+
+    @classmethod
+    def load_snapshot(cls, path: str = SNAPSHOT_PATH) -> "SeriesStore":
+        """Open a bundle. Plain bundles are memory mapped (zero-copy, read-only arrays)."""
+        store = cls()
+        for k, (d, v, meta) in _read_bundle(path).items():
+            store._dates[k], store._values[k], store.meta[k] = d, v, meta
+        store.source_path = path
+        return store
+
+
+# ---------- Process-wide store ----------
+_store: SeriesStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> SeriesStore:
+    """The shared store, loaded from SNAPSHOT_PATH on first use when a snapshot exists."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SeriesStore()
+            for path in (SNAPSHOT_PATH, SNAPSHOT_PATH + ".gz"):
+                gens = _generations(path)
+                if gens:
+                    try:
+                        _store = SeriesStore.load_snapshot(gens[-1])
+                    except Exception:
+                        pass
+                    break
+            _store.sync_all()
+        return _store
+
+
+def read_through(key: str, start, end, fetch, store: SeriesStore | None = None) -> pd.Series:
+    """Serve [start, end] from the store, fetching only the uncovered part.
+
+    fetch(start_iso | None, end_iso) -> pd.Series hits the network. start=None means full history,
+    end=None means today. If fetching fails and the store already has the series, the stored
+    copy is returned (offline / StatCan lock); otherwise the error propagates.
+
+    With a background refresher attached, newer data is never fetched inline: the stored copy
+    is returned at once and, if past its TTL, the series is queued for refresh.
+
+    Fills are single-flighted per key across sessions (concurrent callers wait for the one
+    in-flight fetch, then re-check coverage) and every network call is rate limited.
+    """
+    store = store or get_store()
+    store.sync(key)
+    lo, hi = _ts(start), _ts(end) or pd.Timestamp.today().normalize()
+    if store.refresher is not None:
+        store.refresher.register(key, fetch)
+    fetch = limited(key, fetch)
+
+    def fill():
+        cov = store.coverage(key)
+        hi_fetch = hi
+        if store.refresher is not None and key in store and cov is not None and hi > cov[1]:
+            if store.refresher.is_stale(key):
+                store.refresher.request(key)
+            hi_fetch = cov[1]        # only older, never-fetched history is fetched inline below
+        if cov is None:
+            store.merge(key, fetch(_iso(lo), _iso(hi)), coverage=(lo, hi))
+            return
+        clo, chi = cov
+        if clo is not None and (lo is None or lo < clo):
+            store.merge(key, fetch(_iso(lo), _iso(clo - pd.Timedelta(days=1))), coverage=(lo, chi))
+        if hi_fetch > chi:
+            # Re-read from the last stored observation so a revised latest print is picked up
+            last = store.last_date(key)
+            tail_start = min(last, chi) if last is not None else chi
+            store.merge(key, fetch(_iso(tail_start), _iso(hi)), coverage=(tail_start, hi))
+
+    have = key in store
+    skip_network = have and (
+        OFFLINE or time.time() < store.offline_until.get(key, 0.0)
+        or (key.startswith("StatCan:") and in_statcan_lock_window())
+    )
+    if not skip_network:
+        try:
+            while FLIGHTS.do(key, fill)[1]:
+                pass                     # waited on another session's fill: re-check what is still missing
+        except Exception:
+            if key not in store:
+                raise
+            store.offline_until[key] = time.time() + OFFLINE_BACKOFF_S
+    out = store.get(key, lo, hi)
+    return out if out is not None else pd.Series(dtype=float, name=key)
+
+
+def snapshot_controls(store: SeriesStore | None = None):
+    """Sidebar expander to save the current store as the startup snapshot."""
+    import streamlit as st
+
+    store = store or get_store()
+    with st.sidebar.expander("💾 Snapshot", expanded=False):
+        src = store.source_path or "none (network only)"
+        st.caption(f"{len(store.keys())} series · {store.nbytes() / 1e6:.1f} MB · loaded from {src}")
+        if store.refresher is not None:
+            r = store.refresher.status()
+            st.caption(f"Background refresh: {r['tracked']} tracked · {r['pending']} queued · "
+                       f"{r['refreshed']} refreshed · {r['unchanged']} unchanged · {r['failed']} failed")
+        waits = " · ".join(f"{name} {lim.waited}" for name, lim in LIMITERS.items())
+        if store.shared_dir:
+            st.caption(f"Shared cache: {store.shared_dir} · {store.shared_loads} series picked up from other workers")
+        st.caption(f"Coalesced fetches: {FLIGHTS.shared} · rate-limit waits: {waits}")
+        flagged = quality_table(store.meta)
+        flagged = flagged[flagged["flags"] != ""]
+        st.caption(f"Data quality: {len(flagged)} series flagged")
+        if len(flagged) and st.checkbox("Show quality flags", key="quality_flags"):
+            st.dataframe(flagged, hide_index=True, use_container_width=True)
+        if st.button("Save snapshot", help=f"Write every stored series to {SNAPSHOT_PATH} for instant/offline start."):
+            path = store.export_snapshot(SNAPSHOT_PATH)
+            st.success(f"Saved {len(store.keys())} series to {path}")
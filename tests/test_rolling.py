@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+
+from rolling import IncrementalTransforms
+from store import SeriesStore
+
+YOY = (("lag", 12),)
+
+
+def _pandas_corr(a: pd.Series, b: pd.Series, window: int = 24) -> pd.Series:
+    ya, yb = (a / a.shift(12) - 1) * 100, (b / b.shift(12) - 1) * 100
+    idx = ya.index.intersection(yb.index)
+    return ya.loc[idx].rolling(window).corr(yb.loc[idx])
+
+
+def test_correlation_catches_up_after_transformed_cleared_the_marks():
+    rng = np.random.default_rng(0)
+    idx = pd.date_range("1995-01-01", "2005-06-01", freq="MS")
+    a = pd.Series(100 + rng.normal(0, 1, len(idx)).cumsum(), idx)
+    b = pd.Series(50 + rng.normal(0, 1, len(idx)).cumsum(), idx)
+    store = SeriesStore()
+    inc = IncrementalTransforms(store)
+    store.put("A", a.loc[:"2004-12"])
+    store.put("B", b.loc[:"2004-12"])
+
+    inc.transformed("A", YOY)
+    inc.transformed("B", YOY)
+    assert inc.correlation("A", "B", ops=YOY).index[-1] == pd.Timestamp("2004-12-01")
+
+    store.merge("A", a.loc["2005-01":])
+    store.merge("B", b.loc["2005-01":])
+    assert inc.transformed("A", YOY).index[-1] == pd.Timestamp("2005-06-01")
+    assert inc.transformed("B", YOY).index[-1] == pd.Timestamp("2005-06-01")
+    corr = inc.correlation("A", "B", ops=YOY)
+    assert corr.index[-1] == pd.Timestamp("2005-06-01")
+    np.testing.assert_allclose(corr.to_numpy(), _pandas_corr(a, b).to_numpy(), atol=1e-10)
+
+    store.merge("B", b.loc["2005-06":] + 2.0)       # revise the latest point of one input
+    inc.transformed("B", YOY)
+    corr = inc.correlation("A", "B", ops=YOY)
+    b.loc["2005-06":] += 2.0
+    np.testing.assert_allclose(corr.to_numpy(), _pandas_corr(a, b).to_numpy(), atol=1e-10)
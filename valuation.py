@@ -0,0 +1,72 @@
+# FX valuation models (USD/CAD)
+# -----------------------------
+# Fair-value models used by "FX Models.py" and the backtest engine. Kept in an
+# importable module so worker processes can reuse them.
+
+import pandas as pd
+
+# Model name -> fair-value column it adds to the indicator frame
+MODEL_COLUMNS = {
+    "RER": "RER_USD/CAD",
+    "PPP": "PPP_USD/CAD",
+    "BEER": "BEER_USD/CAD",
+    "FEER": "FEER_USD/CAD",
+    "Yield_Spread_Model": "Yield_Spread_Model",
+}
+
+# Model name -> input series (indicator labels) it reads; loaders fetch only the union of these
+MODEL_INPUTS = {
+    "RER": ("Nominal USD/CAD", "US CPI", "Canada CPI"),
+    "PPP": ("US CPI", "Canada CPI"),
+    "BEER": ("Nominal USD/CAD", "US 2Y Yield", "Canada 2Y Yield"),
+    "FEER": ("Nominal USD/CAD", "US Current Account", "US GDP", "Canada Current Account"),
+    "Yield_Spread_Model": ("Nominal USD/CAD", "US 2Y Yield", "Canada 2Y Yield"),
+}
+
+
+def required_inputs(models, extra=()) -> tuple[str, ...]:
+    """Ordered union of the inputs needed by `models` plus any `extra` labels (e.g. per-tab needs)."""
+    labels = [label for m in models for label in MODEL_INPUTS.get(m, ())] + list(extra)
+    return tuple(dict.fromkeys(labels))
+
+# ---------- Valuation Models ----------
+def compute_rer(df):
+    df = df.dropna(subset=["Nominal USD/CAD", "US CPI", "Canada CPI"])
+    us_cpi = (df["US CPI"] / df["US CPI"].iloc[0]) * 100
+    ca_cpi = (df["Canada CPI"] / df["Canada CPI"].iloc[0]) * 100
+    df["RER_USD/CAD"] = df["Nominal USD/CAD"] * (ca_cpi / us_cpi)
+    return df
+
+def compute_ppp(df):
+    df = df.dropna(subset=["US CPI", "Canada CPI"])
+    df["PPP_USD/CAD"] = df["Canada CPI"] / df["US CPI"]
+    return df
+
+def compute_beer(df):
+    if "US 2Y Yield" in df.columns and "Canada 2Y Yield" in df.columns:
+        spread = df["US 2Y Yield"] - df["Canada 2Y Yield"]
+        df["BEER_USD/CAD"] = df["Nominal USD/CAD"].mean() * (1 + spread / 100)
+    return df
+
+def compute_feer(df, ca_us, gdp_us, ca_ca):
+    df_feer = df.copy()
+    if not ca_us.empty and not gdp_us.empty:
+        ca_us = pd.merge(ca_us, gdp_us, on="Date", how="inner")
+        ca_us["US_CA_pct_GDP"] = (ca_us["US Current Account"] / ca_us["US GDP"]) * 100
+        latest_gap = -2 - ca_us["US_CA_pct_GDP"].iloc[-1]
+        adj = 1 + (latest_gap * 0.2 / 100)
+        df_feer["FEER_USD/CAD"] = df_feer["Nominal USD/CAD"] * adj
+        df_feer = pd.merge(df_feer, ca_us[["Date", "US_CA_pct_GDP"]], on="Date", how="left")
+    if not ca_ca.empty:
+        ca_ca.rename(columns={ca_ca.columns[1]: "Canada_CA"}, inplace=True)
+        df_feer = pd.merge(df_feer, ca_ca, on="Date", how="left")
+    return df_feer
+
+def compute_yield_spread_model(df):
+    if "US 2Y Yield" in df.columns and "Canada 2Y Yield" in df.columns:
+        spread = df["US 2Y Yield"] - df["Canada 2Y Yield"]
+        if spread.iloc[-1] != 0:
+            df["Yield_Spread_Model"] = df["Nominal USD/CAD"].mean() * (1 + spread / 100)
+        else:
+            df["Yield_Spread_Model"] = None
+    return df